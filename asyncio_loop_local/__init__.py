@@ -5,20 +5,108 @@
 
 asyncio-loop-local storage, singletons, sticky async context managers...
 Init that pool once and reuse it!
+
+The public names are imported lazily, on first access,
+so that importing the package costs next to nothing
+and only the parts in use get imported.
 """
 
-from asyncio_loop_local._enter import enter
-from asyncio_loop_local._enter_once import enter_once
-from asyncio_loop_local._singleton import singleton
-from asyncio_loop_local._sticky_acm import sticky_acm
-from asyncio_loop_local._sticky_singleton_acm import sticky_singleton_acm
-from asyncio_loop_local._storage import storage
+import importlib
+
+TYPE_CHECKING = False  # not importing typing just for that
+if TYPE_CHECKING:  # pragma: no cover
+    from asyncio_loop_local._atexit import set_teardown_timeouts
+    from asyncio_loop_local._batcher import batcher
+    from asyncio_loop_local._cached import cached
+    from asyncio_loop_local._enter import enter
+    from asyncio_loop_local._enter_once import enter_once
+    from asyncio_loop_local._executor import executor
+    from asyncio_loop_local._fork import register_warm_up, warm_up
+    from asyncio_loop_local._introspect import snapshot, snapshot_all
+    from asyncio_loop_local._limiter import Limiter, limiter
+    from asyncio_loop_local._observe import Observer, set_observer
+    from asyncio_loop_local._override import override
+    from asyncio_loop_local._pooled_acm import pooled_acm
+    from asyncio_loop_local._release import release
+    from asyncio_loop_local._runner import Runner, run
+    from asyncio_loop_local._single_flight import single_flight
+    from asyncio_loop_local._singleton import singleton
+    from asyncio_loop_local._sticky_acm import StickyACM, sticky_acm
+    from asyncio_loop_local._sticky_singleton_acm import sticky_singleton_acm
+    from asyncio_loop_local._storage import storage
+
+# public name: submodule defining it
+_LAZY = {
+    'Limiter': '_limiter',
+    'Observer': '_observe',
+    'Runner': '_runner',
+    'StickyACM': '_sticky_acm',
+    'batcher': '_batcher',
+    'cached': '_cached',
+    'enter': '_enter',
+    'enter_once': '_enter_once',
+    'executor': '_executor',
+    'limiter': '_limiter',
+    'override': '_override',
+    'pooled_acm': '_pooled_acm',
+    'register_warm_up': '_fork',
+    'release': '_release',
+    'run': '_runner',
+    'set_observer': '_observe',
+    'set_teardown_timeouts': '_atexit',
+    'single_flight': '_single_flight',
+    'singleton': '_singleton',
+    'snapshot': '_introspect',
+    'snapshot_all': '_introspect',
+    'sticky_acm': '_sticky_acm',
+    'sticky_singleton_acm': '_sticky_singleton_acm',
+    'storage': '_storage',
+    'warm_up': '_fork',
+}
+
+
+# hidden from type checkers, so that they still catch misspelled names
+if not TYPE_CHECKING:  # pragma: no branch
+
+    def __getattr__(name: str) -> object:
+        try:
+            submodule = _LAZY[name]
+        except KeyError:
+            msg = f'module {__name__!r} has no attribute {name!r}'
+            raise AttributeError(msg) from None
+        module = importlib.import_module(f'{__name__}.{submodule}')
+        value = getattr(module, name)
+        globals()[name] = value  # no __getattr__ next time
+        return value
+
+    def __dir__() -> list[str]:
+        return sorted({*globals(), *_LAZY})
+
 
 __all__ = [
+    'Limiter',
+    'Observer',
+    'Runner',
+    'StickyACM',
+    'batcher',
+    'cached',
     'enter',
     'enter_once',
+    'executor',
+    'limiter',
+    'override',
+    'pooled_acm',
+    'register_warm_up',
+    'release',
+    'run',
+    'set_observer',
+    'set_teardown_timeouts',
+    'single_flight',
     'singleton',
+    'snapshot',
+    'snapshot_all',
     'sticky_acm',
     'sticky_singleton_acm',
     'storage',
+    'warm_up',
 ]
@@ -1,33 +1,200 @@
 # SPDX-FileCopyrightText: 2023 Alexander Sosedkin <monk@unboiled.info>
 # SPDX-License-Identifier: GPL-3.0
 
-"""Set atexit hooks to fire at the end of the as."""
+"""Set atexit hooks to fire at the end of the as.
+
+Hooks run concurrently, except for the explicitly declared dependencies
+and the early ones, which complete before all the others start.
+They're stored as callables, and the coroutines are only created on firing.
+"""
 
 import asyncio
+import time
 import typing
+import warnings
+import weakref
 
+import asyncio_loop_local._observe
 import asyncio_loop_local._storage
 
+_HookFunc = typing.Callable[[], typing.Awaitable[typing.Any]]
+
+_observe = asyncio_loop_local._observe  # noqa: SLF001
+
 atexit_key_sentinel = object()
+atexit_timeouts_sentinel = object()
+
+
+class _Timeouts(typing.NamedTuple):
+    hook: float | None = None  # default for hooks registered without one
+    total: float | None = None
+
+
+class _Hook:
+    __slots__ = (
+        'born',
+        'early',
+        'func',
+        'owner',
+        'timeout',
+        'value',
+        'waits_for',
+    )
+
+    func: _HookFunc
+    owner: object  # what registered the hook, e.g., an entered acm
+    value: object  # what the owner has produced, e.g., __aenter__ result
+    timeout: float | None
+    waits_for: list['_Hook']  # hooks to complete before this one starts
+    early: bool  # completes before all the non-early ones start
+    born: float  # time.monotonic() of registering
+
+    def __init__(
+        self: typing.Self,
+        func: _HookFunc,
+        owner: object,
+        value: object,
+        timeout: float | None,
+        early: bool,  # noqa: FBT001
+    ) -> None:
+        self.func = func
+        self.owner = owner
+        self.value = value
+        self.timeout = timeout
+        self.waits_for = []
+        self.early = early
+        self.born = time.monotonic()
+
 
+class _Hooks(list[_Hook]):
+    finalizer: 'weakref.finalize[..., typing.Any]'
 
-def _register(hook: typing.Awaitable[None]) -> None:
+
+def _warn_unfired(hooks: _Hooks) -> None:
+    # the loop has been garbage-collected without being closed
+    msg = (
+        f'event loop has been garbage-collected with {len(hooks)} '
+        'loop-local atexit hooks never fired'
+    )
+    warnings.warn(msg, ResourceWarning, stacklevel=1)
+    hooks.clear()
+
+
+def _register(  # noqa: PLR0913
+    hook: _HookFunc,
+    *,
+    owner: object = None,
+    value: object = None,
+    before: typing.Iterable[_Hook] = (),
+    timeout: float | None = None,
+    early: bool = False,
+) -> _Hook:
     ls = asyncio_loop_local._storage.storage()  # noqa: SLF001
     try:
         hooks = ls[atexit_key_sentinel]
     except KeyError:
-        hooks = ls[atexit_key_sentinel] = []
+        hooks = ls[atexit_key_sentinel] = _Hooks()
         loop = asyncio.get_running_loop()
+        hooks.finalizer = weakref.finalize(loop, _warn_unfired, hooks)
+        hooks.finalizer.atexit = False
         original_close = loop.close
 
         def extended_close() -> None:
-            if not loop.is_closed():
-                loop.run_until_complete(_fire())
-            return original_close()
+            try:
+                if not loop.is_closed():
+                    loop.run_until_complete(_fire())
+            finally:
+                original_close()
 
         loop.close = extended_close  # type: ignore[method-assign]
 
-    hooks.append(hook)
+    h = _Hook(hook, owner, value, timeout, early)
+    for other in before:
+        other.waits_for.append(h)
+    hooks.append(h)
+    if (obs := _observe.observer) is not None:
+        obs.live(asyncio.get_running_loop(), len(hooks))
+    return h
+
+
+def _hooks_of(obj: object) -> list[_Hook]:
+    # the hooks registered by obj or by what has produced obj
+    if obj is None:
+        return []
+    ls = asyncio_loop_local._storage.storage()  # noqa: SLF001
+    hooks = ls.get(atexit_key_sentinel, ())
+    return [h for h in hooks if obj is h.owner or obj is h.value]
+
+
+def _unregister(hook: _Hook) -> None:
+    ls = asyncio_loop_local._storage.storage()  # noqa: SLF001
+    hooks = ls[atexit_key_sentinel]
+    hooks.remove(hook)
+    for h in hooks:
+        if hook in h.waits_for:
+            h.waits_for.remove(hook)
+    if (obs := _observe.observer) is not None:
+        obs.live(asyncio.get_running_loop(), len(hooks))
+
+
+def _default_timeout() -> float | None:
+    ls = asyncio_loop_local._storage.storage()  # noqa: SLF001
+    timeouts: _Timeouts = ls.get(atexit_timeouts_sentinel, _Timeouts())
+    return timeouts.hook
+
+
+def set_teardown_timeouts(
+    *,
+    hook: float | None = None,
+    total: float | None = None,
+) -> None:
+    """Limit how long the current loop's teardown can take, in seconds.
+
+    ``hook`` applies to every deferred ``__aexit__``
+    that hasn't been given its own ``timeout``,
+    ``total`` caps the whole teardown.
+    Hooks running over are cancelled and reported as ``TimeoutError``'s.
+    """
+    ls = asyncio_loop_local._storage.storage()  # noqa: SLF001
+    ls[atexit_timeouts_sentinel] = _Timeouts(hook, total)
+
+
+async def _run(
+    h: _Hook,
+    tasks: dict[_Hook, asyncio.Future[None]],
+    early: list[_Hook],
+    default_timeout: float | None,
+) -> None:
+    waits_for = h.waits_for if h.early else [*early, *h.waits_for]
+    if waits_for:  # wait for dependents, failed or not
+        await asyncio.wait([tasks[w] for w in waits_for])
+    await _call(h, default_timeout)
+
+
+async def _call(h: _Hook, default_timeout: float | None) -> None:
+    if (obs := _observe.observer) is None:
+        await _call_with_timeout(h, default_timeout)
+        return
+    t0 = time.perf_counter()
+    try:
+        await _call_with_timeout(h, default_timeout)
+    except BaseException as ex:
+        obs.aexit(h.owner, time.perf_counter() - t0, ex)
+        raise
+    obs.aexit(h.owner, time.perf_counter() - t0, None)
+
+
+async def _call_with_timeout(h: _Hook, default_timeout: float | None) -> None:
+    t = default_timeout if h.timeout is None else h.timeout
+    deadline = asyncio.timeout(t)
+    try:
+        async with deadline:
+            await h.func()
+    except TimeoutError as ex:
+        if not deadline.expired():  # the hook's own TimeoutError
+            raise
+        msg = f'atexit hook for {h.owner!r} timed out after {t}s'
+        raise TimeoutError(msg) from ex
 
 
 async def _fire() -> None:
@@ -36,9 +203,46 @@ async def _fire() -> None:
         hooks = ls[atexit_key_sentinel]
     except KeyError:
         return
-    for hook in hooks[::-1]:
-        await hook
+    timeouts = ls.get(atexit_timeouts_sentinel, _Timeouts())
+
+    tasks: dict[_Hook, asyncio.Future[None]] = {}
+    early = [h for h in hooks if h.early]
+    for h in hooks[::-1]:  # start in reverse order, just in case
+        tasks[h] = asyncio.ensure_future(
+            _run(h, tasks, early, timeouts.hook),
+        )
+    pending: set[asyncio.Future[None]] = set()
+    if tasks:  # could've been emptied, e.g., by _warn_unfired
+        _, pending = await asyncio.wait(tasks.values(), timeout=timeouts.total)
+    for task in pending:
+        task.cancel()
+    results = await asyncio.gather(*tasks.values(), return_exceptions=True)
     del ls[atexit_key_sentinel]
+    hooks.finalizer.detach()
+    if (obs := _observe.observer) is not None:
+        obs.live(asyncio.get_running_loop(), 0)
+
+    errors: list[BaseException] = []
+    for (h, task), r in zip(tasks.items(), results, strict=True):
+        if task in pending:
+            msg = (
+                f'atexit hook for {h.owner!r} cancelled, '
+                f'teardown took over {timeouts.total}s'
+            )
+            errors.append(TimeoutError(msg))
+        elif isinstance(r, BaseException):
+            errors.append(r)
+    if errors:
+        msg = 'loop-local atexit hooks failed'
+        raise BaseExceptionGroup(msg, errors)
 
 
-__all__ = ['_fire', '_register']
+__all__ = [
+    '_call',
+    '_default_timeout',
+    '_fire',
+    '_hooks_of',
+    '_register',
+    '_unregister',
+    'set_teardown_timeouts',
+]
@@ -0,0 +1,182 @@
+# SPDX-FileCopyrightText: 2023 Alexander Sosedkin <monk@unboiled.info>
+# SPDX-License-Identifier: GPL-3.0
+
+"""Coalesce single-key calls into calls of a bulk async function.
+
+Keys requested within ``max_delay`` seconds of the first one
+(or until there's ``max_batch_size`` of them)
+are fetched with a single call, each caller gets its own result.
+"""
+
+import asyncio
+import collections.abc
+import functools
+import inspect
+import typing
+
+import asyncio_loop_local._atexit
+import asyncio_loop_local._storage
+
+_K = typing.TypeVar('_K', bound=typing.Hashable)
+_V = typing.TypeVar('_V')
+_Bulk = typing.Callable[
+    [list[_K]],
+    typing.Coroutine[typing.Any, typing.Any, collections.abc.Sequence[_V]],
+]
+_Single = typing.Callable[[_K], typing.Coroutine[typing.Any, typing.Any, _V]]
+
+batcher_sentinel = object()
+
+
+class _Config(typing.NamedTuple):
+    max_batch_size: int | None
+    max_delay: float
+
+
+class _Batcher:
+    # the pending and the in-flight batches of a single function in one loop
+
+    def __init__(
+        self: typing.Self,
+        bulk: _Bulk[typing.Any, typing.Any],
+        config: _Config,
+    ) -> None:
+        self.bulk = bulk
+        self.config = config
+        self.pending: dict[typing.Hashable, asyncio.Future[typing.Any]] = {}
+        self.timer: asyncio.TimerHandle | None = None
+        self.in_flight: set[asyncio.Task[None]] = set()
+
+    def add(
+        self: typing.Self,
+        k: typing.Hashable,
+    ) -> asyncio.Future[typing.Any]:
+        if (fut := self.pending.get(k)) is not None:
+            return fut  # requested twice in one batch
+        loop = asyncio.get_running_loop()
+        fut = self.pending[k] = loop.create_future()
+        max_batch_size = self.config.max_batch_size
+        if max_batch_size is not None and len(self.pending) >= max_batch_size:
+            self.flush()
+        elif self.timer is None:
+            self.timer = loop.call_later(self.config.max_delay, self.flush)
+        return fut
+
+    def flush(self: typing.Self) -> None:
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        if not self.pending:
+            return
+        batch, self.pending = self.pending, {}
+        task = asyncio.get_running_loop().create_task(self._run(batch))
+        self.in_flight.add(task)
+        task.add_done_callback(self.in_flight.discard)
+
+    async def _run(
+        self: typing.Self,
+        batch: dict[typing.Hashable, asyncio.Future[typing.Any]],
+    ) -> None:
+        try:
+            results = await self.bulk(list(batch))
+            if len(results) != len(batch):
+                msg = (
+                    f'{self.bulk!r} returned {len(results)} results '
+                    f'for {len(batch)} keys'
+                )
+                raise ValueError(msg)  # noqa: TRY301
+        except asyncio.CancelledError:
+            for fut in batch.values():
+                fut.cancel()
+            raise
+        except Exception as ex:  # noqa: BLE001
+            for fut in batch.values():
+                fut.set_exception(ex)
+        else:
+            for fut, r in zip(batch.values(), results, strict=True):
+                fut.set_result(r)
+
+    async def drain(self: typing.Self, token: object) -> None:
+        # the atexit hook: forget, send the pending batch, wait for them all
+        del _batchers()[token]  # the next call gets a fresh one
+        self.flush()
+        if self.in_flight:
+            await asyncio.wait(self.in_flight)
+
+
+def _batchers() -> dict[object, _Batcher]:
+    ls = asyncio_loop_local._storage.storage()  # noqa: SLF001
+    try:
+        return typing.cast(dict[object, _Batcher], ls[batcher_sentinel])
+    except KeyError:
+        batchers: dict[object, _Batcher] = {}
+        ls[batcher_sentinel] = batchers
+        return batchers
+
+
+class _Decorator(typing.Protocol):
+    # like _singleton._AsyncDecorator, but turning bulk into single
+    def __call__(
+        self: typing.Self,
+        bulk: _Bulk[_K, _V],
+        /,
+    ) -> _Single[_K, _V]: ...  # pragma: no cover
+
+
+@typing.overload  # for decorating with batcher()
+def batcher(
+    bulk: None = None,
+    *,
+    max_batch_size: int | None = None,
+    max_delay: float = 0,
+) -> _Decorator: ...  # overload
+
+
+@typing.overload  # for decorating with batcher
+def batcher(
+    bulk: _Bulk[_K, _V],
+    *,
+    max_batch_size: int | None = None,
+    max_delay: float = 0,
+) -> _Single[_K, _V]: ...  # overload
+
+
+def batcher(
+    bulk: _Bulk[_K, _V] | None = None,
+    *,
+    max_batch_size: int | None = None,
+    max_delay: float = 0,
+) -> _Single[_K, _V] | _Decorator:
+    if max_batch_size is not None and max_batch_size < 1:
+        msg = f'max_batch_size must be positive, got {max_batch_size}'
+        raise ValueError(msg)
+    config = _Config(max_batch_size, max_delay)
+    if bulk is None:
+        return functools.partial(_batchify, config=config)
+    return _batchify(bulk, config=config)
+
+
+def _batchify(bulk: _Bulk[_K, _V], *, config: _Config) -> _Single[_K, _V]:
+    if not inspect.iscoroutinefunction(bulk):
+        msg = f'batcher only works on async functions, not {bulk!r}'
+        raise TypeError(msg)
+    token = object()  # the same function can be decorated twice
+
+    @functools.wraps(bulk)
+    async def batched(k: _K) -> _V:
+        batchers = _batchers()
+        try:
+            b = batchers[token]
+        except KeyError:
+            b = batchers[token] = _Batcher(bulk, config)
+            asyncio_loop_local._atexit._register(  # noqa: SLF001
+                functools.partial(b.drain, token),
+                owner=batched,
+                early=True,  # before the resources the batches may need
+            )
+        return typing.cast(_V, await asyncio.shield(b.add(k)))
+
+    return batched
+
+
+__all__ = ['batcher']
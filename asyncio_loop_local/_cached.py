@@ -0,0 +1,258 @@
+# SPDX-FileCopyrightText: 2023 Alexander Sosedkin <monk@unboiled.info>
+# SPDX-License-Identifier: GPL-3.0
+
+"""Loop-local memoization of async functions.
+
+Results can expire (``ttl``), be served stale for a while
+as they're refreshed in the background (``stale_ttl``),
+and failures can be cached too (``negative_ttl``).
+"""
+
+import asyncio
+import collections
+import functools
+import heapq
+import inspect
+import itertools
+import math
+import time
+import typing
+
+import asyncio_loop_local._observe
+import asyncio_loop_local._singleton
+import asyncio_loop_local._storage
+
+_P = typing.ParamSpec('_P')
+_T = typing.TypeVar('_T')
+_AsyncFunc = typing.Callable[_P, typing.Coroutine[typing.Any, typing.Any, _T]]
+_Decorator = asyncio_loop_local._singleton._AsyncDecorator  # noqa: SLF001
+_Key = typing.Hashable
+_KeyFunc = asyncio_loop_local._singleton._KeyFunc  # noqa: SLF001
+_observe = asyncio_loop_local._observe  # noqa: SLF001
+_CacheInfo = asyncio_loop_local._singleton.CacheInfo  # noqa: SLF001
+
+cached_sentinel = object()
+
+
+class _Memo:
+    # a cached (or in-flight) result
+    __slots__ = ('fresh_until', 'fut', 'refreshing', 'stale_until')
+
+    fut: asyncio.Future[typing.Any]
+    fresh_until: float  # time.monotonic() deadlines
+    stale_until: float
+    refreshing: bool
+
+    def __init__(self: typing.Self, fut: asyncio.Future[typing.Any]) -> None:
+        self.fut = fut
+        self.fresh_until = self.stale_until = math.inf  # while in flight
+        self.refreshing = False
+
+
+class _Config(typing.NamedTuple):
+    ttl: float | None
+    maxsize: int | None
+    stale_ttl: float | None
+    negative_ttl: float | None
+
+
+class _MemoCache(collections.OrderedDict[_Key, _Memo]):
+    # memoized results of a single function in a single loop
+
+    def __init__(self: typing.Self, config: _Config) -> None:
+        super().__init__()
+        self.config = config
+        self.hits = self.misses = self.evictions = 0
+        self.refreshes: set[asyncio.Task[typing.Any]] = set()
+        # a heap of (stale_until, tiebreaker, key, memo), so that the memos
+        # that are never asked for again get dropped too
+        self.expiry: list[tuple[float, int, _Key, _Memo]] = []
+        self.tiebreakers = itertools.count()
+
+    def start(
+        self: typing.Self,
+        k: _Key,
+        coro: typing.Coroutine[typing.Any, typing.Any, typing.Any],
+    ) -> _Memo:
+        memo = _Memo(asyncio.ensure_future(coro))
+        memo.fut.add_done_callback(functools.partial(self._settle, k, memo))
+        self[k] = memo
+        self._expire(time.monotonic())
+        if self.config.maxsize is not None:
+            while len(self) > self.config.maxsize:
+                self.popitem(last=False)
+                self.evictions += 1
+        return memo
+
+    def _settle(
+        self: typing.Self,
+        k: _Key,
+        memo: _Memo,
+        fut: asyncio.Future[typing.Any],
+    ) -> None:
+        now = time.monotonic()
+        cfg = self.config
+        if not fut.cancelled() and fut.exception() is None:
+            if cfg.ttl is not None:
+                memo.fresh_until = now + cfg.ttl
+                memo.stale_until = memo.fresh_until + (cfg.stale_ttl or 0)
+                self._expire_later(k, memo)
+        elif not fut.cancelled() and cfg.negative_ttl is not None:
+            memo.fresh_until = memo.stale_until = now + cfg.negative_ttl
+            self._expire_later(k, memo)
+        elif self.get(k) is memo:
+            del self[k]
+
+    def _expire_later(self: typing.Self, k: _Key, memo: _Memo) -> None:
+        item = memo.stale_until, next(self.tiebreakers), k, memo
+        heapq.heappush(self.expiry, item)
+
+    def _expire(self: typing.Self, now: float) -> None:
+        # the memos refreshed since have been pushed again, later ones
+        expiry = self.expiry
+        while expiry and expiry[0][0] <= now:
+            _, _, k, memo = heapq.heappop(expiry)
+            if self.get(k) is memo and memo.stale_until <= now:
+                del self[k]
+
+    def refresh(
+        self: typing.Self,
+        k: _Key,
+        memo: _Memo,
+        coro: typing.Coroutine[typing.Any, typing.Any, typing.Any],
+    ) -> None:
+        # on the owning loop, serving the stale result meanwhile
+        memo.refreshing = True
+        task = asyncio.get_running_loop().create_task(coro)
+        self.refreshes.add(task)
+        task.add_done_callback(self.refreshes.discard)
+        task.add_done_callback(functools.partial(self._refreshed, k, memo))
+
+    def _refreshed(
+        self: typing.Self,
+        k: _Key,
+        memo: _Memo,
+        task: asyncio.Task[typing.Any],
+    ) -> None:
+        memo.refreshing = False
+        if task.cancelled() or task.exception() is not None:
+            return  # keep serving the stale one until it's too stale
+        memo.fut = task
+        now = time.monotonic()
+        ttl = typing.cast(float, self.config.ttl)  # ttl is set to go stale
+        memo.fresh_until = now + ttl
+        memo.stale_until = memo.fresh_until + (self.config.stale_ttl or 0)
+        self._expire_later(k, memo)
+
+    def info(self: typing.Self) -> _CacheInfo:
+        return _CacheInfo(
+            self.hits,
+            self.misses,
+            self.evictions,
+            self.config.maxsize,
+            len(self),
+        )
+
+
+def _cache(token: object, config: _Config) -> _MemoCache:
+    # by a per-decoration token, as the same function can be decorated twice
+    ls = asyncio_loop_local._storage.storage()  # noqa: SLF001
+    try:
+        caches = ls[cached_sentinel]
+    except KeyError:
+        caches = ls[cached_sentinel] = {}
+    try:
+        return typing.cast(_MemoCache, caches[token])
+    except KeyError:
+        mc = caches[token] = _MemoCache(config)
+        return mc
+
+
+@typing.overload  # for decorating with cached()
+def cached(
+    f: None = None,
+    *,
+    ttl: float | None = None,
+    maxsize: int | None = None,
+    stale_ttl: float | None = None,
+    negative_ttl: float | None = None,
+    key: _KeyFunc | None = None,
+) -> _Decorator: ...  # overload
+
+
+@typing.overload  # for decorating with cached
+def cached(
+    f: _AsyncFunc[_P, _T],
+    *,
+    ttl: float | None = None,
+    maxsize: int | None = None,
+    stale_ttl: float | None = None,
+    negative_ttl: float | None = None,
+    key: _KeyFunc | None = None,
+) -> _AsyncFunc[_P, _T]: ...  # overload
+
+
+def cached(  # noqa: PLR0913
+    f: _AsyncFunc[_P, _T] | None = None,
+    *,
+    ttl: float | None = None,
+    maxsize: int | None = None,
+    stale_ttl: float | None = None,
+    negative_ttl: float | None = None,
+    key: _KeyFunc | None = None,
+) -> _AsyncFunc[_P, _T] | _Decorator:
+    if maxsize is not None and maxsize < 1:
+        msg = f'maxsize must be positive, got {maxsize}'
+        raise ValueError(msg)
+    if stale_ttl is not None and ttl is None:
+        msg = 'stale_ttl makes no sense without ttl'
+        raise ValueError(msg)
+    config = _Config(ttl, maxsize, stale_ttl, negative_ttl)
+    if f is None:
+        return functools.partial(_cachify, config=config, key=key)
+    return _cachify(f, config=config, key=key)
+
+
+def _cachify(
+    f: _AsyncFunc[_P, _T],
+    *,
+    config: _Config,
+    key: _KeyFunc | None,
+) -> _AsyncFunc[_P, _T]:
+    if not inspect.iscoroutinefunction(f):
+        msg = f'cached only works on async functions, not {f!r}'
+        raise TypeError(msg)
+    key_func = key or asyncio_loop_local._singleton._make_key_func(f)  # noqa: SLF001
+    token = object()
+
+    @functools.wraps(f)
+    async def memoized(*args: _P.args, **kwargs: _P.kwargs) -> _T:
+        mc = _cache(token, config)
+        k = key_func(*args, **kwargs)
+        now = time.monotonic()
+        memo = mc.get(k)
+        if memo is not None and memo.stale_until <= now:
+            del mc[k]
+            memo = None
+        if memo is None:
+            mc.misses += 1
+            if (obs := _observe.observer) is not None:
+                obs.miss('cached', f)
+            memo = mc.start(k, f(*args, **kwargs))
+        else:
+            mc.hits += 1
+            if (obs := _observe.observer) is not None:
+                obs.hit('cached', f)
+            if config.maxsize is not None:
+                mc.move_to_end(k)
+            if memo.fresh_until <= now and not memo.refreshing:
+                mc.refresh(k, memo, f(*args, **kwargs))
+        return typing.cast(_T, await asyncio.shield(memo.fut))
+
+    memoized.cache_info = (  # type: ignore[attr-defined]
+        lambda: _cache(token, config).info()
+    )
+    return memoized
+
+
+__all__ = ['cached']
@@ -4,21 +4,52 @@
 """Enter context now, exit when the loop shuts down."""
 
 import contextlib
+import functools
+import time
 import typing
 
 import asyncio_loop_local._atexit
+import asyncio_loop_local._observe
 
 _T = typing.TypeVar('_T')
 _ACM = contextlib.AbstractAsyncContextManager
-
-
-async def enter(acm: _ACM[_T]) -> _T:
-    ret = await acm.__aenter__()  # noqa: PLC2801
-
-    async def aexit_hook() -> None:
-        await acm.__aexit__(None, None, None)
-
-    asyncio_loop_local._atexit._register(aexit_hook())  # noqa: SLF001
+_observe = asyncio_loop_local._observe  # noqa: SLF001
+
+
+async def enter(
+    acm: _ACM[_T],
+    *,
+    depends_on: typing.Iterable[_ACM[typing.Any]] = (),
+    exit_timeout: float | None = None,
+) -> _T:
+    # acms in depends_on get exited only after this one is,
+    # exit_timeout limits how long __aexit__ may take at loop shutdown
+    before = []
+    for dep in depends_on:
+        hooks = asyncio_loop_local._atexit._hooks_of(dep)  # noqa: SLF001
+        if not hooks:
+            msg = f'{dep!r} has not been entered in this loop'
+            raise LookupError(msg)
+        before.extend(hooks)
+
+    if (obs := _observe.observer) is None:
+        ret = await acm.__aenter__()  # noqa: PLC2801
+    else:
+        t0 = time.perf_counter()
+        try:
+            ret = await acm.__aenter__()  # noqa: PLC2801
+        except BaseException as ex:
+            obs.aenter(acm, time.perf_counter() - t0, ex)
+            raise
+        obs.aenter(acm, time.perf_counter() - t0, None)
+
+    asyncio_loop_local._atexit._register(  # noqa: SLF001
+        functools.partial(acm.__aexit__, None, None, None),
+        owner=acm,
+        value=ret,
+        before=before,
+        timeout=exit_timeout,
+    )
 
     return ret
 
@@ -5,35 +5,85 @@
 
 import asyncio
 import contextlib
+import time
 import typing
 
 import asyncio_loop_local._enter
+import asyncio_loop_local._observe
+import asyncio_loop_local._storage
 
 _T = typing.TypeVar('_T')
 _ACM = contextlib.AbstractAsyncContextManager
+_observe = asyncio_loop_local._observe  # noqa: SLF001
 
 
 enter_once_sentinel = object()
 
 
-class _LockingDict(asyncio.Lock, dict[_ACM[_T], _T]):
-    pass
+class _Slot(asyncio.Lock, typing.Generic[_T]):
+    # one per key, so that slow __aenter__'s don't block unrelated ones
+    entered: bool = False
+    value: _T
+    hits: int = 0
+    waiting: int = 0  # callers on the slow path, holding the lock or not
 
 
-async def enter_once(acm: _ACM[_T]) -> _T:
+async def enter_once(
+    acm: _ACM[_T],
+    *,
+    depends_on: typing.Iterable[_ACM[typing.Any]] = (),
+    exit_timeout: float | None = None,
+) -> _T:
     ls = asyncio_loop_local._storage.storage()  # noqa: SLF001
-    c: _LockingDict[_T]
+    c: dict[_ACM[_T], _Slot[_T]]
     try:
         c = ls[enter_once_sentinel]
     except KeyError:
-        c = ls[enter_once_sentinel] = _LockingDict()
-
-    async with c:
-        try:
-            return c[acm]
-        except KeyError:
-            pass
-        c[acm] = r = await asyncio_loop_local._enter.enter(acm)  # noqa: SLF001
+        c = ls[enter_once_sentinel] = {}
+
+    try:
+        slot = c[acm]
+    except KeyError:
+        slot = c[acm] = _Slot()
+    if slot.entered:  # fast path, no locking
+        slot.hits += 1
+        if (obs := _observe.observer) is not None:
+            obs.hit('enter_once', acm)
+        return slot.value
+
+    slot.waiting += 1
+    try:
+        return await _enter_slot(slot, acm, depends_on, exit_timeout)
+    finally:
+        slot.waiting -= 1
+        # failed (or cancelled) and nobody's going to retry, don't leak it
+        if not slot.waiting and not slot.entered and c.get(acm) is slot:
+            del c[acm]
+
+
+async def _enter_slot(
+    slot: _Slot[_T],
+    acm: _ACM[_T],
+    depends_on: typing.Iterable[_ACM[typing.Any]],
+    exit_timeout: float | None,
+) -> _T:
+    t0 = time.perf_counter()
+    async with slot:
+        if (obs := _observe.observer) is not None:
+            obs.lock_wait('enter_once', acm, time.perf_counter() - t0)
+        if slot.entered:
+            slot.hits += 1
+            if obs is not None:
+                obs.hit('enter_once', acm)
+            return slot.value
+        if obs is not None:
+            obs.miss('enter_once', acm)
+        r = await asyncio_loop_local._enter.enter(  # noqa: SLF001
+            acm,
+            depends_on=depends_on,
+            exit_timeout=exit_timeout,
+        )
+        slot.value, slot.entered = r, True
         return r
 
 
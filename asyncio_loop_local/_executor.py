@@ -0,0 +1,147 @@
+# SPDX-FileCopyrightText: 2023 Alexander Sosedkin <monk@unboiled.info>
+# SPDX-License-Identifier: GPL-3.0
+
+"""Named loop-local executors, shut down without blocking the loop."""
+
+import asyncio
+import concurrent.futures
+import functools
+import os
+import threading
+import typing
+
+import asyncio_loop_local._atexit
+import asyncio_loop_local._observe
+import asyncio_loop_local._storage
+
+_Kind = typing.Literal['thread', 'process']
+_Factory = typing.Callable[[int | None], concurrent.futures.Executor]
+_KINDS: dict[_Kind, _Factory] = {
+    'thread': concurrent.futures.ThreadPoolExecutor,
+    'process': concurrent.futures.ProcessPoolExecutor,
+}
+_Executors = dict[str, concurrent.futures.Executor]
+_observe = asyncio_loop_local._observe  # noqa: SLF001
+
+executor_sentinel = object()
+
+
+def _executors() -> _Executors:
+    ls = asyncio_loop_local._storage.storage()  # noqa: SLF001
+    try:
+        return typing.cast(_Executors, ls[executor_sentinel])
+    except KeyError:
+        executors: _Executors = {}
+        ls[executor_sentinel] = executors
+        return executors
+
+
+async def executor(
+    name: str = 'default',
+    *,
+    kind: _Kind | None = None,
+    max_workers: int | None = None,
+    install_default: bool = False,
+    warm_up: bool = False,
+) -> concurrent.futures.Executor:
+    """Get the loop-local executor called ``name``, creating it if needed.
+
+    ``kind`` is ``'thread'`` (the default) or ``'process'``,
+    ``max_workers`` is passed to the executor's constructor.
+    Both only matter for creating it, and asking for an existing one
+    with different ones specified explicitly is a ``ValueError``.
+    ``install_default`` makes a thread pool the loop's default executor,
+    the one ``loop.run_in_executor(None, ...)`` uses.
+    ``warm_up`` spawns all the workers right away on creating it
+    to spare the first calls the startup latency.
+    The executor is shut down at the end of the loop (or on ``release``)
+    in a dedicated thread, so that the loop keeps running meanwhile;
+    if it's the loop's default one, the loop goes back to making its own.
+    """
+    executors = _executors()
+    try:
+        ex = executors[name]
+    except KeyError:
+        if (obs := _observe.observer) is not None:
+            obs.miss('executor', name)
+        ex = executors[name] = _KINDS[kind or 'thread'](max_workers)
+        asyncio_loop_local._atexit._register(  # noqa: SLF001
+            functools.partial(_shutdown, name, ex),
+            owner=ex,
+            value=ex,
+        )
+        if warm_up:
+            await _warm_up(ex)
+    else:
+        if (obs := _observe.observer) is not None:
+            obs.hit('executor', name)
+        _check(name, ex, kind, max_workers)
+
+    if install_default:
+        if not isinstance(ex, concurrent.futures.ThreadPoolExecutor):
+            msg = f'only a thread pool can be the default executor, not {ex!r}'
+            raise ValueError(msg)
+        asyncio.get_running_loop().set_default_executor(ex)
+    return ex
+
+
+async def _warm_up(ex: concurrent.futures.Executor) -> None:
+    # workers are spawned on submitting when none of them are idle
+    n = _size(ex)
+    job: typing.Callable[[], object]
+    if isinstance(ex, concurrent.futures.ThreadPoolExecutor):
+        job = threading.Barrier(n).wait  # keeps them all busy till the last
+    else:  # a best effort, as a barrier can't be pickled
+        job = os.getpid
+    loop = asyncio.get_running_loop()
+    await asyncio.gather(*(loop.run_in_executor(ex, job) for _ in range(n)))
+
+
+def _check(
+    name: str,
+    ex: concurrent.futures.Executor,
+    kind: _Kind | None,
+    max_workers: int | None,
+) -> None:
+    if kind is not None and type(ex) is not _KINDS[kind]:
+        msg = f'executor {name!r} is {ex!r}, not a {kind} pool'
+        raise ValueError(msg)
+    if max_workers is not None and max_workers != _size(ex):
+        msg = f'executor {name!r} has {_size(ex)} workers, not {max_workers}'
+        raise ValueError(msg)
+
+
+def _size(ex: concurrent.futures.Executor) -> int:
+    # both the thread and the process pools have it, defaults resolved
+    return typing.cast(int, ex._max_workers)  # type: ignore[attr-defined]  # noqa: SLF001
+
+
+def _shutdown_in_thread(
+    ex: concurrent.futures.Executor,
+    done: concurrent.futures.Future[None],
+) -> None:
+    try:
+        ex.shutdown(wait=True)
+    except BaseException as e:  # noqa: BLE001
+        done.set_exception(e)
+    else:
+        done.set_result(None)
+
+
+async def _shutdown(name: str, ex: concurrent.futures.Executor) -> None:
+    # like loop.shutdown_default_executor, waiting for the workers
+    # in a thread of its own, as the executor can't be used for that
+    del _executors()[name]  # the next executor(name) gets a fresh one
+    loop = asyncio.get_running_loop()  # make it create a new default one
+    if loop._default_executor is ex:  # type: ignore[attr-defined]  # noqa: SLF001
+        loop._default_executor = None  # type: ignore[attr-defined]  # noqa: SLF001
+    done: concurrent.futures.Future[None] = concurrent.futures.Future()
+    threading.Thread(
+        target=_shutdown_in_thread,
+        args=(ex, done),
+        name=f'asyncio_loop_local executor {name!r} shutdown',
+    ).start()
+    await asyncio.wrap_future(done)
+
+
+__all__ = ['executor']
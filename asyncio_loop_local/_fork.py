@@ -0,0 +1,97 @@
+# SPDX-FileCopyrightText: 2023 Alexander Sosedkin <monk@unboiled.info>
+# SPDX-License-Identifier: GPL-3.0
+
+"""Fork-safety and pre-fork warm-up.
+
+A forked child inherits the parent's loops along with their storages,
+but it can't use them, and exiting their resources from the child
+(e.g., closing sockets of the cached sessions) would break the parent.
+So the child forgets them without exiting anything.
+
+Process-scope singletons, on the other hand, are meant to be shared.
+Building them before forking lets children share them copy-on-write.
+"""
+
+import contextlib
+import os
+import sys
+import threading
+import typing
+import weakref
+
+_WarmUp = tuple[
+    typing.Callable[..., typing.Any],
+    tuple[typing.Any, ...],
+    dict[str, typing.Any],
+]
+_Storage = dict[typing.Any, typing.Any]
+_warm_ups: list[_WarmUp] = []
+# inherited storages, kept referenced so that nothing gets finalized
+_abandoned: list[_Storage] = []
+
+
+def register_warm_up(
+    f: typing.Callable[..., typing.Any],
+    /,
+    *args: typing.Any,  # noqa: ANN401
+    **kwargs: typing.Any,  # noqa: ANN401
+) -> None:
+    """Schedule ``f(*args, **kwargs)`` to be called by ``warm_up``.
+
+    Meant for expensive pure-CPU initialization,
+    like ``singleton(scope='process')``-decorated callables,
+    since it runs outside of any event loop.
+    Pending warm-ups are also run right before forking.
+    """
+    _warm_ups.append((f, args, kwargs))
+
+
+def warm_up() -> None:
+    """Run the pending warm-ups, each one only once."""
+    while _warm_ups:
+        f, args, kwargs = _warm_ups[0]
+        f(*args, **kwargs)
+        del _warm_ups[0]
+
+
+def _before_fork() -> None:
+    # errors end up reported with sys.unraisablehook, not raised
+    warm_up()
+
+
+def _after_fork_in_child() -> None:  # pragma: no cover
+    # only runs in forked children, where coverage isn't measured;
+    # only the modules imported by now can hold any state to take care of
+    storage = sys.modules.get('asyncio_loop_local._storage')
+    if storage is not None:
+        _abandon(storage._loop_local_storages)  # noqa: SLF001
+    singleton = sys.modules.get('asyncio_loop_local._singleton')
+    if singleton is not None:
+        for sc in singleton._process_caches.values():  # noqa: SLF001
+            sc.lock = threading.Lock()
+
+
+def _abandon(  # pragma: no cover
+    storages: weakref.WeakKeyDictionary[typing.Any, _Storage],
+) -> None:
+    atexit = sys.modules.get('asyncio_loop_local._atexit')
+    for loop, ls in list(storages.items()):
+        if atexit is not None:
+            hooks = ls.get(atexit.atexit_key_sentinel)
+            if hooks is not None:  # never fire nor warn about them
+                hooks.finalizer.detach()
+                hooks.clear()
+        _abandoned.append(ls)
+        with contextlib.suppress(AttributeError):
+            del loop._asyncio_loop_local_storage  # noqa: SLF001
+    storages.clear()
+
+
+with contextlib.suppress(AttributeError):  # not on Windows
+    os.register_at_fork(
+        before=_before_fork,
+        after_in_child=_after_fork_in_child,
+    )
+
+
+__all__ = ['register_warm_up', 'warm_up']
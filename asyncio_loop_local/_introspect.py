@@ -0,0 +1,162 @@
+# SPDX-FileCopyrightText: 2023 Alexander Sosedkin <monk@unboiled.info>
+# SPDX-License-Identifier: GPL-3.0
+
+"""Snapshots of what's alive in loop-local storages, to hunt leaks."""
+
+import asyncio
+import gc
+import sys
+import time
+import types
+import typing
+
+import asyncio_loop_local._atexit
+import asyncio_loop_local._enter_once
+import asyncio_loop_local._singleton
+import asyncio_loop_local._sticky_acm
+import asyncio_loop_local._storage
+
+_atexit = asyncio_loop_local._atexit  # noqa: SLF001
+_enter_once = asyncio_loop_local._enter_once  # noqa: SLF001
+_singleton = asyncio_loop_local._singleton  # noqa: SLF001
+_storage = asyncio_loop_local._storage  # noqa: SLF001
+_sticky_acm = asyncio_loop_local._sticky_acm  # noqa: SLF001
+
+# not worth descending into when estimating sizes
+_OPAQUE = (
+    type,
+    types.ModuleType,
+    types.FunctionType,
+    asyncio.AbstractEventLoop,
+)
+
+
+class ResourceInfo(typing.NamedTuple):
+    """Something entered in a loop and awaiting its teardown."""
+
+    acm: object
+    value: object  # what its __aenter__ has returned
+    age: float  # seconds since entering
+    hits: int  # reuses through enter_once/sticky_acm
+    exit_timeout: float | None
+    size: int | None  # deep size estimate in bytes, if asked for
+
+
+class SingletonInfo(typing.NamedTuple):
+    """A value cached by a singleton-decorated callable in a loop."""
+
+    callable: object
+    key: object  # normalized arguments
+    value: object
+    age: float  # seconds since creation
+    hits: int  # counted like in CacheInfo
+    size: int | None  # deep size estimate in bytes, if asked for
+
+
+class LoopSnapshot(typing.NamedTuple):
+    """What's alive in a single loop."""
+
+    loop: asyncio.AbstractEventLoop
+    resources: list[ResourceInfo]
+    singletons: list[SingletonInfo]
+    pending_hooks: int  # atexit hooks to fire on loop shutdown
+
+
+def _deep_size(obj: object) -> int:
+    # follows references, except for the _OPAQUE ones;
+    # shared objects are counted by every object referencing them
+    seen: set[int] = set()
+    todo = [obj]
+    size = 0
+    while todo:
+        o = todo.pop()
+        if id(o) in seen or isinstance(o, _OPAQUE):
+            continue
+        seen.add(id(o))
+        size += sys.getsizeof(o)
+        todo.extend(gc.get_referents(o))
+    return size
+
+
+def snapshot(
+    loop: asyncio.AbstractEventLoop | None = None,
+    *,
+    sizes: bool = False,
+) -> LoopSnapshot:
+    """Describe what's alive in a loop, the running one by default.
+
+    With ``sizes=True``, also estimates how much memory each item holds,
+    which is slow.
+    """
+    if loop is None:
+        loop = asyncio.get_running_loop()
+    storages = _storage._loop_local_storages  # noqa: SLF001
+    ls = storages.get(loop, _storage.LoopLocalStorage())
+    return _snapshot(loop, ls, sizes=sizes)
+
+
+def snapshot_all(*, sizes: bool = False) -> list[LoopSnapshot]:
+    """Describe what's alive in all the loops that use loop-local storage."""
+    storages = _storage._loop_local_storages  # noqa: SLF001
+    return [
+        _snapshot(loop, ls, sizes=sizes) for loop, ls in list(storages.items())
+    ]
+
+
+def _snapshot(
+    loop: asyncio.AbstractEventLoop,
+    ls: dict[typing.Any, typing.Any],
+    *,
+    sizes: bool,
+) -> LoopSnapshot:
+    now = time.monotonic()
+
+    hits: dict[int, int] = {}
+    enter_once_cache = ls.get(_enter_once.enter_once_sentinel, {})
+    for acm, slot in enter_once_cache.items():
+        hits[id(acm)] = hits.get(id(acm), 0) + slot.hits
+    sticky_cache = ls.get(_sticky_acm.sticky_acm_sentinel, {})
+    for acm, sticky in sticky_cache.items():
+        hits[id(acm)] = hits.get(id(acm), 0) + sticky._hits  # noqa: SLF001
+
+    hooks = ls.get(_atexit.atexit_key_sentinel, ())
+    resources = [
+        ResourceInfo(
+            h.owner,
+            h.value,
+            now - h.born,
+            hits.get(id(h.owner), 0),
+            h.timeout,
+            _deep_size(h.value) if sizes else None,
+        )
+        for h in hooks
+    ]
+
+    singletons = []
+    singleton_caches = ls.get(_singleton.singleton_cache_key_sentinel, {})
+    for sc in list(singleton_caches.values()):
+        for key, value in list(sc.items()):
+            entry = sc._entries[key]  # noqa: SLF001
+            v = value
+            if (
+                isinstance(v, asyncio.Future)  # from an async singleton
+                and v.done()
+                and not v.cancelled()
+                and v.exception() is None
+            ):
+                v = v.result()
+            singletons.append(
+                SingletonInfo(
+                    sc.owner,
+                    key,
+                    v,
+                    now - entry.born,
+                    entry.hits,
+                    _deep_size(v) if sizes else None,
+                ),
+            )
+
+    return LoopSnapshot(loop, resources, singletons, len(hooks))
+
+
+__all__ = ['snapshot', 'snapshot_all']
@@ -0,0 +1,295 @@
+# SPDX-FileCopyrightText: 2023 Alexander Sosedkin <monk@unboiled.info>
+# SPDX-License-Identifier: GPL-3.0
+
+"""Named loop-local concurrency and rate limiters.
+
+Acquiring an uncontended one neither creates a coroutine
+nor goes through the loop, waiting is fair (first come, first served).
+"""
+
+import abc
+import asyncio
+import collections
+import time
+import types
+import typing
+
+import asyncio_loop_local._observe
+import asyncio_loop_local._sticky_acm
+import asyncio_loop_local._storage
+
+_Kind = typing.Literal['concurrency', 'token_bucket', 'leaky_bucket']
+_Done = asyncio_loop_local._sticky_acm._Done  # noqa: SLF001
+_DONE = asyncio_loop_local._sticky_acm._DONE  # noqa: SLF001
+_observe = asyncio_loop_local._observe  # noqa: SLF001
+
+limiter_sentinel = object()
+
+
+class LimiterInfo(typing.NamedTuple):
+    """Statistics of a limiter in the current loop."""
+
+    acquired: int
+    waited: int  # how many of the acquisitions had to wait
+    wait_time: float  # in total, in seconds
+    max_wait_time: float
+
+
+class Limiter(abc.ABC):
+    """A loop-local limiter, use it with ``async with``.
+
+    ``acquire`` and ``release`` are there for when that doesn't fit.
+    """
+
+    __slots__ = (
+        '_acquired',
+        '_max_wait_time',
+        '_wait_time',
+        '_waited',
+        'burst',
+        'kind',
+        'limit',
+        'name',
+    )
+
+    name: str
+    kind: _Kind
+    limit: float
+    burst: int | None
+
+    def __init__(
+        self: typing.Self,
+        name: str,
+        kind: _Kind,
+        limit: float,
+        burst: int | None,
+    ) -> None:
+        self.name, self.kind, self.limit, self.burst = name, kind, limit, burst
+        self._acquired = self._waited = 0
+        self._wait_time = self._max_wait_time = 0.0
+
+    @abc.abstractmethod
+    def _try_acquire(self: typing.Self) -> bool:
+        """Acquire if it can be done right away, tell whether it was."""
+
+    @abc.abstractmethod
+    async def _wait(self: typing.Self) -> None:
+        """Wait for the turn and acquire."""
+
+    def acquire(self: typing.Self) -> typing.Awaitable[None]:
+        """Wait until allowed to proceed."""
+        # not async, so that the uncontended case doesn't create a coroutine
+        if self._try_acquire():
+            self._acquired += 1
+            return _DONE
+        return self._acquire_waiting()
+
+    async def _acquire_waiting(self: typing.Self) -> None:
+        t0 = time.perf_counter()
+        await self._wait()
+        waited = time.perf_counter() - t0
+        self._acquired += 1
+        self._waited += 1
+        self._wait_time += waited
+        self._max_wait_time = max(self._max_wait_time, waited)
+        if (obs := _observe.observer) is not None:
+            obs.lock_wait('limiter', self.name, waited)
+
+    def release(self: typing.Self) -> None:  # noqa: B027
+        """Let the next one proceed, a no-op for rate limiters."""
+
+    def info(self: typing.Self) -> LimiterInfo:
+        """Return the statistics of this limiter."""
+        return LimiterInfo(
+            self._acquired,
+            self._waited,
+            self._wait_time,
+            self._max_wait_time,
+        )
+
+    def __aenter__(self: typing.Self) -> typing.Awaitable[None]:
+        return self.acquire()
+
+    def __aexit__(
+        self: typing.Self,
+        exc_type: type[BaseException] | None,
+        exc_val: BaseException | None,
+        exc_tb: types.TracebackType | None,
+    ) -> _Done:
+        self.release()
+        return _DONE
+
+    def __repr__(self: typing.Self) -> str:
+        burst = '' if self.burst is None else f', burst={self.burst}'
+        return (
+            f'<{type(self).__name__} {self.name!r} '
+            f'{self.kind}={self.limit}{burst}>'
+        )
+
+
+class _Concurrency(Limiter):
+    # a semaphore handing the released slots over to the waiters directly
+    __slots__ = ('_free', '_waiters')
+
+    _free: int
+    _waiters: collections.deque[asyncio.Future[None]]
+
+    def __init__(self: typing.Self, name: str, limit: int) -> None:
+        super().__init__(name, 'concurrency', limit, None)
+        self._free = limit
+        self._waiters = collections.deque()
+
+    def _try_acquire(self: typing.Self) -> bool:
+        if self._free and not self._waiters:
+            self._free -= 1
+            return True
+        return False
+
+    async def _wait(self: typing.Self) -> None:
+        fut = asyncio.get_running_loop().create_future()
+        self._waiters.append(fut)
+        try:
+            await fut
+        except asyncio.CancelledError:
+            if not fut.cancelled():  # cancelled after being handed a slot
+                self.release()
+            elif fut in self._waiters:  # unless release has skipped it
+                self._waiters.remove(fut)
+            raise
+
+    def release(self: typing.Self) -> None:
+        """Let the next one proceed."""
+        while self._waiters:
+            fut = self._waiters.popleft()
+            if not fut.done():
+                fut.set_result(None)
+                return
+        self._free += 1
+
+
+class _TokenBucket(Limiter):
+    # refilled with limit tokens per second, up to burst of them;
+    # a leaky bucket is the one holding a single token
+    __slots__ = ('_lock', '_tokens', '_updated')
+
+    _tokens: float
+    _updated: float  # time.monotonic() of the last refill
+    _lock: asyncio.Lock  # queues the waiters
+
+    def __init__(
+        self: typing.Self,
+        name: str,
+        kind: _Kind,
+        limit: float,
+        burst: int,
+    ) -> None:
+        super().__init__(name, kind, limit, burst)
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self: typing.Self) -> None:
+        now = time.monotonic()
+        capacity = typing.cast(int, self.burst)
+        refilled = self._tokens + (now - self._updated) * self.limit
+        self._tokens = min(capacity, refilled)
+        self._updated = now
+
+    def _try_acquire(self: typing.Self) -> bool:
+        if self._lock.locked():
+            return False
+        self._refill()
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return True
+        return False
+
+    async def _wait(self: typing.Self) -> None:
+        async with self._lock:
+            self._refill()
+            while self._tokens < 1:
+                await asyncio.sleep((1 - self._tokens) / self.limit)
+                self._refill()
+            self._tokens -= 1
+
+
+def limiter(
+    name: str,
+    *,
+    kind: _Kind | None = None,
+    limit: float | None = None,
+    burst: int | None = None,
+) -> Limiter:
+    """Get the loop-local limiter called ``name``, creating it if needed.
+
+    ``kind`` is one of:
+
+    * ``'concurrency'`` (the default), letting ``limit`` holders at once;
+    * ``'token_bucket'``, letting ``limit`` acquisitions per second through,
+      with bursts of up to ``burst`` (a second's worth by default)
+      after idling;
+    * ``'leaky_bucket'``, letting ``limit`` acquisitions per second through,
+      evenly spaced.
+
+    The settings only matter for creating it, and asking for an existing one
+    with different ones specified explicitly is a ``ValueError``.
+    """
+    ls = asyncio_loop_local._storage.storage()  # noqa: SLF001
+    try:
+        lim: Limiter = ls[limiter_sentinel][name]
+    except KeyError:
+        return _create(ls, name, kind, limit, burst)
+    if kind is not None or limit is not None or burst is not None:
+        _check(lim, kind=kind, limit=limit, burst=burst)
+    return lim
+
+
+def _check(lim: Limiter, **settings: object) -> None:
+    for setting, value in settings.items():
+        if value is not None and value != getattr(lim, setting):
+            msg = f'{lim!r} has a different {setting} than {value!r}'
+            raise ValueError(msg)
+
+
+def _create(
+    ls: asyncio_loop_local._storage.LoopLocalStorage,
+    name: str,
+    kind: _Kind | None,
+    limit: float | None,
+    burst: int | None,
+) -> Limiter:
+    if limit is None:
+        msg = f'no limiter {name!r} yet, specify limit to create it'
+        raise LookupError(msg)
+    lim = _make(name, kind or 'concurrency', limit, burst)
+    ls.setdefault(limiter_sentinel, {})[name] = lim
+    return lim
+
+
+def _make(name: str, kind: _Kind, limit: float, burst: int | None) -> Limiter:
+    if kind not in typing.get_args(_Kind):
+        msg = (
+            "kind must be 'concurrency', 'token_bucket' or 'leaky_bucket', "
+            f'got {kind!r}'
+        )
+        raise ValueError(msg)
+    if limit <= 0:
+        msg = f'limit must be positive, got {limit}'
+        raise ValueError(msg)
+    if kind == 'concurrency':
+        if burst is not None or not isinstance(limit, int):
+            msg = 'concurrency limit must be a whole number, without burst'
+            raise ValueError(msg)
+        return _Concurrency(name, limit)
+    if kind == 'leaky_bucket':
+        if burst not in {None, 1}:
+            msg = 'a leaky bucket does not burst'
+            raise ValueError(msg)
+        return _TokenBucket(name, kind, limit, 1)
+    if burst is not None and burst < 1:
+        msg = f'burst must be positive, got {burst}'
+        raise ValueError(msg)
+    return _TokenBucket(name, kind, limit, burst or max(1, int(limit)))
+
+
+__all__ = ['Limiter', 'limiter']
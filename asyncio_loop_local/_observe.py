@@ -0,0 +1,73 @@
+# SPDX-FileCopyrightText: 2023 Alexander Sosedkin <monk@unboiled.info>
+# SPDX-License-Identifier: GPL-3.0
+
+"""Pluggable observer for metrics and tracing.
+
+When no observer is set, the instrumented code only pays
+for checking a module global against None.
+"""
+
+import asyncio
+import typing
+
+# the current one, if any; not a contextvar, so that checking it is cheap
+observer: 'Observer | None' = None
+
+
+class Observer:
+    """Receives events from loop-local machinery, all no-ops by default.
+
+    Subclass it, override what you need and pass an instance to
+    ``set_observer``.
+    ``kind`` is one of ``'singleton'``, ``'single_flight'``, ``'cached'``,
+    ``'enter_once'``, ``'sticky_acm'``, ``'executor'`` or ``'limiter'``,
+    ``obj`` is the decorated callable or the context manager
+    (or the executor or limiter name).
+    Durations are in seconds. Exceptions propagate to the observed code.
+    """
+
+    def hit(self: typing.Self, kind: str, obj: object) -> None:
+        """Report a cached value being reused."""
+
+    def miss(self: typing.Self, kind: str, obj: object) -> None:
+        """Report a cached value being absent and having to be created."""
+
+    def lock_wait(
+        self: typing.Self,
+        kind: str,
+        obj: object,
+        duration: float,
+    ) -> None:
+        """Report waiting for a lock guarding a concurrent ``__aenter__``."""
+
+    def aenter(
+        self: typing.Self,
+        acm: object,
+        duration: float,
+        exc: BaseException | None,
+    ) -> None:
+        """Report an ``__aenter__`` performed by ``enter``."""
+
+    def aexit(
+        self: typing.Self,
+        acm: object,
+        duration: float,
+        exc: BaseException | None,
+    ) -> None:
+        """Report a deferred ``__aexit__`` (or another atexit hook) done."""
+
+    def live(
+        self: typing.Self,
+        loop: asyncio.AbstractEventLoop,
+        count: int,
+    ) -> None:
+        """Report the number of resources awaiting teardown in a loop."""
+
+
+def set_observer(obs: Observer | None) -> None:
+    """Install a process-wide observer, or remove it with ``None``."""
+    global observer  # noqa: PLW0603
+    observer = obs
+
+
+__all__ = ['Observer', 'set_observer']
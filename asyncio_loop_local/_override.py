@@ -0,0 +1,63 @@
+# SPDX-FileCopyrightText: 2023 Alexander Sosedkin <monk@unboiled.info>
+# SPDX-License-Identifier: GPL-3.0
+
+"""Override singletons for a task and the tasks it spawns.
+
+The overrides live in a contextvar, so everybody else keeps hitting
+the shared cache. Until the first override, singletons only pay
+for checking a module global, and for a single lookup in it afterwards.
+"""
+
+import contextlib
+import contextvars
+import typing
+import weakref
+
+_T = typing.TypeVar('_T')
+_Singleton = (
+    typing.Callable[..., _T] | typing.Callable[..., typing.Awaitable[_T]]
+)
+
+# the functions override() accepts, registered by singleton
+overridable: 'weakref.WeakSet[typing.Callable[..., typing.Any]]' = (
+    weakref.WeakSet()
+)
+NOT_OVERRIDDEN = object()
+used = False  # set on the first override, never reset
+
+_EMPTY: dict[object, object] = {}  # never modified
+_overrides: contextvars.ContextVar[dict[object, object]] = (
+    contextvars.ContextVar('asyncio_loop_local_overrides', default=_EMPTY)
+)
+
+
+def lookup(func: object) -> object:
+    return _overrides.get().get(func, NOT_OVERRIDDEN)
+
+
+@contextlib.contextmanager
+def override(
+    func: _Singleton[_T],
+    value: _T,
+) -> typing.Generator[None, None, None]:
+    """Make a singleton return ``value`` within the ``with`` block.
+
+    The override applies to all the arguments,
+    it's seen by the current task and the tasks it creates meanwhile
+    (for their whole lifetime, as they copy the context on creation),
+    and it's never cached.
+    For async singletons, awaiting them returns ``value``.
+    """
+    global used  # noqa: PLW0603
+    if func not in overridable:
+        msg = f'only singletons can be overridden, not {func!r}'
+        raise TypeError(msg)
+    used = True
+    token = _overrides.set({**_overrides.get(), func: value})
+    try:
+        yield
+    finally:
+        _overrides.reset(token)
+
+
+__all__ = ['override']
@@ -0,0 +1,264 @@
+# SPDX-FileCopyrightText: 2023 Alexander Sosedkin <monk@unboiled.info>
+# SPDX-License-Identifier: GPL-3.0
+
+"""Loop-local pool of async context managers, checked out with `async with`.
+
+If you got some `Worker` async context manager factory function,
+and decorate it with `pooled_acm`, the resulting object:
+
+* gives you one of up to `maxsize` `Worker`s on aentering,
+  entering a new one only if none are idle
+* returns it to the pool on aexiting
+* aexits the ones idle for over `idle_timeout` early
+* aexits the rest at the end of the event loop
+"""
+
+import asyncio
+import collections
+import contextlib
+import functools
+import types
+import typing
+
+import asyncio_loop_local._atexit
+import asyncio_loop_local._enter
+import asyncio_loop_local._release
+import asyncio_loop_local._singleton
+
+_P = typing.ParamSpec('_P')
+_T = typing.TypeVar('_T')
+_ACM = contextlib.AbstractAsyncContextManager
+
+
+class _Decorator(typing.Protocol):
+    # like _singleton._AsyncDecorator, but for functions returning acms
+    def __call__(
+        self: typing.Self,
+        acm_func: typing.Callable[_P, _ACM[_T]],
+        /,
+    ) -> typing.Callable[_P, _ACM[_T]]: ...  # pragma: no cover
+
+
+class _Item(typing.Generic[_T]):
+    __slots__ = ('acm', 'timer', 'value')
+
+    acm: _ACM[_T]
+    value: _T
+    timer: asyncio.TimerHandle | None  # idle eviction
+
+    def __init__(self: typing.Self, acm: _ACM[_T], value: _T) -> None:
+        self.acm, self.value, self.timer = acm, value, None
+
+
+class _Pool(typing.Generic[_T]):
+    # a pool for a single set of arguments in a single loop
+
+    def __init__(
+        self: typing.Self,
+        factory: typing.Callable[[], _ACM[_T]],
+        maxsize: int,
+        idle_timeout: float | None,
+        fair: bool,  # noqa: FBT001
+    ) -> None:
+        self.factory = factory
+        self.maxsize, self.fair = maxsize, fair
+        self.idle_timeout = idle_timeout
+        self.size = 0  # entered or being entered
+        self.idle: collections.deque[_Item[_T]] = collections.deque()
+        # resolved with an _Item on a handoff, or with None to retry
+        self.waiters: collections.deque[asyncio.Future[_Item[_T] | None]] = (
+            collections.deque()
+        )
+        self.releasing: set[asyncio.Task[None]] = set()  # idle evictions
+        self.failures: list[BaseException] = []  # of the idle evictions
+        self.closed = False
+        if idle_timeout is not None:  # stop the timers before the teardown
+            asyncio_loop_local._atexit._register(  # noqa: SLF001
+                self._close,
+                owner=self,
+                early=True,
+            )
+
+    async def acquire(self: typing.Self) -> _Item[_T]:
+        while True:
+            if self.idle and not (self.fair and self.waiters):
+                item = self.idle.pop()  # the most recently used one
+                if item.timer is not None:
+                    item.timer.cancel()
+                return item
+            if self.size < self.maxsize:
+                return await self._create()
+            fut: asyncio.Future[_Item[_T] | None]
+            fut = asyncio.get_running_loop().create_future()
+            self.waiters.append(fut)
+            try:
+                handed = await fut
+            except asyncio.CancelledError:
+                if not fut.cancelled():  # woken up, but can't take it
+                    if (handed := fut.result()) is not None:
+                        self.put(handed)
+                    else:
+                        self._wake()
+                else:  # could've been popped and skipped already
+                    with contextlib.suppress(ValueError):
+                        self.waiters.remove(fut)
+                raise
+            if handed is not None:
+                return handed
+
+    async def _create(self: typing.Self) -> _Item[_T]:
+        self.size += 1
+        try:
+            acm = self.factory()
+            value = await asyncio_loop_local._enter.enter(acm)  # noqa: SLF001
+        except BaseException:
+            self.size -= 1
+            self._wake()
+            raise
+        return _Item(acm, value)
+
+    def put(self: typing.Self, item: _Item[_T]) -> None:
+        if self.fair:  # hand it over directly, so that nobody barges in
+            while self.waiters:
+                fut = self.waiters.popleft()
+                if not fut.done():
+                    fut.set_result(item)
+                    return
+        self.idle.append(item)
+        if self.idle_timeout is not None and not self.closed:
+            loop = asyncio.get_running_loop()
+            item.timer = loop.call_later(self.idle_timeout, self._evict, item)
+        self._wake()
+
+    def _wake(self: typing.Self) -> None:
+        while self.waiters:
+            fut = self.waiters.popleft()
+            if not fut.done():
+                fut.set_result(None)
+                return
+
+    def _evict(self: typing.Self, item: _Item[_T]) -> None:
+        # the timers are cancelled on teardown, but just in case
+        if self.closed:  # pragma: no cover
+            return
+        self.idle.remove(item)
+        self.size -= 1
+        release = asyncio_loop_local._release.release  # noqa: SLF001
+        task = asyncio.get_running_loop().create_task(release(item.acm))
+        self.releasing.add(task)
+        task.add_done_callback(self._evicted)
+        self._wake()
+
+    def _evicted(self: typing.Self, task: asyncio.Task[None]) -> None:
+        self.releasing.discard(task)
+        if not task.cancelled() and (ex := task.exception()) is not None:
+            self.failures.append(ex)
+
+    async def _close(self: typing.Self) -> None:
+        # an early atexit hook, leaving the idle ones to their own hooks
+        self.closed = True
+        for item in self.idle:
+            typing.cast(asyncio.TimerHandle, item.timer).cancel()
+        self.idle.clear()
+        if self.releasing:
+            await asyncio.wait(self.releasing)
+        if self.failures:
+            msg = 'exiting idle pooled acms failed'
+            raise BaseExceptionGroup(msg, self.failures)
+
+
+class _Checkout(typing.Generic[_T]):
+    # takes an item out of the pool for the duration of an `async with`
+    __slots__ = ('_item', '_pool')
+
+    _pool: _Pool[_T]
+    _item: _Item[_T] | None
+
+    def __init__(self: typing.Self, pool: _Pool[_T]) -> None:
+        self._pool, self._item = pool, None
+
+    async def __aenter__(self: typing.Self) -> _T:
+        self._item = await self._pool.acquire()
+        return self._item.value
+
+    async def __aexit__(
+        self: typing.Self,
+        exc_type: type[BaseException] | None,
+        exc_val: BaseException | None,
+        exc_tb: types.TracebackType | None,
+    ) -> None:
+        item, self._item = typing.cast(_Item[_T], self._item), None
+        self._pool.put(item)
+
+
+@typing.overload  # for decorating with pooled_acm()
+def pooled_acm(
+    acm_func: None = None,
+    *,
+    maxsize: int = 10,
+    idle_timeout: float | None = None,
+    fair: bool = True,
+) -> _Decorator: ...  # overload
+
+
+@typing.overload  # for decorating with pooled_acm
+def pooled_acm(
+    acm_func: typing.Callable[_P, _ACM[_T]],
+    *,
+    maxsize: int = 10,
+    idle_timeout: float | None = None,
+    fair: bool = True,
+) -> typing.Callable[_P, _ACM[_T]]: ...  # overload
+
+
+def pooled_acm(
+    acm_func: typing.Callable[_P, _ACM[_T]] | None = None,
+    *,
+    maxsize: int = 10,
+    idle_timeout: float | None = None,
+    fair: bool = True,
+) -> typing.Callable[_P, _ACM[_T]] | _Decorator:
+    if maxsize < 1:
+        msg = f'maxsize must be positive, got {maxsize}'
+        raise ValueError(msg)
+    if acm_func is None:
+        return functools.partial(
+            _poolify,
+            maxsize=maxsize,
+            idle_timeout=idle_timeout,
+            fair=fair,
+        )
+    return _poolify(
+        acm_func,
+        maxsize=maxsize,
+        idle_timeout=idle_timeout,
+        fair=fair,
+    )
+
+
+def _poolify(
+    acm_func: typing.Callable[_P, _ACM[_T]],
+    *,
+    maxsize: int,
+    idle_timeout: float | None,
+    fair: bool,
+) -> typing.Callable[_P, _ACM[_T]]:
+    def new_pool(*args: _P.args, **kwargs: _P.kwargs) -> _Pool[_T]:
+        factory = functools.partial(acm_func, *args, **kwargs)
+        return _Pool(factory, maxsize, idle_timeout, fair)
+
+    # one pool per loop and per arguments
+    make_key = asyncio_loop_local._singleton._make_key_func  # noqa: SLF001
+    pool = asyncio_loop_local._singleton.singleton(  # noqa: SLF001
+        new_pool,
+        key=make_key(acm_func),
+    )
+
+    @functools.wraps(acm_func)
+    def checkout(*args: _P.args, **kwargs: _P.kwargs) -> _ACM[_T]:
+        return _Checkout(pool(*args, **kwargs))
+
+    return checkout
+
+
+__all__ = ['pooled_acm']
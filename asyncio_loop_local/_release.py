@@ -0,0 +1,98 @@
+# SPDX-FileCopyrightText: 2023 Alexander Sosedkin <monk@unboiled.info>
+# SPDX-License-Identifier: GPL-3.0
+
+"""Exit a loop-local resource early, without waiting for the loop to end."""
+
+import asyncio_loop_local._atexit
+import asyncio_loop_local._enter_once
+import asyncio_loop_local._singleton
+import asyncio_loop_local._sticky_acm
+import asyncio_loop_local._storage
+
+_atexit = asyncio_loop_local._atexit  # noqa: SLF001
+
+
+async def release(obj: object) -> None:
+    """Exit a resource now instead of at the end of the loop.
+
+    ``obj`` is either an async context manager
+    entered with ``enter``, ``enter_once`` or ``sticky_acm``,
+    or the value its ``__aenter__`` has returned.
+    It's exited right away, its ``__aexit__`` is no longer deferred,
+    and it's forgotten by ``enter_once``, ``sticky_acm`` and ``singleton``,
+    so that the next access enters a fresh one.
+    Whatever has been entered with ``depends_on=[obj]`` is released first.
+    All the ``__aexit__``'s run even if some fail,
+    the failures are raised as an ``ExceptionGroup``.
+    """
+    hooks = _detach(obj)
+    if not hooks:
+        msg = f'{obj!r} has not been entered in this loop'
+        raise LookupError(msg)
+    await _exit(hooks)
+
+
+def _detach(obj: object) -> list['_atexit._Hook']:
+    # forget everything about obj, return the hooks to exit it with
+    hooks = _with_dependents(_atexit._hooks_of(obj))  # noqa: SLF001
+    if not hooks:
+        return []
+    for h in hooks:
+        _atexit._unregister(h)  # noqa: SLF001
+    objs = {
+        id(o): o for h in hooks for o in (h.owner, h.value) if o is not None
+    }
+
+    ls = asyncio_loop_local._storage.storage()  # noqa: SLF001
+    enter_once_cache = ls.get(
+        asyncio_loop_local._enter_once.enter_once_sentinel,  # noqa: SLF001
+        {},
+    )
+    for acm in [acm for acm in enter_once_cache if id(acm) in objs]:
+        del enter_once_cache[acm]
+    sticky_cache = ls.get(
+        asyncio_loop_local._sticky_acm.sticky_acm_sentinel,  # noqa: SLF001
+        {},
+    )
+    for acm, sticky in sticky_cache.items():
+        if id(acm) in objs:
+            sticky._reset()  # noqa: SLF001
+    singleton_caches = ls.get(
+        asyncio_loop_local._singleton.singleton_cache_key_sentinel,  # noqa: SLF001
+        {},
+    )
+    for sc in singleton_caches.values():
+        sc.forget_values(objs)
+    return hooks
+
+
+def _with_dependents(hooks: list['_atexit._Hook']) -> list['_atexit._Hook']:
+    # in the exiting order: reversed, with whatever depends on them first
+    ordered: list[_atexit._Hook] = []
+
+    def visit(h: '_atexit._Hook') -> None:
+        if h not in ordered:
+            for w in h.waits_for:
+                visit(w)
+            ordered.append(h)
+
+    for h in hooks[::-1]:
+        visit(h)
+    return ordered
+
+
+async def _exit(hooks: list['_atexit._Hook']) -> None:
+    # exits them all one by one, even if some fail
+    timeout = _atexit._default_timeout()  # noqa: SLF001
+    errors: list[Exception] = []
+    for h in hooks:
+        try:
+            await _atexit._call(h, timeout)  # noqa: SLF001
+        except Exception as ex:  # noqa: BLE001
+            errors.append(ex)
+    if errors:
+        msg = 'releasing failed'
+        raise ExceptionGroup(msg, errors)
+
+
+__all__ = ['release']
@@ -0,0 +1,92 @@
+# SPDX-FileCopyrightText: 2023 Alexander Sosedkin <monk@unboiled.info>
+# SPDX-License-Identifier: GPL-3.0
+
+"""Run a loop that exits the loop-local resources while it's still usable.
+
+`asyncio.run` and `asyncio.Runner` cancel the remaining tasks,
+shut down async generators and the default executor,
+and only then close the loop, which is where loop-local resources
+get exited otherwise.
+Resources that need a background task or an executor to exit cleanly
+are better off exited before all of that.
+"""
+
+import asyncio
+import contextvars
+import types
+import typing
+
+import asyncio_loop_local._atexit
+
+_T = typing.TypeVar('_T')
+_LoopFactory = typing.Callable[[], asyncio.AbstractEventLoop]
+
+
+class Runner:
+    """`asyncio.Runner` exiting loop-local resources first thing on close.
+
+    (`asyncio.Runner` is final, so this one wraps it instead of inheriting.)
+    """
+
+    _runner: asyncio.Runner
+    _used_loop: asyncio.AbstractEventLoop | None
+
+    def __init__(
+        self: typing.Self,
+        *,
+        debug: bool | None = None,
+        loop_factory: _LoopFactory | None = None,
+    ) -> None:
+        """Initialize Runner, see `asyncio.Runner`."""
+        self._runner = asyncio.Runner(debug=debug, loop_factory=loop_factory)
+        self._used_loop = None
+
+    def __enter__(self: typing.Self) -> typing.Self:
+        self._runner.__enter__()
+        return self
+
+    def __exit__(
+        self: typing.Self,
+        exc_type: type[BaseException] | None,
+        exc_val: BaseException | None,
+        exc_tb: types.TracebackType | None,
+    ) -> None:
+        self.close()
+
+    def get_loop(self: typing.Self) -> asyncio.AbstractEventLoop:
+        """Return the embedded event loop, see `asyncio.Runner`."""
+        return self._runner.get_loop()
+
+    def run(
+        self: typing.Self,
+        coro: typing.Coroutine[typing.Any, typing.Any, _T],
+        *,
+        context: contextvars.Context | None = None,
+    ) -> _T:
+        """Run a coroutine inside the embedded event loop."""
+        self._used_loop = self._runner.get_loop()
+        return self._runner.run(coro, context=context)
+
+    def close(self: typing.Self) -> None:
+        """Exit loop-local resources, then shut down and close the loop."""
+        loop, self._used_loop = self._used_loop, None
+        try:
+            if loop is not None and not loop.is_closed():
+                fire = asyncio_loop_local._atexit._fire()  # noqa: SLF001
+                loop.run_until_complete(fire)
+        finally:
+            self._runner.close()
+
+
+def run(
+    main: typing.Coroutine[typing.Any, typing.Any, _T],
+    *,
+    debug: bool | None = None,
+    loop_factory: _LoopFactory | None = None,
+) -> _T:
+    """Drop-in replacement for `asyncio.run`, see `Runner`."""
+    with Runner(debug=debug, loop_factory=loop_factory) as runner:
+        return runner.run(main)
+
+
+__all__ = ['Runner', 'run']
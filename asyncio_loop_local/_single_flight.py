@@ -0,0 +1,119 @@
+# SPDX-FileCopyrightText: 2023 Alexander Sosedkin <monk@unboiled.info>
+# SPDX-License-Identifier: GPL-3.0
+
+"""Coalesce concurrent calls of an async function into a single one."""
+
+import asyncio
+import functools
+import inspect
+import typing
+
+import asyncio_loop_local._observe
+import asyncio_loop_local._singleton
+import asyncio_loop_local._storage
+
+_P = typing.ParamSpec('_P')
+_T = typing.TypeVar('_T')
+_AsyncFunc = typing.Callable[_P, typing.Coroutine[typing.Any, typing.Any, _T]]
+_Decorator = asyncio_loop_local._singleton._AsyncDecorator  # noqa: SLF001
+_Flights = dict[typing.Hashable, asyncio.Future[typing.Any]]
+_KeyFunc = asyncio_loop_local._singleton._KeyFunc  # noqa: SLF001
+_observe = asyncio_loop_local._observe  # noqa: SLF001
+
+single_flight_sentinel = object()
+
+
+@typing.overload  # for decorating with single_flight()
+def single_flight(
+    f: None = None,
+    *,
+    ttl: float | None = None,
+    key: _KeyFunc | None = None,
+) -> _Decorator: ...  # overload
+
+
+@typing.overload  # for decorating with single_flight
+def single_flight(
+    f: _AsyncFunc[_P, _T],
+    *,
+    ttl: float | None = None,
+    key: _KeyFunc | None = None,
+) -> _AsyncFunc[_P, _T]: ...  # overload
+
+
+def single_flight(
+    f: _AsyncFunc[_P, _T] | None = None,
+    *,
+    ttl: float | None = None,
+    key: _KeyFunc | None = None,
+) -> _AsyncFunc[_P, _T] | _Decorator:
+    if f is None:
+        return functools.partial(_single_flightify, ttl=ttl, key=key)
+    return _single_flightify(f, ttl=ttl, key=key)
+
+
+def _flights(token: object) -> _Flights:
+    ls = asyncio_loop_local._storage.storage()  # noqa: SLF001
+    try:
+        all_flights = ls[single_flight_sentinel]
+    except KeyError:
+        all_flights = ls[single_flight_sentinel] = {}
+    try:
+        return typing.cast(_Flights, all_flights[token])
+    except KeyError:
+        flights: _Flights = {}
+        all_flights[token] = flights
+        return flights
+
+
+def _land(
+    flights: _Flights,
+    k: typing.Hashable,
+    ttl: float | None,
+    fut: asyncio.Future[typing.Any],
+) -> None:
+    # results are shared for ttl more seconds, failures aren't shared further
+    forget = functools.partial(_forget, flights, k)
+    if ttl is None or fut.cancelled() or fut.exception() is not None:
+        forget()
+    else:
+        asyncio.get_running_loop().call_later(ttl, forget)
+
+
+def _forget(flights: _Flights, k: typing.Hashable) -> None:
+    del flights[k]  # nothing else replaces it
+
+
+def _single_flightify(
+    f: _AsyncFunc[_P, _T],
+    *,
+    ttl: float | None,
+    key: _KeyFunc | None,
+) -> _AsyncFunc[_P, _T]:
+    if not inspect.iscoroutinefunction(f):
+        msg = f'single_flight only works on async functions, not {f!r}'
+        raise TypeError(msg)
+    key_func = key or asyncio_loop_local._singleton._make_key_func(f)  # noqa: SLF001
+    token = object()  # the same function can be decorated twice
+
+    @functools.wraps(f)
+    async def coalesced(*args: _P.args, **kwargs: _P.kwargs) -> _T:
+        flights = _flights(token)
+        k = key_func(*args, **kwargs)
+        try:
+            fut = flights[k]
+        except KeyError:
+            if (obs := _observe.observer) is not None:
+                obs.miss('single_flight', f)
+            fut = asyncio.ensure_future(f(*args, **kwargs))
+            flights[k] = fut
+            fut.add_done_callback(functools.partial(_land, flights, k, ttl))
+        else:
+            if (obs := _observe.observer) is not None:
+                obs.hit('single_flight', f)
+        return typing.cast(_T, await asyncio.shield(fut))
+
+    return coalesced
+
+
+__all__ = ['single_flight']
@@ -3,9 +3,18 @@
 
 """Initialize something once per loop and share it, clean up at the end."""
 
+import asyncio
+import collections
 import functools
+import inspect
+import threading
+import time
 import typing
+import weakref
 
+import asyncio_loop_local._observe
+import asyncio_loop_local._override
+import asyncio_loop_local._release
 import asyncio_loop_local._storage
 
 _P = typing.ParamSpec('_P')
@@ -14,19 +23,337 @@ _Decorator = typing.Callable[
     [typing.Callable[_P, _T]],
     typing.Callable[_P, _T],
 ]
+_AsyncFunc = typing.Callable[_P, typing.Coroutine[typing.Any, typing.Any, _T]]
+_Key = typing.Hashable
+_KeyFunc = typing.Callable[..., _Key]
+_Kind = inspect.Parameter
+_Scope = typing.Literal['loop', 'process']
+_OnEvict = typing.Callable[[typing.Any], object]
+_KWMARK = (object(),)  # separates positional arguments from keyword ones
+_REQUIRED = object()  # stands in for a missing argument without a default
+_VAR_KINDS = {_Kind.VAR_POSITIONAL, _Kind.VAR_KEYWORD}
+_POSITIONAL_KINDS = {_Kind.POSITIONAL_ONLY, _Kind.POSITIONAL_OR_KEYWORD}
+_observe = asyncio_loop_local._observe  # noqa: SLF001
+_override = asyncio_loop_local._override  # noqa: SLF001
+_storage = asyncio_loop_local._storage  # noqa: SLF001
 
 
-class SingletonCache(
-    dict[
-        tuple[
-            typing.Callable[_P, _T],
-            _P.args,
-            tuple[tuple[str, typing.Any], ...],  # should be _P.kwargs, but uh
-        ],
-        _T,
-    ],
-):
-    pass  # with the type like this, who needs a class body?
+class _AsyncDecorator(typing.Protocol):
+    # what single_flight() and the like return, for decorating async functions;
+    # generic in __call__, so that mypy infers the types when decorating
+    def __call__(
+        self: typing.Self,
+        f: _AsyncFunc[_P, _T],
+        /,
+    ) -> _AsyncFunc[_P, _T]: ...  # pragma: no cover
+
+
+class _HashedKey(list[typing.Any]):
+    # a key that hashes once, as misses and LRU bookkeeping rehash it;
+    # a list so that it never compares equal to a tuple of plain arguments
+    __slots__ = ('hashvalue',)
+
+    def __init__(self: typing.Self, tup: tuple[typing.Any, ...]) -> None:
+        super().__init__(tup)
+        self.hashvalue = hash(tup)
+
+    def __hash__(self: typing.Self) -> int:  # type: ignore[override]
+        return self.hashvalue
+
+
+def _make_key_func(f: typing.Callable[..., typing.Any]) -> _KeyFunc:
+    # normalizes arguments through the signature, applying defaults,
+    # so that f(1, 2), f(1, b=2), f(b=2, a=1) and f(1) share a key
+    try:
+        sig = inspect.signature(f)
+    except (TypeError, ValueError):  # some builtins lack a signature
+        sig = None
+
+    if sig is None:
+
+        def key_func(
+            *args: typing.Any,  # noqa: ANN401
+            **kwargs: typing.Any,  # noqa: ANN401
+        ) -> _Key:
+            if not kwargs:
+                return args
+            return _HashedKey((*args, *_KWMARK, *sorted(kwargs.items())))
+
+        return key_func
+
+    params = list(sig.parameters.values())
+    named = [p for p in params if p.kind not in _VAR_KINDS]
+    defaults = tuple(_default(p) for p in named)
+    if len(named) < len(params):
+        return _make_bind_key_func(sig, named, defaults)
+    return _make_named_key_func(sig, named, defaults)
+
+
+def _make_named_key_func(
+    sig: inspect.Signature,
+    named: list[inspect.Parameter],
+    defaults: tuple[object, ...],
+) -> _KeyFunc:
+    # no *args or **kwargs, the key is the values of all parameters in order
+    npos = sum(p.kind in _POSITIONAL_KINDS for p in named)
+    nrequired = max(
+        (i + 1 for i, d in enumerate(defaults) if d is _REQUIRED),
+        default=0,
+    )
+    tails = [defaults[i:] for i in range(npos + 1)]  # missing ones, by nargs
+    by_name = {
+        p.name: i
+        for i, p in enumerate(named)
+        if p.kind is not _Kind.POSITIONAL_ONLY
+    }
+
+    def key_func_(
+        *args: typing.Any,  # noqa: ANN401
+        **kwargs: typing.Any,  # noqa: ANN401
+    ) -> _Key:
+        nargs = len(args)
+        if not kwargs and nrequired <= nargs <= npos:
+            return args + tails[nargs]
+        if nargs > npos:
+            _reject(sig, args, kwargs)
+        values = [*args, *tails[nargs]]
+        for name, value in kwargs.items():
+            i = by_name.get(name)
+            if i is None or i < nargs:
+                _reject(sig, args, kwargs)
+            values[i] = value
+        if any(v is _REQUIRED for v in values):
+            _reject(sig, args, kwargs)
+        return tuple(values)
+
+    return key_func_
+
+
+def _default(p: inspect.Parameter) -> object:
+    # what stands in for an argument not passed; only the passed arguments
+    # have to be hashable, so unhashable defaults get a marker instead
+    if p.default is p.empty:
+        return _REQUIRED
+    try:
+        hash(p.default)
+    except TypeError:
+        return object()
+    return p.default
+
+
+def _reject(
+    sig: inspect.Signature,
+    args: tuple[typing.Any, ...],
+    kwargs: dict[str, typing.Any],
+) -> typing.NoReturn:
+    sig.bind(*args, **kwargs)  # raises a TypeError explaining what's wrong
+    raise AssertionError  # pragma: no cover
+
+
+def _make_bind_key_func(
+    sig: inspect.Signature,
+    named: list[inspect.Parameter],
+    defaults: tuple[object, ...],
+) -> _KeyFunc:
+    # *args or **kwargs in the signature, binding is the way to tell them
+    var_args = var_kwargs = ''
+    for p in sig.parameters.values():
+        if p.kind is _Kind.VAR_POSITIONAL:
+            var_args = p.name
+        elif p.kind is _Kind.VAR_KEYWORD:
+            var_kwargs = p.name
+    names_defaults = list(zip([p.name for p in named], defaults, strict=True))
+
+    def bind_key_func(
+        *args: typing.Any,  # noqa: ANN401
+        **kwargs: typing.Any,  # noqa: ANN401
+    ) -> _Key:
+        arguments = sig.bind(*args, **kwargs).arguments
+        values = [arguments.get(*nd) for nd in names_defaults]
+        extra_args = arguments.get(var_args, ())
+        extra_kwargs = sorted(arguments.get(var_kwargs, {}).items())
+        return _HashedKey((*values, *extra_args, *_KWMARK, *extra_kwargs))
+
+    return bind_key_func
+
+
+class _Config(typing.NamedTuple):
+    maxsize: int | None = None
+    ttl: float | None = None
+    on_evict: _OnEvict | None = None
+
+
+class CacheInfo(typing.NamedTuple):
+    """Statistics of a singleton cache in the current loop.
+
+    To keep the hits as cheap as a dict lookup,
+    the ones of singletons without ``maxsize`` and ``ttl``
+    are only counted while an observer is set.
+    """
+
+    hits: int
+    misses: int
+    evictions: int
+    maxsize: int | None
+    currsize: int
+
+
+class _Entry:
+    # bookkeeping for a cached value
+    __slots__ = ('born', 'deadline', 'hits')
+
+    born: float
+    deadline: float | None
+    hits: int
+
+    def __init__(self: typing.Self, ttl: float | None) -> None:
+        self.born = time.monotonic()
+        self.deadline = None if ttl is None else self.born + ttl
+        self.hits = 0
+
+
+class SingletonCache(collections.OrderedDict[_Key, _T]):
+    """Values of a single singleton-decorated callable in a single loop.
+
+    Optionally bounded in size (least recently used go first)
+    and in time (``ttl``, in seconds).
+    Evicted values that have been entered with ``enter``/``enter_once``
+    get exited, the rest are passed to ``on_evict``, if any;
+    both happen in the background on the loop that owns the cache.
+    """
+
+    owner: object  # the decorated callable
+    maxsize: int | None
+    ttl: float | None
+    on_evict: _OnEvict | None
+    hits: int
+    misses: int
+    evictions: int
+    _entries: dict[_Key, _Entry]
+    # (deadline, entry, key) in the order of storing, so, of deadlines;
+    # entries that have been dropped or replaced since are skipped
+    _expiry: collections.deque[tuple[float, _Entry, _Key]]
+    _closing: set[asyncio.Task[typing.Any]]
+
+    def __init__(
+        self: typing.Self,
+        maxsize: int | None = None,
+        ttl: float | None = None,
+        owner: object = None,
+        on_evict: _OnEvict | None = None,
+    ) -> None:
+        super().__init__()
+        self.maxsize, self.ttl, self.owner = maxsize, ttl, owner
+        self.on_evict = on_evict
+        self.hits = self.misses = self.evictions = 0
+        self._entries = {}
+        self._expiry = collections.deque()
+        self._closing = set()
+
+    def lookup(self: typing.Self, key: _Key) -> _T:
+        """Return a cached value or raise KeyError, keeping statistics."""
+        try:
+            value = self[key]
+            entry = self._entries[key]
+            deadline = entry.deadline
+            if deadline is not None and deadline <= time.monotonic():
+                self.evict(key)
+                raise KeyError(key)  # noqa: TRY301
+        except KeyError:
+            self.misses += 1
+            if (obs := _observe.observer) is not None:
+                obs.miss('singleton', self.owner)
+            raise
+        if self.maxsize is not None:
+            self.move_to_end(key)
+        self.hits += 1
+        entry.hits += 1
+        if (obs := _observe.observer) is not None:
+            obs.hit('singleton', self.owner)
+        return value
+
+    def store(self: typing.Self, key: _Key, value: _T) -> None:
+        """Cache a value, evicting the expired and the least recently used."""
+        entry = self._entries[key] = _Entry(self.ttl)  # first, for readers
+        self[key] = value
+        if entry.deadline is not None:
+            self._expire(entry.born)
+            self._expiry.append((entry.deadline, entry, key))
+        if self.maxsize is not None:
+            while len(self) > self.maxsize:
+                self.evict(next(iter(self)))
+
+    def _expire(self: typing.Self, now: float) -> None:
+        # evict the expired entries, even if they're never looked up again
+        expiry = self._expiry
+        while expiry and expiry[0][0] <= now:
+            _, entry, key = expiry.popleft()
+            if self._entries.get(key) is entry:
+                self.evict(key)
+
+    def forget(self: typing.Self, key: _Key, value: _T) -> None:
+        """Drop a value without closing it, unless it's been replaced."""
+        if self.get(key) is value:
+            del self[key]
+            del self._entries[key]
+
+    def forget_values(self: typing.Self, objs: dict[int, object]) -> None:
+        """Drop the values that are among objs (by id), without closing."""
+        for key, value in list(self.items()):
+            v = value
+            if isinstance(v, asyncio.Future):  # from an async singleton
+                if not v.done() or v.cancelled() or v.exception() is not None:
+                    continue
+                v = v.result()
+            if id(v) in objs:
+                self.forget(key, value)
+
+    def evict(self: typing.Self, key: _Key) -> None:
+        """Drop a value and close it in the background."""
+        value = self.pop(key)
+        del self._entries[key]
+        self.evictions += 1
+        self._close(value)
+
+    def info(self: typing.Self) -> CacheInfo:
+        """Return cache statistics."""
+        return CacheInfo(
+            self.hits,
+            self.misses,
+            self.evictions,
+            self.maxsize,
+            len(self),
+        )
+
+    def _close(self: typing.Self, value: typing.Any) -> None:  # noqa: ANN401
+        if isinstance(value, asyncio.Future):  # from an async singleton
+            if not value.done():
+                value.add_done_callback(self._close)
+                return
+            if value.cancelled() or value.exception() is not None:
+                return
+            value = value.result()
+        release = asyncio_loop_local._release  # noqa: SLF001
+        coro: typing.Coroutine[typing.Any, typing.Any, None]
+        if hooks := release._detach(value):  # noqa: SLF001
+            coro = release._exit(hooks)  # noqa: SLF001
+        elif self.on_evict is not None:
+            coro = _call_on_evict(self.on_evict, value)
+        else:  # not ours to close
+            return
+        task = asyncio.get_running_loop().create_task(coro)
+        self._closing.add(task)
+        task.add_done_callback(self._closing.discard)
+
+
+async def _call_on_evict(on_evict: _OnEvict, value: object) -> None:
+    r = on_evict(value)
+    if inspect.isawaitable(r):
+        await r
+
+
+class SingletonCaches(dict[object, SingletonCache[typing.Any]]):
+    """All the singleton caches of a loop, one per decoration."""
 
 
 singleton_cache_key_sentinel = object()
@@ -35,6 +362,12 @@ singleton_cache_key_sentinel = object()
 @typing.overload  # for decorating with singleton()
 def singleton(
     callable_: None = None,
+    *,
+    maxsize: int | None = None,
+    ttl: float | None = None,
+    key: _KeyFunc | None = None,
+    scope: _Scope = 'loop',
+    on_evict: _OnEvict | None = None,
 ) -> typing.Callable[
     [typing.Callable[_P, _T]],
     typing.Callable[_P, _T],
@@ -44,36 +377,219 @@ def singleton(
 @typing.overload  # for decorating with singleton
 def singleton(
     callable_: typing.Callable[_P, _T],
+    *,
+    maxsize: int | None = None,
+    ttl: float | None = None,
+    key: _KeyFunc | None = None,
+    scope: _Scope = 'loop',
+    on_evict: _OnEvict | None = None,
 ) -> typing.Callable[_P, _T]: ...  # overload
 
 
-# I want to be able to later extend it with parameters, so, two forms
-def singleton(
+def singleton(  # noqa: PLR0913
     callable_: typing.Callable[_P, _T] | None = None,
+    *,
+    maxsize: int | None = None,
+    ttl: float | None = None,
+    key: _KeyFunc | None = None,
+    scope: _Scope = 'loop',
+    on_evict: _OnEvict | None = None,
 ) -> typing.Callable[_P, _T] | _Decorator[_P, _T]:
+    if maxsize is not None and maxsize < 1:
+        msg = f'maxsize must be positive, got {maxsize}'
+        raise ValueError(msg)
+    if scope not in {'loop', 'process'}:
+        msg = f"scope must be 'loop' or 'process', got {scope!r}"
+        raise ValueError(msg)
+    config = _Config(maxsize, ttl, on_evict)
+    if scope == 'process' and config != _Config():
+        msg = "maxsize, ttl and on_evict aren't supported with scope='process'"
+        raise ValueError(msg)
     if callable_ is None:
-        return _singletonize
-    return _singletonize(callable_)
+        return functools.partial(
+            _singletonize,
+            config=config,
+            key=key,
+            scope=scope,
+        )
+    return _singletonize(callable_, config=config, key=key, scope=scope)
+
+
+def _cache(
+    token: object,
+    f: typing.Callable[..., typing.Any],
+    config: _Config,
+) -> SingletonCache[typing.Any]:
+    ls = asyncio_loop_local._storage.storage()  # noqa: SLF001
+    try:
+        scs = ls[singleton_cache_key_sentinel]
+    except KeyError:
+        scs = ls[singleton_cache_key_sentinel] = SingletonCaches()
+    try:
+        return typing.cast(SingletonCache[typing.Any], scs[token])
+    except KeyError:
+        pass
+    sc: SingletonCache[typing.Any] = SingletonCache(
+        config.maxsize,
+        config.ttl,
+        f,
+        config.on_evict,
+    )
+    scs[token] = sc
+    return sc
+
 
+def _singletonize(
+    f: typing.Callable[_P, _T],
+    *,
+    config: _Config,
+    key: _KeyFunc | None,
+    scope: _Scope,
+) -> typing.Callable[_P, _T]:
+    key_func = key or _make_key_func(f)
+    if scope == 'process':
+        if inspect.iscoroutinefunction(f):
+            # the result would be bound to the loop that has awaited it
+            msg = "scope='process' can't be used on async functions"
+            raise ValueError(msg)
+        return _singletonize_process(f, key_func)
+    if inspect.iscoroutinefunction(f):
+        return typing.cast(
+            typing.Callable[_P, _T],
+            _singletonize_async(f, config, key_func),
+        )
+    token = object()  # the same function can be decorated twice
+    plain = config.maxsize is None and config.ttl is None
 
-def _singletonize(f: typing.Callable[_P, _T]) -> typing.Callable[_P, _T]:
     @functools.wraps(f)
     def reuse_sync(*args: _P.args, **kwargs: _P.kwargs) -> _T:
         # sync version wrapping a regular function, no locking required
-        ls = asyncio_loop_local._storage.storage()  # noqa: SLF001
+        if plain and not _override.used and _observe.observer is None:
+            # fast path: a plain dict lookup, see CacheInfo
+            try:
+                sc = _storage.storage()[singleton_cache_key_sentinel][token]
+                return typing.cast(_T, sc[key_func(*args, **kwargs)])
+            except KeyError:
+                pass
+        o = _override.lookup(reuse_sync)
+        if o is not _override.NOT_OVERRIDDEN:
+            return typing.cast(_T, o)
+        sc = _cache(token, f, config)
+        k = key_func(*args, **kwargs)
+        try:
+            return typing.cast(_T, sc.lookup(k))
+        except KeyError:
+            pass
+        res = f(*args, **kwargs)
+        sc.store(k, res)
+        return res
+
+    reuse_sync.cache_info = (  # type: ignore[attr-defined]
+        lambda: _cache(token, f, config).info()
+    )
+    _override.overridable.add(reuse_sync)
+    return reuse_sync
+
+
+def _singletonize_async(
+    f: typing.Callable[_P, typing.Awaitable[_T]],
+    config: _Config,
+    key_func: _KeyFunc,
+) -> typing.Callable[_P, typing.Awaitable[_T]]:
+    token = object()  # the same function can be decorated twice
+    plain = config.maxsize is None and config.ttl is None
+
+    @functools.wraps(f)
+    async def reuse_async(*args: _P.args, **kwargs: _P.kwargs) -> _T:
+        # async version, caches a task so that concurrent callers share it
+        if plain and not _override.used and _observe.observer is None:
+            # fast path: a plain dict lookup, see CacheInfo
+            try:
+                sc = _storage.storage()[singleton_cache_key_sentinel][token]
+                fut = sc[key_func(*args, **kwargs)]
+            except KeyError:
+                pass
+            else:
+                return typing.cast(_T, await asyncio.shield(fut))
+        o = _override.lookup(reuse_async)
+        if o is not _override.NOT_OVERRIDDEN:
+            return typing.cast(_T, o)
+        sc = _cache(token, f, config)
+        k = key_func(*args, **kwargs)
         try:
-            sc = ls[singleton_cache_key_sentinel]
+            fut = sc.lookup(k)
         except KeyError:
-            sc = ls[singleton_cache_key_sentinel] = SingletonCache()
-        key = f, args, tuple(kwargs.items())
+            fut = asyncio.ensure_future(f(*args, **kwargs))
+            sc.store(k, fut)
+
+            def uncache_failures(fut: asyncio.Future[_T]) -> None:
+                if fut.cancelled() or fut.exception() is not None:
+                    sc.forget(k, fut)
+
+            fut.add_done_callback(uncache_failures)
+        # one impatient caller being cancelled must not cancel it for others
+        return typing.cast(_T, await asyncio.shield(fut))
+
+    reuse_async.cache_info = (  # type: ignore[attr-defined]
+        lambda: _cache(token, f, config).info()
+    )
+    _override.overridable.add(reuse_async)
+    return reuse_async
+
+
+class _ProcessCache(SingletonCache[_T]):
+    lock: threading.Lock  # replaced after forking, could've been held
+
+    def __init__(self: typing.Self, owner: object) -> None:
+        super().__init__(owner=owner)
+        self.lock = threading.Lock()
+
+
+# by id, as dicts aren't hashable
+_process_caches: weakref.WeakValueDictionary[
+    int,
+    _ProcessCache[typing.Any],
+] = weakref.WeakValueDictionary()
+
+
+def _singletonize_process(
+    f: typing.Callable[_P, _T],
+    key_func: _KeyFunc,
+) -> typing.Callable[_P, _T]:
+    # forked children have to replace the locks
+    import asyncio_loop_local._fork  # noqa: F401, PLC0415
+
+    sc: _ProcessCache[_T] = _ProcessCache(f)
+    _process_caches[id(sc)] = sc
+
+    @functools.wraps(f)
+    def reuse_process(*args: _P.args, **kwargs: _P.kwargs) -> _T:
+        # shared by all the loops and threads, hits don't lock
+        if not _override.used and _observe.observer is None:
+            try:  # fast path: a plain dict lookup, see CacheInfo
+                return sc[key_func(*args, **kwargs)]
+            except KeyError:
+                pass
+        o = _override.lookup(reuse_process)
+        if o is not _override.NOT_OVERRIDDEN:
+            return typing.cast(_T, o)
+        k = key_func(*args, **kwargs)
         try:
-            return typing.cast(_T, sc[key])
+            return sc.lookup(k)
         except KeyError:
             pass
-        res = sc[key] = f(*args, **kwargs)
+        with sc.lock:
+            try:  # another thread could've been building it meanwhile
+                return sc[k]
+            except KeyError:
+                pass
+            res = f(*args, **kwargs)
+            sc.store(k, res)
         return res
 
-    return reuse_sync
+    reuse_process.cache_info = sc.info  # type: ignore[attr-defined]
+    _override.overridable.add(reuse_process)
+    return reuse_process
 
 
 __all__ = ['singleton']
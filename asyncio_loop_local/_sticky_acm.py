@@ -5,20 +5,94 @@
 
 import asyncio
 import contextlib
+import time
 import types
 import typing
 
-import asyncio_loop_local._atexit
 import asyncio_loop_local._enter
+import asyncio_loop_local._observe
 import asyncio_loop_local._storage
 
 _T = typing.TypeVar('_T')
 _ACM = contextlib.AbstractAsyncContextManager
+_observe = asyncio_loop_local._observe  # noqa: SLF001
 
 sticky_acm_sentinel = object()
 
 
-def sticky_acm(acm: _ACM[_T]) -> _ACM[_T]:
+class _Done:
+    # an awaitable that completes right away, without a coroutine
+    __slots__ = ()
+
+    def __await__(self: typing.Self) -> typing.Generator[None, None, None]:
+        return iter(())  # type: ignore[return-value]
+
+
+_DONE = _Done()
+
+
+class StickyACM(typing.Generic[_T]):
+    """A loop-local wrapper entering ``acm`` on the first ``async with``.
+
+    Exiting it does nothing, ``acm`` gets exited at the end of the loop.
+    """
+
+    __slots__ = ('_acm', '_hits', '_lock', '_result')
+
+    _acm: _ACM[_T]
+    _result: asyncio.Future[_T] | None  # done one, set on entering
+    _lock: asyncio.Lock
+    _hits: int
+
+    def __init__(self: typing.Self, acm: _ACM[_T]) -> None:
+        self._acm = acm
+        self._result = None
+        self._lock = asyncio.Lock()
+        self._hits = 0
+
+    def _reset(self: typing.Self) -> None:  # after an early release
+        self._result = None
+
+    def __aenter__(self: typing.Self) -> typing.Awaitable[_T]:
+        # not async, so that hits don't create a coroutine;
+        # awaiting a done future doesn't go through the loop either
+        if self._result is not None:
+            self._hits += 1
+            if (obs := _observe.observer) is not None:
+                obs.hit('sticky_acm', self._acm)
+            return self._result
+        return self._enter()
+
+    async def _enter(self: typing.Self) -> _T:
+        t0 = time.perf_counter()
+        async with self._lock:
+            if (obs := _observe.observer) is not None:
+                waited = time.perf_counter() - t0
+                obs.lock_wait('sticky_acm', self._acm, waited)
+            if self._result is not None:
+                self._hits += 1
+                if obs is not None:
+                    obs.hit('sticky_acm', self._acm)
+                return self._result.result()
+            if obs is not None:
+                obs.miss('sticky_acm', self._acm)
+
+            r = await asyncio_loop_local._enter.enter(self._acm)  # noqa: SLF001
+            fut = asyncio.get_running_loop().create_future()
+            fut.set_result(r)
+            self._result = fut
+        return r
+
+    @staticmethod
+    def __aexit__(
+        exc_type: type[BaseException] | None,
+        exc_val: BaseException | None,
+        exc_tb: types.TracebackType | None,
+    ) -> _Done:
+        return _DONE
+
+
+def sticky_acm(acm: _ACM[_T]) -> StickyACM[_T]:
     ls = asyncio_loop_local._storage.storage()  # noqa: SLF001
     try:
         c = ls[sticky_acm_sentinel]
@@ -26,42 +100,12 @@ def sticky_acm(acm: _ACM[_T]) -> _ACM[_T]:
         c = ls[sticky_acm_sentinel] = {}
 
     try:
-        return typing.cast(_ACM[_T], c[acm])
+        return typing.cast(StickyACM[_T], c[acm])
     except KeyError:
         pass
 
-    class StickyACM:
-        _entered: bool
-        _val: _T | None
-        _lock: asyncio.Lock
-
-        def __init__(self: typing.Self) -> None:
-            self._entered = False
-            self._val = None
-            self._lock = asyncio.Lock()
-
-        async def __aenter__(self: typing.Self) -> _T:
-            if self._entered:
-                return typing.cast(_T, self._val)
-            async with self._lock:
-                if self._entered:
-                    return typing.cast(_T, self._val)
-
-                r = await asyncio_loop_local._enter.enter(acm)  # noqa: SLF001
-                self._entered = True
-                self._val = r
-            return r
-
-        @staticmethod
-        async def __aexit__(  # noqa: PYI036
-            exc_type: type[BaseException] | None,
-            exc_val: BaseException | None,  # noqa: PYI036
-            exc_tb: types.TracebackType | None,  # noqa: PYI036
-        ) -> None:
-            return None
-
-    ret = c[acm] = StickyACM()
+    ret = c[acm] = StickyACM(acm)
     return ret
 
 
-__all__ = ['sticky_acm']
+__all__ = ['StickyACM', 'sticky_acm']
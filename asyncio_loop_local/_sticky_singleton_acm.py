@@ -11,10 +11,11 @@ it with `sticky_singleton_acm`, the resulting object:
 """
 
 import contextlib
+import functools
 import typing
 
 from asyncio_loop_local._singleton import singleton
-from asyncio_loop_local._sticky_acm import sticky_acm
+from asyncio_loop_local._sticky_acm import StickyACM, sticky_acm
 
 _P = typing.ParamSpec('_P')
 _T = typing.TypeVar('_T')
@@ -23,12 +24,14 @@ _ACM = contextlib.AbstractAsyncContextManager
 
 def sticky_singleton_acm(
     acm_func: typing.Callable[_P, _ACM[_T]],
-) -> typing.Callable[_P, _ACM[_T]]:
+) -> typing.Callable[_P, StickyACM[_T]]:
+    s_acm_func = singleton(acm_func)  # once, not on every call
+
+    @functools.wraps(acm_func)
     def mk_sticky_singleton_acm(
         *args: _P.args,
         **kwargs: _P.kwargs,
-    ) -> _ACM[_T]:
-        s_acm_func = singleton()(acm_func)
+    ) -> StickyACM[_T]:
         return sticky_acm(s_acm_func(*args, **kwargs))
 
     return mk_sticky_singleton_acm
@@ -4,6 +4,7 @@
 """asyncio-loop-local storage. Like thread-local, but for asyncio loops."""
 
 import asyncio
+import contextlib
 import typing
 import weakref
 
@@ -20,12 +21,28 @@ class LoopLocalStorage(dict[typing.Any, typing.Any]):
 
 def storage() -> LoopLocalStorage:
     loop = asyncio.get_running_loop()
+    # fast path: attached directly to the loop; probed without raising,
+    # as loops refusing new attributes would raise on every call
+    ls = getattr(loop, '_asyncio_loop_local_storage', None)
+    if ls is None:
+        return _storage_slow(loop)
+    return ls  # type: ignore[no-any-return]
+
+
+def _storage_slow(loop: asyncio.AbstractEventLoop) -> LoopLocalStorage:
+    # the WeakKeyDictionary is the authoritative registry of all storages,
+    # and the fallback for loops that don't accept new attributes
     try:
         return _loop_local_storages[loop]
     except KeyError:
         pass
+    # forked children have to forget storages
+    import asyncio_loop_local._fork  # noqa: F401, PLC0415
+
     new_ls = LoopLocalStorage()
     _loop_local_storages[loop] = new_ls
+    with contextlib.suppress(AttributeError):
+        loop._asyncio_loop_local_storage = new_ls  # type: ignore[attr-defined]  # noqa: SLF001
     return new_ls
 
 
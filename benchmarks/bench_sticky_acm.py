@@ -0,0 +1,75 @@
+# SPDX-FileCopyrightText: 2023 Alexander Sosedkin <monk@unboiled.info>
+# SPDX-License-Identifier: GPL-3.0
+
+"""Microbenchmark the cache-hit path of sticky_acm/sticky_singleton_acm.
+
+Using the raw object, entered or not, serves as the baseline.
+"""
+
+import asyncio
+import time
+import typing
+
+import asyncio_loop_local
+
+N = 200_000
+
+
+class Session:
+    """A do-nothing async context manager."""
+
+    async def __aenter__(self: typing.Self) -> typing.Self:
+        """Enter."""
+        return self
+
+    async def __aexit__(self: typing.Self, *_: object) -> None:
+        """Exit."""
+
+
+_Session = asyncio_loop_local.sticky_singleton_acm(Session)
+
+
+async def raw(session: Session) -> Session:
+    """Just use an object, no context management."""
+    return session
+
+
+async def raw_async_with(session: Session) -> None:
+    """Enter and exit a do-nothing async context manager."""
+    async with session:
+        pass
+
+
+async def sticky_acm_hit(session: Session) -> None:
+    """Re-enter an already entered sticky_acm."""
+    async with asyncio_loop_local.sticky_acm(session):
+        pass
+
+
+async def sticky_singleton_acm_hit(_: Session) -> None:
+    """Re-enter an already entered sticky_singleton_acm."""
+    async with _Session():
+        pass
+
+
+async def main() -> None:
+    """Time the hits in a running loop."""
+    session = Session()
+    for name, f in (
+        ('raw object', raw),
+        ('raw async with', raw_async_with),
+        ('sticky_acm', sticky_acm_hit),
+        ('sticky_singleton_acm', sticky_singleton_acm_hit),
+    ):
+        await f(session)  # warm up, enter
+        best = float('inf')
+        for _ in range(5):
+            t0 = time.perf_counter()
+            for _ in range(N):
+                await f(session)
+            best = min(best, time.perf_counter() - t0)
+        print(f'{name:>20}: {best / N * 1e9:6.1f} ns/hit')
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,43 @@
+# SPDX-FileCopyrightText: 2023 Alexander Sosedkin <monk@unboiled.info>
+# SPDX-License-Identifier: GPL-3.0
+
+"""Microbenchmark storage() lookups against the plain WeakKeyDictionary."""
+
+import asyncio
+import timeit
+import weakref
+
+import asyncio_loop_local
+from asyncio_loop_local._storage import LoopLocalStorage
+
+N = 1_000_000
+
+_weak: weakref.WeakKeyDictionary[
+    asyncio.AbstractEventLoop,
+    LoopLocalStorage,
+] = weakref.WeakKeyDictionary()
+
+
+def weakref_storage() -> LoopLocalStorage:
+    """Look up storage the way it was done before the fast path."""
+    loop = asyncio.get_running_loop()
+    try:
+        return _weak[loop]
+    except KeyError:
+        pass
+    ls = _weak[loop] = LoopLocalStorage()
+    return ls
+
+
+async def main() -> None:
+    """Time both lookups in a running loop."""
+    for name, f in (
+        ('WeakKeyDictionary', weakref_storage),
+        ('storage()', asyncio_loop_local.storage),
+    ):
+        t = min(timeit.repeat(f, number=N, repeat=5))
+        print(f'{name:>20}: {t / N * 1e9:6.1f} ns/call')
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
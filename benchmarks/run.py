@@ -0,0 +1,501 @@
+# SPDX-FileCopyrightText: 2023 Alexander Sosedkin <monk@unboiled.info>
+# SPDX-License-Identifier: GPL-3.0
+
+"""Benchmark suite for the loop-local primitives.
+
+    python -m benchmarks.run                # run and compare to the latest
+    python -m benchmarks.run --save         # store as results/<version>.json
+    python -m benchmarks.run -k singleton   # only the matching ones
+
+Every benchmark reports the best of several repeats, in ns per operation.
+Some have absolute budgets too (see ``BUDGETS``), e.g., the import time.
+Results of different versions are kept in ``benchmarks/results/``,
+so that regressions show up when comparing against them.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import pathlib
+import platform
+import subprocess  # noqa: S404
+import sys
+import time
+import tomllib
+import typing
+
+import asyncio_loop_local
+
+RESULTS = pathlib.Path(__file__).parent / 'results'
+PYPROJECT = pathlib.Path(__file__).parent.parent / 'pyproject.toml'
+REPEAT = 5
+
+_Bench = typing.Callable[[int], float]  # runs n ops, returns seconds taken
+BENCHMARKS: dict[str, tuple[_Bench, int]] = {}
+# absolute limits in ns per operation, exceeding them fails the run
+BUDGETS: dict[str, float] = {
+    # generous for slow machines, an eager import of everything takes >50ms
+    'import asyncio_loop_local': 10_000_000,
+}
+
+
+def bench(name: str, n: int) -> typing.Callable[[_Bench], _Bench]:
+    """Register a benchmark doing n operations per repeat."""
+
+    def register(f: _Bench) -> _Bench:
+        BENCHMARKS[name] = f, n
+        return f
+
+    return register
+
+
+def in_loop(coro: typing.Coroutine[typing.Any, typing.Any, float]) -> float:
+    """Run a timing coroutine in a fresh loop, closing it afterwards."""
+    with asyncio.Runner() as runner:
+        return runner.run(coro)
+
+
+class NoopACM:
+    """A do-nothing async context manager."""
+
+    async def __aenter__(self: typing.Self) -> typing.Self:
+        """Enter."""
+        return self
+
+    async def __aexit__(self: typing.Self, *_: object) -> None:
+        """Exit."""
+
+
+###
+
+
+@bench('storage', 200_000)
+def storage(n: int) -> float:
+    """Look up the storage of the running loop."""
+
+    async def main() -> float:
+        f = asyncio_loop_local.storage
+        t0 = time.perf_counter()
+        for _ in range(n):
+            f()
+        return time.perf_counter() - t0
+
+    return in_loop(main())
+
+
+def _singleton_hits(
+    n: int,
+    f: typing.Callable[..., typing.Any],
+    *args: typing.Any,  # noqa: ANN401
+    **kwargs: typing.Any,  # noqa: ANN401
+) -> float:
+    async def main() -> float:
+        f(*args, **kwargs)
+        t0 = time.perf_counter()
+        for _ in range(n):
+            f(*args, **kwargs)
+        return time.perf_counter() - t0
+
+    return in_loop(main())
+
+
+@asyncio_loop_local.singleton
+def _no_args() -> object:
+    return object()
+
+
+@asyncio_loop_local.singleton
+def _positional(a: int, b: int, c: int = 3) -> object:  # noqa: ARG001
+    return object()
+
+
+@asyncio_loop_local.singleton
+def _keywords(a: int, *, b: int = 2) -> object:  # noqa: ARG001
+    return object()
+
+
+class _Session:
+    # like aiohttp.ClientSession, lots of keyword-only parameters
+    def __init__(  # noqa: PLR0913
+        self: typing.Self,
+        base_url: str | None = None,
+        *,
+        a: int = 0,
+        b: int = 0,
+        c: int = 0,
+        d: int = 0,
+        e: int = 0,
+        f: int = 0,
+        g: int = 0,
+        h: int = 0,
+        i: int = 0,
+        j: int = 0,
+        k: int = 0,
+        z: int = 0,
+        m: int = 0,
+        n: int = 0,
+        o: int = 0,
+        p: int = 0,
+        q: int = 0,
+        r: int = 0,
+        s: int = 0,
+        t: int = 0,
+        u: int = 0,
+        v: int = 0,
+        w: int = 0,
+        x: int = 0,
+        y: int = 0,
+    ) -> None:
+        pass
+
+
+_session = asyncio_loop_local.singleton(_Session)
+
+
+@asyncio_loop_local.singleton(key=lambda a, *_: a)
+def _custom_key(a: int, b: object) -> object:  # noqa: ARG001
+    return object()
+
+
+@asyncio_loop_local.singleton(maxsize=1000)
+def _bounded(a: int) -> object:  # noqa: ARG001
+    return object()
+
+
+@asyncio_loop_local.singleton(scope='process')
+def _process(a: int) -> object:  # noqa: ARG001
+    return object()
+
+
+@bench('singleton hit, no args', 100_000)
+def singleton_no_args(n: int) -> float:
+    """Hit a singleton taking no arguments."""
+    return _singleton_hits(n, _no_args)
+
+
+@bench('singleton hit, all positional', 100_000)
+def singleton_positional(n: int) -> float:
+    """Hit a singleton passing all the arguments positionally."""
+    return _singleton_hits(n, _positional, 1, 2, 3)
+
+
+@bench('singleton hit, defaults applied', 100_000)
+def singleton_defaults(n: int) -> float:
+    """Hit a singleton relying on the argument defaults."""
+    return _singleton_hits(n, _positional, 1, 2)
+
+
+@bench('singleton hit, keywords', 100_000)
+def singleton_keywords(n: int) -> float:
+    """Hit a singleton passing keyword arguments."""
+    return _singleton_hits(n, _keywords, 1, b=2)
+
+
+@bench('singleton hit, 25 keyword-only defaults', 100_000)
+def singleton_session(n: int) -> float:
+    """Hit a singleton-decorated class with lots of defaults."""
+    return _singleton_hits(n, _session, 'http://localhost')
+
+
+@bench('singleton hit, custom key', 100_000)
+def singleton_custom_key(n: int) -> float:
+    """Hit a singleton with a custom key function."""
+    return _singleton_hits(n, _custom_key, 1, {})
+
+
+@bench('singleton hit, maxsize', 100_000)
+def singleton_bounded(n: int) -> float:
+    """Hit a singleton bounded in size, so LRU bookkeeping is involved."""
+    return _singleton_hits(n, _bounded, 1)
+
+
+@bench('singleton hit, process scope', 100_000)
+def singleton_process(n: int) -> float:
+    """Hit a process-scope singleton."""
+    return _singleton_hits(n, _process, 1)
+
+
+@bench('singleton miss', 20_000)
+def singleton_miss(n: int) -> float:
+    """Miss a singleton, creating a value each time."""
+
+    @asyncio_loop_local.singleton
+    def f(a: int) -> object:  # noqa: ARG001
+        return object()
+
+    async def main() -> float:
+        t0 = time.perf_counter()
+        for i in range(n):
+            f(i)
+        return time.perf_counter() - t0
+
+    return in_loop(main())
+
+
+@bench('async singleton hit', 50_000)
+def async_singleton_hit(n: int) -> float:
+    """Hit an async singleton."""
+
+    @asyncio_loop_local.singleton
+    async def f(a: int) -> object:  # noqa: ARG001
+        return object()
+
+    async def main() -> float:
+        await f(1)
+        t0 = time.perf_counter()
+        for _ in range(n):
+            await f(1)
+        return time.perf_counter() - t0
+
+    return in_loop(main())
+
+
+@bench('enter_once, 100 contending tasks', 200)
+def enter_once_contention(n: int) -> float:
+    """Have 100 tasks enter_once the same slow acm at the same time."""
+
+    class SlowACM(NoopACM):
+        async def __aenter__(self: typing.Self) -> typing.Self:
+            await asyncio.sleep(0)
+            return self
+
+    async def main() -> float:
+        elapsed = 0.0
+        for _ in range(n):
+            acm = SlowACM()
+            t0 = time.perf_counter()
+            await asyncio.gather(
+                *[asyncio_loop_local.enter_once(acm) for _ in range(100)],
+            )
+            elapsed += time.perf_counter() - t0
+        return elapsed
+
+    return in_loop(main())
+
+
+@bench('enter_once hit', 100_000)
+def enter_once_hit(n: int) -> float:
+    """Enter an already entered acm."""
+
+    async def main() -> float:
+        acm = NoopACM()
+        await asyncio_loop_local.enter_once(acm)
+        t0 = time.perf_counter()
+        for _ in range(n):
+            await asyncio_loop_local.enter_once(acm)
+        return time.perf_counter() - t0
+
+    return in_loop(main())
+
+
+@bench('sticky_acm hit', 100_000)
+def sticky_acm_hit(n: int) -> float:
+    """Re-enter an already entered sticky_acm."""
+
+    async def main() -> float:
+        acm = NoopACM()
+        async with asyncio_loop_local.sticky_acm(acm):
+            pass
+        t0 = time.perf_counter()
+        for _ in range(n):
+            async with asyncio_loop_local.sticky_acm(acm):
+                pass
+        return time.perf_counter() - t0
+
+    return in_loop(main())
+
+
+@bench('limiter, uncontended', 100_000)
+def limiter_uncontended(n: int) -> float:
+    """Acquire and release a concurrency limiter no one else holds."""
+
+    async def main() -> float:
+        t0 = time.perf_counter()
+        for _ in range(n):
+            async with asyncio_loop_local.limiter('db', limit=10):
+                pass
+        return time.perf_counter() - t0
+
+    return in_loop(main())
+
+
+@bench('asyncio_loop_local.run, short-lived', 1_000)
+def many_runs(n: int) -> float:
+    """Do many short runs, each using a singleton and entering an acm."""
+
+    @asyncio_loop_local.singleton
+    def session() -> NoopACM:
+        return NoopACM()
+
+    async def main() -> None:
+        await asyncio_loop_local.enter_once(session())
+
+    t0 = time.perf_counter()
+    for _ in range(n):
+        asyncio_loop_local.run(main())
+    return time.perf_counter() - t0
+
+
+@bench('teardown of 1000 hooks, per hook', 1_000)
+def teardown(n: int) -> float:
+    """Close a loop with n entered acms."""
+
+    async def main() -> None:
+        for _ in range(n):
+            await asyncio_loop_local.enter(NoopACM())
+
+    loop = asyncio.new_event_loop()
+    loop.run_until_complete(main())
+    t0 = time.perf_counter()
+    loop.close()
+    return time.perf_counter() - t0
+
+
+def _import_time(n: int, statement: str) -> float:
+    # as reported by python -X importtime in fresh interpreters,
+    # summing up the top-level imports of the package and its submodules
+    total_us = 0
+    for _ in range(n):
+        stderr = subprocess.run(  # noqa: S603
+            [sys.executable, '-X', 'importtime', '-c', statement],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stderr
+        for line in stderr.splitlines():
+            _, cumulative, module = line.split('|')
+            if module.startswith(' asyncio_loop_local'):
+                total_us += int(cumulative)
+    return total_us / 1e6
+
+
+@bench('import asyncio_loop_local', 5)
+def import_package(n: int) -> float:
+    """Import the package alone, which imports nothing else."""
+    return _import_time(n, 'import asyncio_loop_local')
+
+
+@bench('import asyncio_loop_local, use singleton', 5)
+def import_singleton(n: int) -> float:
+    """Import the package and what singleton needs, asyncio included."""
+    return _import_time(n, 'from asyncio_loop_local import singleton')
+
+
+###
+
+
+def run(pattern: str | None) -> dict[str, float]:
+    """Run the (matching) benchmarks, return ns per operation."""
+    results = {}
+    for name, (f, n) in BENCHMARKS.items():
+        if pattern is not None and pattern not in name:
+            continue
+        best = min(f(n) for _ in range(REPEAT))
+        results[name] = round(best / n * 1e9, 1)
+        print(f'{name:>40}: {results[name]:10.1f} ns', flush=True)
+    return results
+
+
+def version() -> str:
+    """Return the version of the benchmarked code."""
+    with PYPROJECT.open('rb') as f:
+        return str(tomllib.load(f)['project']['version'])
+
+
+def latest(exclude: pathlib.Path) -> pathlib.Path | None:
+    """Return the most recently saved results, except for the given ones."""
+    saved = [p for p in RESULTS.glob('*.json') if p != exclude]
+    return max(saved, key=lambda p: p.stat().st_mtime, default=None)
+
+
+def compare(
+    results: dict[str, float],
+    baseline_path: pathlib.Path,
+    threshold: float,
+) -> list[str]:
+    """Print a comparison, return the names of the regressed benchmarks."""
+    baseline = json.loads(baseline_path.read_text(encoding='utf-8'))['results']
+    print(f'\ncompared to {baseline_path.name}:')
+    regressed = []
+    for name, ns in results.items():
+        if name not in baseline:
+            continue
+        ratio = ns / baseline[name]
+        mark = ''
+        if ratio > 1 + threshold:
+            mark = ' <- slower'
+            regressed.append(name)
+        print(f'{name:>40}: {ratio:6.2f}x{mark}')
+    return regressed
+
+
+def over_budget(results: dict[str, float]) -> list[str]:
+    """Print and return the names of the benchmarks over their budgets."""
+    over = [n for n, ns in results.items() if ns > BUDGETS.get(n, ns)]
+    for name in over:
+        print(f'{name} is over its budget of {BUDGETS[name]:.1f} ns')
+    return over
+
+
+def main() -> None:
+    """Run the benchmarks, save and compare the results as requested."""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('-k', help='only run benchmarks containing this')
+    parser.add_argument(
+        '--save',
+        action='store_true',
+        help='store the results as results/<version>.json',
+    )
+    parser.add_argument(
+        '--compare',
+        type=pathlib.Path,
+        help='results to compare against (default: the latest saved)',
+    )
+    parser.add_argument(
+        '--threshold',
+        type=float,
+        default=0.1,
+        help='slowdown to consider a regression (default: .1, 10%%)',
+    )
+    parser.add_argument(
+        '--fail-on-regression',
+        action='store_true',
+        help='exit with non-zero code if anything has regressed',
+    )
+    args = parser.parse_args()
+
+    results = run(args.k)
+    path = RESULTS / f'{version()}.json'
+    baseline = args.compare or latest(exclude=path)
+    if baseline is None and path.exists() and not args.save:
+        baseline = path
+    regressed = []
+    if baseline is not None:
+        regressed = compare(results, baseline, args.threshold)
+    if args.save:
+        RESULTS.mkdir(exist_ok=True)
+        with contextlib.suppress(FileNotFoundError):
+            saved = json.loads(path.read_text(encoding='utf-8'))['results']
+            results = {**saved, **results}  # keep the ones filtered out
+        path.write_text(
+            json.dumps(
+                {
+                    'version': version(),
+                    'python': platform.python_version(),
+                    'machine': platform.machine(),
+                    'results': results,
+                },
+                indent=2,
+            )
+            + '\n',
+            encoding='utf-8',
+        )
+        print(f'\nsaved to {path}')
+    regressed += over_budget(results)
+    if regressed and args.fail_on_regression:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -4,6 +4,8 @@
 """Test asyncio_loop_local._atexit hooks."""
 
 import asyncio
+import functools
+import gc
 
 import pytest
 
@@ -23,14 +25,15 @@ def test_atexit() -> None:
         log.append(2)
 
     async def main() -> None:
-        asyncio_loop_local._atexit._register(hook1())  # noqa: SLF001
-        asyncio_loop_local._atexit._register(hook2())  # noqa: SLF001
+        asyncio_loop_local._atexit._register(hook1)  # noqa: SLF001
+        asyncio_loop_local._atexit._register(hook2)  # noqa: SLF001
         await asyncio.sleep(0)
         log.append(0)
 
     loop = asyncio.new_event_loop()
     loop.run_until_complete(main())
     loop.close()
+    loop.close()  # closing again is harmless
 
     assert log == [0, 2, 1]
 
@@ -39,3 +42,164 @@ def test_atexit() -> None:
 async def test_no_atexit() -> None:
     """Test a corner case of triggering `_fire` without registering hooks."""
     await asyncio_loop_local._atexit._fire()  # noqa: SLF001
+
+
+def test_atexit_concurrent() -> None:
+    """Test that independent hooks run concurrently."""
+    e1, e2 = asyncio.Event(), asyncio.Event()
+
+    async def hook(mine: asyncio.Event, other: asyncio.Event) -> None:
+        mine.set()
+        await other.wait()  # would deadlock if ran sequentially
+
+    async def main() -> None:
+        asyncio_loop_local._atexit._register(lambda: hook(e1, e2))  # noqa: SLF001
+        asyncio_loop_local._atexit._register(lambda: hook(e2, e1))  # noqa: SLF001
+
+    loop = asyncio.new_event_loop()
+    loop.run_until_complete(main())
+    loop.close()
+    assert e1.is_set()
+    assert e2.is_set()
+
+
+def test_atexit_dependencies() -> None:
+    """Test that hooks declared to go first complete first."""
+    log = []
+
+    async def hook(name: str, delay: float) -> None:
+        await asyncio.sleep(delay)
+        log.append(name)
+
+    async def main() -> None:
+        reg = asyncio_loop_local._atexit._register  # noqa: SLF001
+        pool = reg(functools.partial(hook, 'pool', 0))
+        other = reg(functools.partial(hook, 'other', 0))
+        reg(functools.partial(hook, 'session', 0.01), before=[pool])
+        reg(functools.partial(hook, 'client', 0.02), before=[pool, other])
+
+    loop = asyncio.new_event_loop()
+    loop.run_until_complete(main())
+    loop.close()
+    assert log == ['session', 'client', 'other', 'pool']
+
+
+def test_atexit_errors() -> None:
+    """Test that failing hooks don't prevent others and get aggregated."""
+    log = []
+
+    async def hook(name: str, exc: BaseException | None = None) -> None:
+        await asyncio.sleep(0)
+        log.append(name)
+        if exc is not None:
+            raise exc
+
+    async def main() -> None:
+        reg = asyncio_loop_local._atexit._register  # noqa: SLF001
+        first = reg(functools.partial(hook, 'first'))
+        reg(
+            functools.partial(hook, 'second', ValueError('second')),
+            before=[first],
+        )
+        reg(functools.partial(hook, 'third'))
+        reg(functools.partial(hook, 'fourth', KeyError('fourth')))
+
+    loop = asyncio.new_event_loop()
+    loop.run_until_complete(main())
+    with pytest.raises(ExceptionGroup) as ex:
+        loop.close()
+    assert loop.is_closed()
+    assert sorted(log) == ['first', 'fourth', 'second', 'third']
+    assert log.index('second') < log.index('first')
+    assert [type(e) for e in ex.value.exceptions] == [KeyError, ValueError]
+
+
+def test_atexit_hook_timeouts() -> None:
+    """Test per-hook and default per-hook timeouts."""
+    log = []
+
+    async def hook(name: str, delay: float) -> None:
+        await asyncio.sleep(delay)
+        log.append(name)
+
+    async def own_timeout() -> None:
+        await asyncio.sleep(0)
+        msg = 'own'
+        raise TimeoutError(msg)
+
+    async def main() -> None:
+        asyncio_loop_local.set_teardown_timeouts(hook=0.01)
+        reg = asyncio_loop_local._atexit._register  # noqa: SLF001
+        reg(functools.partial(hook, 'fast', 0))
+        reg(functools.partial(hook, 'hung', 10), owner='hung')
+        reg(functools.partial(hook, 'slow', 0.02), timeout=1)
+        reg(
+            functools.partial(hook, 'stricter', 0.005),
+            owner='stricter',
+            timeout=0.001,
+        )
+        reg(own_timeout, owner='own')
+
+    loop = asyncio.new_event_loop()
+    loop.run_until_complete(main())
+    with pytest.raises(ExceptionGroup) as ex:
+        loop.close()
+    assert loop.is_closed()
+    assert sorted(log) == ['fast', 'slow']
+    assert sorted(str(e) for e in ex.value.exceptions) == [
+        "atexit hook for 'hung' timed out after 0.01s",
+        "atexit hook for 'stricter' timed out after 0.001s",
+        'own',
+    ]
+
+
+def test_atexit_total_timeout() -> None:
+    """Test the overall teardown timeout."""
+    log = []
+
+    async def hook(name: str, delay: float) -> None:
+        await asyncio.sleep(delay)
+        log.append(name)
+
+    async def main() -> None:
+        asyncio_loop_local.set_teardown_timeouts(total=0.01)
+        reg = asyncio_loop_local._atexit._register  # noqa: SLF001
+        reg(functools.partial(hook, 'fast', 0))
+        dependency = reg(
+            functools.partial(hook, 'dependency', 0), owner='dependency'
+        )
+        reg(
+            functools.partial(hook, 'hung', 10),
+            owner='hung',
+            before=[dependency],
+        )
+
+    loop = asyncio.new_event_loop()
+    loop.run_until_complete(main())
+    with pytest.raises(ExceptionGroup) as ex:
+        loop.close()
+    assert log == ['fast']
+    assert sorted(str(e) for e in ex.value.exceptions) == [
+        f"atexit hook for '{name}' cancelled, teardown took over 0.01s"
+        for name in ('dependency', 'hung')
+    ]
+
+
+def test_atexit_unclosed_loop() -> None:
+    """Test that hooks of a loop that hasn't been closed are dropped."""
+    called = []
+
+    async def hook() -> None:
+        called.append(1)
+
+    async def main() -> None:
+        asyncio_loop_local._atexit._register(hook)  # noqa: SLF001
+
+    loop = asyncio.new_event_loop()
+    loop.run_until_complete(main())
+    del loop
+    with pytest.warns(ResourceWarning) as record:
+        gc.collect()
+    msgs = [str(w.message) for w in record]
+    assert any('1 loop-local atexit hooks never fired' in m for m in msgs)
+    assert not called
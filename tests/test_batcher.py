@@ -0,0 +1,159 @@
+# SPDX-FileCopyrightText: 2023 Alexander Sosedkin <monk@unboiled.info>
+# SPDX-License-Identifier: GPL-3.0
+
+"""Test asyncio_loop_local.batcher."""
+
+import asyncio
+import typing
+
+import pytest
+from common import CountingACM
+
+import asyncio_loop_local
+
+
+@pytest.mark.asyncio()
+async def test_batcher() -> None:
+    """Test coalescing the calls made within the same iteration."""
+    batches = []
+
+    @asyncio_loop_local.batcher
+    async def square(keys: list[int]) -> list[int]:
+        batches.append(keys)
+        await asyncio.sleep(0)
+        return [k * k for k in keys]
+
+    r = await asyncio.gather(square(1), square(2), square(1))
+    assert list(r) == [1, 4, 1]
+    assert await square(3) == 9  # noqa: PLR2004
+    assert batches == [[1, 2], [3]]
+
+
+@pytest.mark.asyncio()
+async def test_batcher_limits() -> None:
+    """Test flushing on reaching max_batch_size or after max_delay."""
+    batches = []
+
+    @asyncio_loop_local.batcher(max_batch_size=2, max_delay=0.01)
+    async def echo(keys: list[str]) -> list[str]:
+        batches.append(keys)
+        await asyncio.sleep(0)
+        return keys
+
+    async def late(k: str) -> str:
+        await asyncio.sleep(0.001)
+        return await echo(k)
+
+    r = await asyncio.gather(echo('a'), echo('b'), echo('c'), late('d'))
+    assert list(r) == ['a', 'b', 'c', 'd']
+    assert batches == [['a', 'b'], ['c', 'd']]
+    with pytest.raises(ValueError, match='must be positive'):
+        asyncio_loop_local.batcher(max_batch_size=0)
+    with pytest.raises(TypeError, match='only works on async functions'):
+        asyncio_loop_local.batcher(len)  # type: ignore[arg-type]
+
+
+@pytest.mark.asyncio()
+async def test_batcher_failures() -> None:
+    """Test failing all the callers of a failed batch, and only them."""
+
+    @asyncio_loop_local.batcher
+    async def divide(keys: list[int]) -> list[int]:
+        await asyncio.sleep(0)
+        return [6 // k for k in keys]
+
+    @asyncio_loop_local.batcher
+    async def lossy(keys: list[int]) -> list[int]:
+        await asyncio.sleep(0)
+        return keys[1:]
+
+    r = await asyncio.gather(divide(0), divide(1), return_exceptions=True)
+    assert [type(e) for e in r] == [ZeroDivisionError] * 2
+    assert await divide(2) == 3  # noqa: PLR2004
+    with pytest.raises(ValueError, match='returned 1 results for 2 keys'):
+        await asyncio.gather(lossy(1), lossy(2))
+
+
+def test_batcher_atexit() -> None:
+    """Test flushing the pending batches and waiting for them at exit."""
+    batches = []
+
+    @asyncio_loop_local.batcher(max_delay=60)
+    async def echo(keys: list[int]) -> list[int]:
+        await asyncio.sleep(0.01)
+        batches.append(keys)
+        return keys
+
+    async def main() -> None:
+        asyncio.get_running_loop().create_task(echo(1))
+        await asyncio.sleep(0)
+
+    asyncio_loop_local.run(main())
+    assert batches == [[1]]
+
+
+def test_batcher_atexit_backend() -> None:
+    """Test draining the batches before closing what they need."""
+    batches = []
+
+    class Backend(CountingACM):
+        """A connection pool to fetch the batches through."""
+
+        async def echo(self: typing.Self, keys: list[int]) -> list[int]:
+            await asyncio.sleep(0.01)
+            if self.exits:
+                msg = 'backend closed'
+                raise RuntimeError(msg)
+            return keys
+
+    backend = Backend()
+
+    @asyncio_loop_local.batcher(max_delay=60)
+    async def echo(keys: list[int]) -> list[int]:
+        b = await asyncio_loop_local.enter_once(backend)
+        batches.append(await b.echo(keys))
+        return keys
+
+    async def main() -> None:
+        await asyncio_loop_local.enter_once(backend)
+        asyncio.get_running_loop().create_task(echo(1))
+        await asyncio.sleep(0)
+
+    asyncio_loop_local.run(main())
+    assert batches == [[1]]
+    assert backend.exits == 1
+
+
+def test_batcher_cancelled() -> None:
+    """Test cancelling the callers if the batch gets cancelled."""
+    started = asyncio.Event()
+
+    @asyncio_loop_local.batcher
+    async def hang(keys: list[int]) -> list[int]:
+        started.set()
+        await asyncio.Event().wait()
+        return keys  # pragma: no cover
+
+    async def main() -> asyncio.Task[int]:
+        task = asyncio.get_running_loop().create_task(hang(1))
+        await started.wait()
+        return task
+
+    task = asyncio.run(main())  # cancels all the tasks, the batch included
+    assert task.cancelled()
+
+
+@pytest.mark.asyncio()
+async def test_batcher_release() -> None:
+    """Test releasing a batcher, sending what's pending right away."""
+
+    @asyncio_loop_local.batcher(max_delay=60)
+    async def echo(keys: list[int]) -> list[int]:
+        await asyncio.sleep(0)
+        return keys
+
+    pending = asyncio.ensure_future(echo(1))
+    await asyncio.sleep(0)
+    await asyncio_loop_local.release(echo)
+    assert pending.done()
+    assert await pending == 1
@@ -0,0 +1,183 @@
+# SPDX-FileCopyrightText: 2023 Alexander Sosedkin <monk@unboiled.info>
+# SPDX-License-Identifier: GPL-3.0
+
+"""Test asyncio_loop_local.cached."""
+
+import asyncio
+import types
+import typing
+
+import pytest
+
+import asyncio_loop_local
+
+
+class Source:
+    """A helper for counting calls and returning distinct results."""
+
+    def __init__(self: typing.Self) -> None:
+        """Initialize Source."""
+        self.calls: list[str] = []
+        self.fail = False
+
+    async def __call__(self: typing.Self, name: str) -> list[str]:
+        """Return a fresh list, or fail if asked to."""
+        self.calls.append(name)
+        await asyncio.sleep(0)
+        if self.fail:
+            raise ValueError(name)
+        return [name]
+
+
+@pytest.mark.asyncio()
+async def test_cached() -> None:
+    """Test caching, coalescing and expiring."""
+    src = Source()
+
+    @asyncio_loop_local.cached(ttl=0.05)
+    async def fetch(name: str) -> list[str]:
+        return await src(name)
+
+    r, r_ = await asyncio.gather(fetch('a'), fetch(name='a'))
+    assert r is r_
+    assert await fetch('a') is r
+    await asyncio.sleep(0.1)
+    assert await fetch('a') is not r
+    assert src.calls == ['a', 'a']
+    info = fetch.cache_info()  # type: ignore[attr-defined]
+    assert (info.hits, info.misses, info.currsize) == (2, 2, 1)
+
+
+@pytest.mark.asyncio()
+async def test_cached_forever_and_bounded() -> None:
+    """Test caching without a ttl, but with a maxsize."""
+    src = Source()
+    fetch = asyncio_loop_local.cached(src.__call__, maxsize=2)
+
+    a = await fetch('a')
+    await fetch('b')
+    assert await fetch('a') is a  # a is now the most recently used
+    await fetch('c')  # evicts b
+    assert await fetch('a') is a
+    await fetch('b')
+    assert src.calls == ['a', 'b', 'c', 'b']
+    info = fetch.cache_info()  # type: ignore[attr-defined]
+    assert (info.evictions, info.maxsize, info.currsize) == (2, 2, 2)
+
+    src.fail = True
+    failing = asyncio.ensure_future(fetch('x'))
+    await asyncio.sleep(0)
+    others = asyncio.gather(fetch('y'), fetch('z'), return_exceptions=True)
+    with pytest.raises(ValueError, match='x'):  # evicted while in flight
+        await failing
+    await others
+
+
+@pytest.mark.asyncio()
+async def test_cached_stale_while_revalidate() -> None:
+    """Test serving stale results while refreshing them in the background."""
+    src = Source()
+    fetch = asyncio_loop_local.cached(src.__call__, ttl=0.05, stale_ttl=0.2)
+
+    r1 = await fetch('a')
+    await asyncio.sleep(0.06)
+    assert await fetch('a') is r1  # stale, refresh scheduled
+    assert await fetch('a') is r1  # stale, refresh already in progress
+    await asyncio.sleep(0.01)
+    r2 = await fetch('a')
+    assert r2 is not r1
+    assert src.calls == ['a', 'a']
+
+    src.fail = True
+    await asyncio.sleep(0.06)
+    assert await fetch('a') is r2  # stale, refresh is going to fail
+    await asyncio.sleep(0.01)
+    assert await fetch('a') is r2  # still stale, refresh is going to fail
+    await asyncio.sleep(0.3)
+    with pytest.raises(ValueError, match='a'):
+        await fetch('a')  # too stale
+    assert src.calls == ['a', 'a', 'a', 'a', 'a']
+
+
+@pytest.mark.asyncio()
+async def test_cached_negative() -> None:
+    """Test caching failures, but only if asked to."""
+    src = Source()
+    src.fail = True
+    fetch = asyncio_loop_local.cached(src.__call__, negative_ttl=0.05)
+    fetch_ = asyncio_loop_local.cached(src.__call__)
+
+    for _ in range(2):
+        with pytest.raises(ValueError, match='a'):
+            await fetch('a')
+        with pytest.raises(ValueError, match='b'):
+            await fetch_('b')
+    await asyncio.sleep(0.1)
+    with pytest.raises(ValueError, match='a'):
+        await fetch('a')
+    assert src.calls == ['a', 'b', 'b', 'a']
+
+
+@pytest.mark.asyncio()
+async def test_cached_never_asked_again(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Test dropping the expired memos on storing new ones."""
+    clock = [0.0]
+    fake_time = types.SimpleNamespace(monotonic=lambda: clock[0])
+    monkeypatch.setattr(asyncio_loop_local._cached, 'time', fake_time)  # noqa: SLF001
+    src = Source()
+
+    @asyncio_loop_local.cached(ttl=0.01, stale_ttl=0.01, negative_ttl=0.05)
+    async def fetch(name: str) -> list[str]:
+        return await src(name)
+
+    for i in range(1000):
+        await fetch(str(i))
+    clock[0] += 0.015
+    await fetch('0')  # stale, refreshed in the background
+    await asyncio.sleep(0.01)
+    src.fail = True
+    with pytest.raises(ValueError, match='x'):
+        await fetch('x')  # remembered for longer
+    src.fail = False
+    clock[0] += 0.015
+    for i in range(1000, 1010):
+        await fetch(str(i))
+    info = fetch.cache_info()  # type: ignore[attr-defined]
+    assert (info.currsize, len(src.calls)) == (12, 1012)  # with 0 and x
+    clock[0] += 0.1
+    await fetch('y')
+    assert fetch.cache_info().currsize == 1  # type: ignore[attr-defined]
+
+
+@pytest.mark.asyncio()
+async def test_cached_cancelled() -> None:
+    """Test that cancellations aren't cached, even with negative_ttl."""
+
+    @asyncio_loop_local.cached(negative_ttl=60)
+    async def slow() -> None:
+        await asyncio.sleep(60)
+
+    t = asyncio.ensure_future(slow())
+    await asyncio.sleep(0)
+    code = slow.__wrapped__.__code__  # type: ignore[attr-defined]
+    (inner,) = (
+        task
+        for task in asyncio.all_tasks()
+        if getattr(task.get_coro(), 'cr_code', None) is code
+    )
+    inner.cancel()  # the one being shielded
+    with pytest.raises(asyncio.CancelledError):
+        await t
+    assert slow.cache_info().currsize == 0  # type: ignore[attr-defined]
+
+
+def test_cached_misuse() -> None:
+    """Test rejecting what makes no sense."""
+    with pytest.raises(ValueError, match='maxsize must be positive'):
+        asyncio_loop_local.cached(maxsize=0)
+    with pytest.raises(ValueError, match='stale_ttl makes no sense'):
+        asyncio_loop_local.cached(stale_ttl=1)
+    with pytest.raises(TypeError, match='only works on async functions'):
+        asyncio_loop_local.cached(len)  # type: ignore[arg-type]
@@ -4,6 +4,7 @@
 """Test asyncio_loop_local.enter."""
 
 import asyncio
+import typing
 
 import pytest
 from common import CountingACM
@@ -47,3 +48,53 @@ def test_two_loops_enter() -> None:
     assert (acm.enters, acm.exits) == (8, 4)
     l2.close()
     assert (acm.enters, acm.exits) == (8, 8)
+
+
+def test_enter_depends_on() -> None:
+    """Test that dependencies are exited after the dependents."""
+    unrelated = CountingACM()
+    log = []
+
+    class LoggingACM(CountingACM):
+        def __init__(self: typing.Self, name: str) -> None:
+            super().__init__()
+            self.name = name
+
+        async def __aexit__(self: typing.Self, *a: object) -> None:
+            for _ in range(5):
+                await asyncio.sleep(0)  # let the others overtake
+            log.append(self.name)
+
+    pool, session = LoggingACM('pool'), LoggingACM('session')
+
+    async def main() -> None:
+        await asyncio_loop_local.enter(pool)
+        await asyncio_loop_local.enter(unrelated)
+        await asyncio_loop_local.enter_once(session, depends_on=[pool])
+        with pytest.raises(LookupError, match='has not been entered'):
+            await asyncio_loop_local.enter(pool, depends_on=[CountingACM()])
+
+    loop = asyncio.new_event_loop()
+    loop.run_until_complete(main())
+    loop.close()
+    assert log == ['session', 'pool']
+    assert unrelated.exits == 1
+
+
+def test_enter_timeout() -> None:
+    """Test limiting the time deferred __aexit__'s can take."""
+
+    class HungACM(CountingACM):
+        async def __aexit__(self: typing.Self, *a: object) -> None:
+            await asyncio.sleep(10)
+
+    async def main() -> None:
+        await asyncio_loop_local.enter(HungACM(), exit_timeout=0.01)
+        await asyncio_loop_local.enter_once(HungACM(), exit_timeout=0.01)
+
+    loop = asyncio.new_event_loop()
+    loop.run_until_complete(main())
+    with pytest.raises(ExceptionGroup) as ex:
+        loop.close()
+    assert all(isinstance(e, TimeoutError) for e in ex.value.exceptions)
+    assert len(ex.value.exceptions) == len([1, 2])
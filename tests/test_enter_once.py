@@ -4,11 +4,13 @@
 """Test asyncio_loop_local.enter_once."""
 
 import asyncio
+import typing
 
 import pytest
 from common import CountingACM
 
 import asyncio_loop_local
+from asyncio_loop_local import _enter_once
 
 
 @pytest.mark.asyncio()
@@ -62,3 +64,55 @@ async def test_enter_once_parallel() -> None:
         *[asyncio_loop_local.enter_once(acm) for _ in range(7)],
     )
     assert (acm.enters, acm.exits) == (1, 0)
+
+
+@pytest.mark.asyncio()
+async def test_enter_once_unrelated_concurrently() -> None:
+    """Test that a slow enter_once doesn't block unrelated ones."""
+    gate = asyncio.Event()
+
+    class SlowACM(CountingACM):
+        async def __aenter__(self: typing.Self) -> typing.Self:
+            await gate.wait()
+            return await super().__aenter__()
+
+    slow, fast = SlowACM(), CountingACM()
+    slow_tasks = [
+        asyncio.create_task(asyncio_loop_local.enter_once(slow))
+        for _ in range(3)
+    ]
+    await asyncio.sleep(0)
+    assert await asyncio_loop_local.enter_once(fast) is fast
+    assert (fast.enters, slow.enters) == (1, 0)
+    gate.set()
+    assert await asyncio.gather(*slow_tasks) == [slow] * 3
+    assert (fast.enters, slow.enters) == (1, 1)
+
+
+@pytest.mark.asyncio()
+async def test_enter_once_failure_retried() -> None:
+    """Test that a failed __aenter__ is retried by the next caller."""
+
+    class FlakyACM(CountingACM):
+        async def __aenter__(self: typing.Self) -> typing.Self:
+            if not self.enters:
+                self.enters += 1
+                raise RuntimeError
+            return await super().__aenter__()
+
+    acm = FlakyACM()
+    with pytest.raises(RuntimeError):
+        await asyncio_loop_local.enter_once(acm)
+    cache = asyncio_loop_local.storage()[_enter_once.enter_once_sentinel]
+    assert acm not in cache  # nothing left behind
+    assert await asyncio_loop_local.enter_once(acm) is acm
+    assert (acm.enters, acm.exits) == (2, 0)
+
+    concurrent = FlakyACM()
+    r = await asyncio.gather(
+        asyncio_loop_local.enter_once(concurrent),
+        asyncio_loop_local.enter_once(concurrent),  # retries on failure
+        return_exceptions=True,
+    )
+    assert [type(x) for x in r] == [RuntimeError, FlakyACM]
+    assert cache[concurrent].entered
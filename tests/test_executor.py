@@ -0,0 +1,123 @@
+# SPDX-FileCopyrightText: 2023 Alexander Sosedkin <monk@unboiled.info>
+# SPDX-License-Identifier: GPL-3.0
+
+"""Test asyncio_loop_local.executor."""
+
+import asyncio
+import concurrent.futures
+import os
+import threading
+import time
+
+import pytest
+
+import asyncio_loop_local
+
+
+def test_executor() -> None:
+    """Test reusing executors by name and shutting them down in the end."""
+
+    async def main() -> list[concurrent.futures.Executor]:
+        ex1 = await asyncio_loop_local.executor()
+        ex2 = await asyncio_loop_local.executor('io', max_workers=2)
+        assert await asyncio_loop_local.executor() is ex1
+        assert await asyncio_loop_local.executor('io') is ex2
+        assert ex1 is not ex2
+        assert isinstance(ex2, concurrent.futures.ThreadPoolExecutor)
+        loop = asyncio.get_running_loop()
+        assert await loop.run_in_executor(ex2, sum, [1, 2]) == 3  # noqa: PLR2004
+        return [ex1, ex2]
+
+    for ex in asyncio_loop_local.run(main()):
+        with pytest.raises(RuntimeError, match='shutdown'):
+            ex.submit(int)
+
+
+@pytest.mark.asyncio()
+async def test_executor_mismatch() -> None:
+    """Test asking for an existing executor with different settings."""
+    ex = await asyncio_loop_local.executor('cpu', kind='thread', max_workers=1)
+    assert await asyncio_loop_local.executor('cpu', max_workers=1) is ex
+    with pytest.raises(ValueError, match='not a process pool'):
+        await asyncio_loop_local.executor('cpu', kind='process')
+    with pytest.raises(ValueError, match='has 1 workers, not 2'):
+        await asyncio_loop_local.executor('cpu', max_workers=2)
+
+
+@pytest.mark.asyncio()
+async def test_executor_install_default() -> None:
+    """Test making a thread pool the loop's default executor."""
+    ex = await asyncio_loop_local.executor(
+        'default',
+        max_workers=1,
+        install_default=True,
+    )
+    loop = asyncio.get_running_loop()
+    tid = await loop.run_in_executor(None, threading.get_ident)
+    assert await loop.run_in_executor(ex, threading.get_ident) == tid
+    await asyncio_loop_local.release(ex)
+    assert await loop.run_in_executor(None, int) == 0  # not the shut down one
+    with pytest.raises(ValueError, match='only a thread pool'):
+        await asyncio_loop_local.executor(
+            'cpu',
+            kind='process',
+            max_workers=1,
+            install_default=True,
+        )
+
+
+@pytest.mark.asyncio()
+async def test_executor_warm_up() -> None:
+    """Test spawning all the workers upfront."""
+    ex = await asyncio_loop_local.executor(max_workers=3, warm_up=True)
+    assert len(ex._threads) == 3  # type: ignore[attr-defined]  # noqa: PLR2004, SLF001
+    loop = asyncio.get_running_loop()
+    done = threading.Event()
+    busy = [loop.run_in_executor(ex, done.wait, 1) for _ in range(3)]
+    assert await asyncio_loop_local.executor(warm_up=True) is ex  # no waiting
+    assert not any(job.done() for job in busy)
+    done.set()
+    await asyncio.gather(*busy)
+    pex = await asyncio_loop_local.executor(
+        'cpu',
+        kind='process',
+        max_workers=2,
+        warm_up=True,
+    )
+    assert pex._processes  # type: ignore[attr-defined]  # noqa: SLF001
+    assert await loop.run_in_executor(pex, os.getpid) != os.getpid()
+
+
+@pytest.mark.asyncio()
+async def test_executor_release() -> None:
+    """Test shutting down an executor early, without blocking the loop."""
+    ex = await asyncio_loop_local.executor('io')
+    loop = asyncio.get_running_loop()
+    job = loop.run_in_executor(ex, time.sleep, 0.05)
+    ticks = 0
+
+    async def tick() -> None:
+        nonlocal ticks
+        while not job.done():
+            ticks += 1
+            await asyncio.sleep(0.001)
+
+    await asyncio.gather(asyncio_loop_local.release(ex), tick())
+    assert job.done()
+    assert ticks > 1  # the loop kept running while waiting for the job
+    assert await asyncio_loop_local.executor('io') is not ex
+
+
+@pytest.mark.asyncio()
+async def test_executor_shutdown_failure() -> None:
+    """Test propagating the errors of shutting an executor down."""
+    ex = await asyncio_loop_local.executor('io')
+
+    def shutdown(*, wait: bool = True) -> None:
+        ex.__class__.shutdown(ex, wait=wait)
+        raise OSError
+
+    ex.shutdown = shutdown  # type: ignore[assignment,method-assign]
+    with pytest.raises(ExceptionGroup) as ei:
+        await asyncio_loop_local.release(ex)
+    assert ei.group_contains(OSError)
@@ -0,0 +1,123 @@
+# SPDX-FileCopyrightText: 2023 Alexander Sosedkin <monk@unboiled.info>
+# SPDX-License-Identifier: GPL-3.0
+
+"""Test fork-safety and pre-fork warm-up."""
+
+import asyncio
+import os
+import traceback
+import typing
+import warnings
+
+import pytest
+from common import CountingACM
+
+import asyncio_loop_local
+
+
+def _in_child(check: typing.Callable[[], None]) -> None:
+    # run check() in a forked child, fail if it fails there
+    pid = os.fork()
+    if not pid:  # pragma: no cover
+        code = 1
+        try:
+            check()
+            code = 0
+        except BaseException:  # noqa: BLE001
+            traceback.print_exc()
+        finally:
+            os._exit(code)
+    _, status = os.waitpid(pid, 0)
+    assert os.waitstatus_to_exitcode(status) == 0
+
+
+def test_warm_up() -> None:
+    """Test that warm-ups run once, and failed ones stay pending."""
+    log = []
+    attempts = 0
+
+    def build(name: str) -> None:
+        log.append(name)
+
+    def flaky(name: str) -> None:
+        nonlocal attempts
+        attempts += 1
+        if attempts == 1:
+            raise RuntimeError
+        log.append(name)
+
+    asyncio_loop_local.register_warm_up(build, 'a')
+    asyncio_loop_local.register_warm_up(flaky, 'b')
+    with pytest.raises(RuntimeError):
+        asyncio_loop_local.warm_up()
+    assert log == ['a']
+    asyncio_loop_local.warm_up()
+    asyncio_loop_local.warm_up()
+    assert log == ['a', 'b']
+    assert attempts == 2  # noqa: PLR2004
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='no fork')
+def test_after_fork_in_child() -> None:
+    """Test forgetting inherited loop-local state without exiting it."""
+    acm = CountingACM()
+    loop = asyncio.new_event_loop()
+
+    @asyncio_loop_local.singleton(scope='process')
+    def table() -> list[int]:
+        return [1]
+
+    async def enter() -> None:
+        await asyncio_loop_local.enter(acm)
+        asyncio_loop_local.storage()['x'] = 1
+
+    loop.run_until_complete(enter())
+    caches = asyncio_loop_local._singleton._process_caches  # noqa: SLF001
+    locks = [sc.lock for sc in caches.values()]  # so that ids aren't reused
+
+    async def check_storage() -> None:
+        assert asyncio_loop_local.storage() == {}
+
+    def check() -> None:  # pragma: no cover
+        assert not any(sc.lock in locks for sc in caches.values())
+        assert table() == [1]
+        loop.run_until_complete(check_storage())
+        with warnings.catch_warnings():
+            warnings.simplefilter('error')
+            loop.close()
+        assert (acm.enters, acm.exits) == (1, 0)
+
+    _in_child(check)
+    loop.close()
+    assert (acm.enters, acm.exits) == (1, 1)
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='no fork')
+def test_fork() -> None:
+    """Test the fork hooks with a real fork."""
+    acm = CountingACM()
+    warmed = []
+    loop = asyncio.new_event_loop()
+
+    @asyncio_loop_local.singleton(scope='process')
+    def table() -> list[int]:
+        warmed.append(os.getpid())
+        return [1]
+
+    async def enter() -> None:
+        await asyncio_loop_local.enter(acm)
+
+    loop.run_until_complete(enter())
+    asyncio_loop_local.register_warm_up(table)
+
+    def check() -> None:  # pragma: no cover
+        assert warmed == [os.getppid()]
+        assert table() == [1]
+        assert not asyncio_loop_local._storage._loop_local_storages  # noqa: SLF001
+        loop.close()
+        assert acm.exits == 0
+
+    _in_child(check)
+    assert warmed == [os.getpid()]
+    loop.close()
+    assert (acm.enters, acm.exits) == (1, 1)
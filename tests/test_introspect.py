@@ -0,0 +1,90 @@
+# SPDX-FileCopyrightText: 2023 Alexander Sosedkin <monk@unboiled.info>
+# SPDX-License-Identifier: GPL-3.0
+
+"""Test asyncio_loop_local.snapshot and snapshot_all."""
+
+import asyncio
+
+import pytest
+from common import CountingACM
+
+import asyncio_loop_local
+
+
+def _make_buffer(n: int) -> bytearray:
+    return bytearray(n)
+
+
+async def _amake_buffer(n: int) -> bytearray:
+    await asyncio.sleep(0)
+    if not n:
+        raise ValueError
+    return bytearray(n)
+
+
+_buffer = asyncio_loop_local.singleton(_make_buffer, ttl=3600)  # count hits
+_abuffer = asyncio_loop_local.singleton(_amake_buffer)
+
+
+def _size(size: int | None) -> int:
+    assert size is not None
+    return size
+
+
+@pytest.mark.asyncio()
+async def test_snapshot() -> None:
+    """Test describing the running loop."""
+    s = asyncio_loop_local.snapshot()
+    assert (s.resources, s.singletons, s.pending_hooks) == ([], [], 0)
+
+    acm1, acm2, acm3 = CountingACM(), CountingACM(), CountingACM()
+    await asyncio_loop_local.enter(acm1, exit_timeout=5)
+    for _ in range(3):
+        await asyncio_loop_local.enter_once(acm2)
+    for _ in range(2):
+        async with asyncio_loop_local.sticky_acm(acm3):
+            pass
+    for _ in range(2):
+        _buffer(1000)
+    await _abuffer(10)
+    pending = asyncio.ensure_future(_abuffer(20))
+    failing = asyncio.ensure_future(_abuffer(0))
+    await asyncio.sleep(0)
+
+    s = asyncio_loop_local.snapshot(sizes=True)
+    assert s.loop is asyncio.get_running_loop()
+    assert (s.pending_hooks, len(s.resources)) == (3, 3)
+    assert [(r.acm, r.hits, r.exit_timeout) for r in s.resources] == [
+        (acm1, 0, 5),
+        (acm2, 2, None),
+        (acm3, 1, None),
+    ]
+    assert all(r.value is r.acm for r in s.resources)
+    assert all(r.age >= 0 for r in s.resources)
+    assert all(_size(r.size) > 0 for r in s.resources)
+
+    (b,) = (i for i in s.singletons if i.callable is _make_buffer)
+    assert (b.key, b.hits) == ((1000,), 1)
+    assert _size(b.size) > len(b.value)  # type: ignore[arg-type]
+    a = [i for i in s.singletons if i.callable is _amake_buffer]
+    assert [type(i.value) for i in a] == [bytearray, *[asyncio.Task] * 2]
+
+    await pending
+    with pytest.raises(ValueError):  # noqa: PT011
+        await failing
+    assert asyncio_loop_local.snapshot().singletons[0].size is None
+
+
+def test_snapshot_all() -> None:
+    """Test describing all the loops, including not running ones."""
+    acm = CountingACM()
+    loop = asyncio.new_event_loop()
+    loop.run_until_complete(asyncio_loop_local.enter(acm))
+    (s,) = (s for s in asyncio_loop_local.snapshot_all() if s.loop is loop)
+    assert [r.acm for r in s.resources] == [acm]
+    assert asyncio_loop_local.snapshot(loop).resources[0].acm is acm
+    loop.close()
+    assert asyncio_loop_local.snapshot(loop).pending_hooks == 0
+    other_loop = asyncio.new_event_loop()
+    assert not asyncio_loop_local.snapshot(other_loop).resources
+    other_loop.close()
@@ -0,0 +1,71 @@
+# SPDX-FileCopyrightText: 2023 Alexander Sosedkin <monk@unboiled.info>
+# SPDX-License-Identifier: GPL-3.0
+
+"""Test importing asyncio_loop_local lazily."""
+
+import subprocess
+import sys
+
+import pytest
+
+import asyncio_loop_local
+
+
+def _run(code: str) -> None:
+    subprocess.run([sys.executable, '-c', code], check=True)  # noqa: S603
+
+
+def test_lazy_import() -> None:
+    """Test that only the parts in use get imported."""
+    _run(
+        'import sys\n'
+        'import asyncio_loop_local\n'
+        "assert 'asyncio' not in sys.modules\n"
+        "assert 'asyncio_loop_local._singleton' not in sys.modules\n"
+        'asyncio_loop_local.set_observer(None)\n'
+        "assert 'asyncio_loop_local._observe' in sys.modules\n"
+        "assert 'asyncio_loop_local._singleton' not in sys.modules\n",
+    )
+
+
+def test_lazy_import_fork() -> None:
+    """Test that creating state needing fork handling sets it up."""
+    _run(
+        'import sys\n'
+        'import asyncio\n'
+        'from asyncio_loop_local import storage\n'
+        "assert 'asyncio_loop_local._fork' not in sys.modules\n"
+        'async def main():\n'
+        '    storage()\n'
+        'asyncio.run(main())\n'
+        "assert 'asyncio_loop_local._fork' in sys.modules\n",
+    )
+    _run(
+        'import sys\n'
+        'from asyncio_loop_local import singleton\n'
+        "assert 'asyncio_loop_local._fork' not in sys.modules\n"
+        "singleton(scope='process')(int)\n"
+        "assert 'asyncio_loop_local._fork' in sys.modules\n",
+    )
+
+
+def test_lazy_import_fork_hooks() -> None:
+    """Test that the fork hooks don't import the rest of the package."""
+    _run(
+        'import sys\n'
+        'import asyncio_loop_local._fork\n'
+        "assert 'asyncio' not in sys.modules\n"
+        "assert 'asyncio_loop_local._storage' not in sys.modules\n"
+        'asyncio_loop_local._fork._after_fork_in_child()\n'
+        "assert 'asyncio_loop_local._storage' not in sys.modules\n",
+    )
+
+
+def test_getattr() -> None:
+    """Test accessing the public names, and only them."""
+    assert 'singleton' in dir(asyncio_loop_local)
+    assert set(asyncio_loop_local.__all__) <= set(dir(asyncio_loop_local))
+    for name in asyncio_loop_local.__all__:
+        getattr(asyncio_loop_local, name)
+    with pytest.raises(AttributeError, match='has no attribute'):
+        asyncio_loop_local.nonexistent  # type: ignore[attr-defined]  # noqa: B018
@@ -0,0 +1,128 @@
+# SPDX-FileCopyrightText: 2023 Alexander Sosedkin <monk@unboiled.info>
+# SPDX-License-Identifier: GPL-3.0
+
+"""Test asyncio_loop_local.limiter."""
+
+import asyncio
+import time
+import types
+
+import pytest
+
+import asyncio_loop_local
+
+
+@pytest.mark.asyncio()
+async def test_limiter_registry() -> None:
+    """Test getting limiters by name and validating their settings."""
+    lim = asyncio_loop_local.limiter('db', limit=2)
+    assert asyncio_loop_local.limiter('db') is lim
+    assert asyncio_loop_local.limiter('db', kind='concurrency', limit=2) is lim
+    assert repr(lim) == "<_Concurrency 'db' concurrency=2>"
+    with pytest.raises(ValueError, match='different kind'):
+        asyncio_loop_local.limiter('db', kind='token_bucket')
+    with pytest.raises(ValueError, match='different limit than 3'):
+        asyncio_loop_local.limiter('db', limit=3)
+    with pytest.raises(LookupError, match='specify limit'):
+        asyncio_loop_local.limiter('api')
+    bad = [
+        ('concurrency', 0, None, 'must be positive'),
+        ('concurrency', 1.5, None, 'whole number'),
+        ('concurrency', 1, 2, 'without burst'),
+        ('leaky_bucket', 1, 2, 'does not burst'),
+        ('token_bucket', 1, 0, 'must be positive'),
+        ('tokenbucket', 1, None, 'kind must be'),
+    ]
+    for kind, limit, burst, match in bad:
+        with pytest.raises(ValueError, match=match):
+            asyncio_loop_local.limiter(
+                'api',
+                kind=kind,  # type: ignore[arg-type]
+                limit=limit,
+                burst=burst,
+            )
+    tb = asyncio_loop_local.limiter('api', kind='token_bucket', limit=5)
+    assert repr(tb) == "<_TokenBucket 'api' token_bucket=5, burst=5>"
+
+
+@pytest.mark.asyncio()
+async def test_limiter_concurrency() -> None:
+    """Test limiting concurrency, fairly, and gathering wait statistics."""
+    lim = asyncio_loop_local.limiter('db', limit=2)
+    active, order = 0, []
+
+    async def work(i: int) -> None:
+        nonlocal active
+        async with lim:
+            active += 1
+            assert active <= 2  # noqa: PLR2004
+            order.append(i)
+            await asyncio.sleep(0.001)
+            active -= 1
+
+    await asyncio.gather(*(work(i) for i in range(5)))
+    assert order == list(range(5))
+    acquired, waited, wait_time, max_wait_time = lim.info()
+    assert (acquired, waited) == (5, 3)
+    assert 0 < max_wait_time <= wait_time
+
+
+@pytest.mark.asyncio()
+async def test_limiter_concurrency_cancel() -> None:
+    """Test cancelling the waiters, before and after being handed a slot."""
+    lim = asyncio_loop_local.limiter('db', limit=1)
+    await lim.acquire()
+    waiters = [asyncio.ensure_future(lim.acquire()) for _ in range(3)]
+    await asyncio.sleep(0)
+    waiters[0].cancel()
+    await asyncio.sleep(0)  # the first one is gone from the queue
+    lim.release()  # handed over to the second one
+    waiters[1].cancel()  # which passes it on to the third one
+    await waiters[2]
+    waiters.append(asyncio.ensure_future(lim.acquire()))
+    await asyncio.sleep(0)
+    waiters[3].cancel()
+    lim.release()  # skips the cancelled one
+    await asyncio.gather(*waiters, return_exceptions=True)
+    assert [w.cancelled() for w in waiters] == [True, True, False, True]
+    async with lim:  # not held by anyone
+        pass
+
+
+@pytest.mark.asyncio()
+async def test_limiter_token_bucket(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test rate limiting, letting a burst through right away."""
+    clock = [time.monotonic()]
+    fake_time = types.SimpleNamespace(
+        monotonic=lambda: clock[0],
+        perf_counter=time.perf_counter,
+    )
+    monkeypatch.setattr(asyncio_loop_local._limiter, 'time', fake_time)  # noqa: SLF001
+    lim = asyncio_loop_local.limiter('api', kind='token_bucket', limit=100)
+    for _ in range(100):
+        async with lim:
+            pass
+    assert lim.info().waited == 0
+    waiter = asyncio.ensure_future(lim.acquire())
+    await asyncio.sleep(0.02)
+    assert not waiter.done()  # no time has passed for the limiter
+    clock[0] += 0.03
+    await waiter  # along with the refill, the next two go right away
+    await asyncio.gather(*(lim.acquire() for _ in range(2)))
+    assert lim.info()[:2] == (103, 1)
+
+
+@pytest.mark.asyncio()
+async def test_limiter_leaky_bucket() -> None:
+    """Test rate limiting, spacing the acquisitions evenly."""
+    lim = asyncio_loop_local.limiter('api', kind='leaky_bucket', limit=100)
+    times = []
+
+    async def call() -> None:
+        async with lim:
+            times.append(time.monotonic())
+
+    await asyncio.gather(*(call() for _ in range(4)))
+    # the first one goes right away, the rest wait for their turns
+    assert all(t - times[0] >= 0.009 * i for i, t in enumerate(times))
+    assert lim.info()[:2] == (4, 3)
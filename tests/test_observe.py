@@ -0,0 +1,247 @@
+# SPDX-FileCopyrightText: 2023 Alexander Sosedkin <monk@unboiled.info>
+# SPDX-License-Identifier: GPL-3.0
+
+"""Test asyncio_loop_local.Observer."""
+
+import asyncio
+import collections.abc
+import typing
+
+import pytest
+from common import CountingACM
+
+import asyncio_loop_local
+
+
+class RecordingObserver(asyncio_loop_local.Observer):
+    """An observer that records what it observes, without durations."""
+
+    events: list[tuple[typing.Any, ...]]
+
+    def __init__(self: typing.Self) -> None:
+        """Initialize RecordingObserver."""
+        self.events = []
+
+    def hit(self: typing.Self, kind: str, obj: object) -> None:  # noqa: D102
+        self.events.append(('hit', kind, obj))
+
+    def miss(self: typing.Self, kind: str, obj: object) -> None:  # noqa: D102
+        self.events.append(('miss', kind, obj))
+
+    def lock_wait(  # noqa: D102
+        self: typing.Self,
+        kind: str,
+        obj: object,
+        duration: float,
+    ) -> None:
+        assert duration >= 0
+        self.events.append(('lock_wait', kind, obj))
+
+    def aenter(  # noqa: D102
+        self: typing.Self,
+        acm: object,
+        duration: float,
+        exc: BaseException | None,
+    ) -> None:
+        assert duration >= 0
+        self.events.append(('aenter', acm, type(exc)))
+
+    def aexit(  # noqa: D102
+        self: typing.Self,
+        acm: object,
+        duration: float,
+        exc: BaseException | None,
+    ) -> None:
+        assert duration >= 0
+        self.events.append(('aexit', acm, type(exc)))
+
+    def live(  # noqa: D102
+        self: typing.Self,
+        loop: asyncio.AbstractEventLoop,
+        count: int,
+    ) -> None:
+        assert isinstance(loop, asyncio.AbstractEventLoop)
+        self.events.append(('live', count))
+
+
+class FailingACM(CountingACM):
+    """An ACM failing to enter or to exit."""
+
+    def __init__(self: typing.Self, *, enter: bool) -> None:
+        """Initialize FailingACM, failing to enter or to exit."""
+        super().__init__()
+        self.fail_enter = enter
+
+    async def __aenter__(self: typing.Self) -> typing.Self:
+        """Fail to enter if asked to."""
+        if self.fail_enter:
+            raise ZeroDivisionError
+        return await super().__aenter__()
+
+    async def __aexit__(self: typing.Self, *a: object) -> None:
+        """Fail to exit."""
+        raise ZeroDivisionError
+
+
+@pytest.fixture()
+def observer() -> collections.abc.Iterator[RecordingObserver]:
+    """Install a RecordingObserver for the duration of the test."""
+    obs = RecordingObserver()
+    asyncio_loop_local.set_observer(obs)
+    try:
+        yield obs
+    finally:
+        asyncio_loop_local.set_observer(None)
+
+
+def test_observe_enter_exit(observer: RecordingObserver) -> None:
+    """Test observing entering, exiting and the number of live resources."""
+    acm, failing_enter = CountingACM(), FailingACM(enter=True)
+    failing_exit = FailingACM(enter=False)
+
+    async def main() -> None:
+        await asyncio_loop_local.enter(acm)
+        with pytest.raises(ZeroDivisionError):
+            await asyncio_loop_local.enter(failing_enter)
+        await asyncio_loop_local.enter(failing_exit)
+        await asyncio_loop_local.release(acm)
+
+    loop = asyncio.new_event_loop()
+    loop.run_until_complete(main())
+    with pytest.raises(ExceptionGroup):
+        loop.close()
+    assert observer.events == [
+        ('aenter', acm, type(None)),
+        ('live', 1),
+        ('aenter', failing_enter, ZeroDivisionError),
+        ('aenter', failing_exit, type(None)),
+        ('live', 2),
+        ('live', 1),
+        ('aexit', acm, type(None)),
+        ('aexit', failing_exit, ZeroDivisionError),
+        ('live', 0),
+    ]
+
+
+@pytest.mark.asyncio()
+async def test_observe_enter_once(observer: RecordingObserver) -> None:
+    """Test observing enter_once hits, misses and lock waits."""
+    acm = CountingACM()
+    await asyncio.gather(
+        asyncio_loop_local.enter_once(acm),
+        asyncio_loop_local.enter_once(acm),
+    )
+    await asyncio_loop_local.enter_once(acm)
+    assert [e for e in observer.events if e[0] not in {'aenter', 'live'}] == [
+        ('lock_wait', 'enter_once', acm),
+        ('miss', 'enter_once', acm),
+        ('lock_wait', 'enter_once', acm),
+        ('hit', 'enter_once', acm),
+        ('hit', 'enter_once', acm),
+    ]
+
+
+@pytest.mark.asyncio()
+async def test_observe_sticky_acm(observer: RecordingObserver) -> None:
+    """Test observing sticky_acm hits, misses and lock waits."""
+    acm = CountingACM()
+
+    async def use() -> None:
+        async with asyncio_loop_local.sticky_acm(acm):
+            pass
+
+    await asyncio.gather(use(), use())
+    await use()
+    assert [e for e in observer.events if e[0] not in {'aenter', 'live'}] == [
+        ('lock_wait', 'sticky_acm', acm),
+        ('miss', 'sticky_acm', acm),
+        ('lock_wait', 'sticky_acm', acm),
+        ('hit', 'sticky_acm', acm),
+        ('hit', 'sticky_acm', acm),
+    ]
+
+
+@pytest.mark.asyncio()
+async def test_observe_singleton(observer: RecordingObserver) -> None:
+    """Test observing singleton hits and misses."""
+
+    def f(x: int) -> list[int]:
+        return [x]
+
+    sf = asyncio_loop_local.singleton(f)
+    sf(1)
+    sf(1)
+    sf(2)
+    assert observer.events == [
+        ('miss', 'singleton', f),
+        ('hit', 'singleton', f),
+        ('miss', 'singleton', f),
+    ]
+
+
+@pytest.mark.asyncio()
+async def test_observer_defaults() -> None:
+    """Test that the base Observer accepts all the events."""
+    obs = asyncio_loop_local.Observer()
+    obs.hit('singleton', None)
+    obs.miss('singleton', None)
+    obs.lock_wait('enter_once', None, 0)
+    obs.aenter(None, 0, None)
+    obs.aexit(None, 0, None)
+    obs.live(asyncio.get_running_loop(), 0)
+
+
+@pytest.mark.asyncio()
+async def test_observe_single_flight(observer: RecordingObserver) -> None:
+    """Test observing single_flight hits and misses."""
+
+    async def f() -> None:
+        await asyncio.sleep(0)
+
+    sf = asyncio_loop_local.single_flight(f)
+    await asyncio.gather(sf(), sf())
+    assert observer.events == [
+        ('miss', 'single_flight', f),
+        ('hit', 'single_flight', f),
+    ]
+
+
+@pytest.mark.asyncio()
+async def test_observe_cached(observer: RecordingObserver) -> None:
+    """Test observing cached hits and misses."""
+
+    async def f() -> None:
+        await asyncio.sleep(0)
+
+    cf = asyncio_loop_local.cached(f)
+    await cf()
+    await cf()
+    assert observer.events == [('miss', 'cached', f), ('hit', 'cached', f)]
+
+
+@pytest.mark.asyncio()
+async def test_observe_executor(observer: RecordingObserver) -> None:
+    """Test observing executor hits and misses."""
+    ex = await asyncio_loop_local.executor('io', max_workers=1)
+    await asyncio_loop_local.executor('io')
+    await asyncio_loop_local.release(ex)
+    assert observer.events == [
+        ('miss', 'executor', 'io'),
+        ('live', 1),
+        ('hit', 'executor', 'io'),
+        ('live', 0),
+        ('aexit', ex, type(None)),
+    ]
+
+
+@pytest.mark.asyncio()
+async def test_observe_limiter(observer: RecordingObserver) -> None:
+    """Test observing limiter waits, and only them."""
+    lim = asyncio_loop_local.limiter('db', limit=1)
+
+    async def work() -> None:
+        async with lim:
+            await asyncio.sleep(0)
+
+    await asyncio.gather(work(), work())
+    assert observer.events == [('lock_wait', 'limiter', 'db')]
@@ -0,0 +1,94 @@
+# SPDX-FileCopyrightText: 2023 Alexander Sosedkin <monk@unboiled.info>
+# SPDX-License-Identifier: GPL-3.0
+
+"""Test asyncio_loop_local.override."""
+
+import asyncio
+
+import pytest
+
+import asyncio_loop_local
+
+
+@pytest.fixture(autouse=True)
+def _fast_paths_elsewhere(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Let the singletons of the other tests keep their fast path."""
+    monkeypatch.setattr(asyncio_loop_local._override, 'used', False)  # noqa: SLF001
+
+
+class Client:
+    """Something to create once per loop."""
+
+
+@asyncio_loop_local.singleton
+def client(tenant: str = '') -> Client:  # noqa: ARG001
+    """Create a client."""
+    return Client()
+
+
+@asyncio_loop_local.singleton
+async def async_client() -> Client:
+    """Create a client, asynchronously."""
+    await asyncio.sleep(0)
+    return Client()
+
+
+@asyncio_loop_local.singleton(scope='process')
+def process_client() -> Client:
+    """Create a client shared by all the loops."""
+    return Client()
+
+
+@pytest.mark.asyncio()
+async def test_override() -> None:
+    """Test overriding for a task tree, not for the others."""
+    shared, mock = client(), Client()
+
+    async def child() -> Client:
+        await asyncio.sleep(0)
+        return client()
+
+    async def outsider(entered: asyncio.Event) -> Client:
+        await entered.wait()
+        return client('t')
+
+    entered = asyncio.Event()
+    other = asyncio.ensure_future(outsider(entered))
+    with asyncio_loop_local.override(client, mock):
+        entered.set()
+        assert client() is client('t') is mock
+        assert await asyncio.ensure_future(child()) is mock
+        assert await other is not mock  # started before the override
+        assert await async_client() is not mock
+        late = asyncio.ensure_future(child())
+    assert client() is shared
+    assert await late is mock  # spawned within, outlives the block
+
+
+@pytest.mark.asyncio()
+async def test_override_nested() -> None:
+    """Test overriding an override, several singletons at once."""
+    shared = await async_client()
+    shared_process = process_client()
+    mock1, mock2, mock3 = Client(), Client(), Client()
+    with asyncio_loop_local.override(async_client, mock1):
+        assert await async_client() is mock1
+        with (
+            asyncio_loop_local.override(async_client, mock2),
+            asyncio_loop_local.override(process_client, mock3),
+        ):
+            assert await async_client() is mock2
+            assert process_client() is mock3
+            assert client() is not mock1  # others aren't affected
+        assert await async_client() is mock1
+        assert process_client() is shared_process
+    assert await async_client() is shared
+
+
+def test_override_not_singleton() -> None:
+    """Test refusing to override what doesn't check for overrides."""
+    with (
+        pytest.raises(TypeError, match='only singletons'),
+        asyncio_loop_local.override(Client, Client()),
+    ):
+        pass  # pragma: no cover
@@ -0,0 +1,243 @@
+# SPDX-FileCopyrightText: 2023 Alexander Sosedkin <monk@unboiled.info>
+# SPDX-License-Identifier: GPL-3.0
+
+"""Test asyncio_loop_local.pooled_acm."""
+
+import asyncio
+import typing
+
+import pytest
+from common import CountingACM
+
+import asyncio_loop_local
+
+
+class NamedACM(CountingACM):
+    """A CountingACM with a name, optionally failing to enter."""
+
+    def __init__(
+        self: typing.Self,
+        name: str = '',
+        *,
+        fail: bool = False,
+    ) -> None:
+        """Initialize NamedACM."""
+        super().__init__()
+        self.name, self.fail = name, fail
+
+    async def __aenter__(self: typing.Self) -> typing.Self:
+        """Enter or fail to."""
+        await asyncio.sleep(0)
+        if self.fail:
+            raise ZeroDivisionError
+        return await super().__aenter__()
+
+
+def test_pooled_acm() -> None:
+    """Test that the pool enters up to maxsize, and exits them at the end."""
+    created: list[NamedACM] = []
+
+    @asyncio_loop_local.pooled_acm(maxsize=2)
+    def worker(name: str) -> NamedACM:
+        created.append(NamedACM(name))
+        return created[-1]
+
+    async def use(name: str) -> None:
+        async with worker(name) as w:
+            assert w.name == name
+            await asyncio.sleep(0.01)
+
+    async def main() -> None:
+        await asyncio.gather(*[use('a') for _ in range(5)], use('b'))
+        assert [w.name for w in created] == ['a', 'a', 'b']
+        await use('a')
+        assert len(created) == len(['a', 'a', 'b'])
+        assert all((w.enters, w.exits) == (1, 0) for w in created)
+
+    loop = asyncio.new_event_loop()
+    loop.run_until_complete(main())
+    loop.close()
+    assert all((w.enters, w.exits) == (1, 1) for w in created)
+
+
+@pytest.mark.parametrize('fair', [True, False])
+@pytest.mark.asyncio()
+async def test_pooled_acm_fairness(*, fair: bool) -> None:
+    """Test handing over to the waiters first, unless unfair."""
+    log = []
+    pool = asyncio_loop_local.pooled_acm(NamedACM, maxsize=1, fair=fair)
+
+    async def use(name: str) -> None:
+        async with pool():
+            log.append(name)
+            await asyncio.sleep(0.01)
+
+    async def greedy() -> None:
+        async with pool():
+            log.append('greedy')
+            waiter = asyncio.ensure_future(use('waiter'))
+            await asyncio.sleep(0.01)
+        async with pool():  # right away, without yielding
+            log.append('greedy again')
+        await waiter
+
+    await greedy()
+    if fair:
+        assert log == ['greedy', 'waiter', 'greedy again']
+    else:
+        assert log == ['greedy', 'greedy again', 'waiter']
+
+
+@pytest.mark.asyncio()
+async def test_pooled_acm_idle_timeout() -> None:
+    """Test exiting the idle ones early."""
+    created: list[NamedACM] = []
+
+    @asyncio_loop_local.pooled_acm(maxsize=2, idle_timeout=0.01)
+    def worker() -> NamedACM:
+        created.append(NamedACM())
+        return created[-1]
+
+    async def use() -> None:
+        async with worker():
+            await asyncio.sleep(0)
+
+    await asyncio.gather(use(), use())
+    await use()  # cancels the idle timer of one of them
+    await asyncio.sleep(0.05)
+    assert [(w.enters, w.exits) for w in created] == [(1, 1), (1, 1)]
+    await use()
+    assert [(w.enters, w.exits) for w in created][2:] == [(1, 0)]
+
+
+class SlowToExit(CountingACM):
+    """A CountingACM that takes its time exiting."""
+
+    async def __aexit__(self: typing.Self, *exc_info: object) -> None:
+        """Exit slowly."""
+        await asyncio.sleep(0.1)
+        await super().__aexit__(None, None, None)
+
+
+class FailingToExit(CountingACM):
+    """A CountingACM that fails to exit."""
+
+    async def __aexit__(self: typing.Self, *exc_info: object) -> None:
+        """Fail to exit."""
+        await super().__aexit__(None, None, None)
+        raise ZeroDivisionError
+
+
+def test_pooled_acm_idle_timeout_teardown() -> None:
+    """Test not evicting the idle ones once the teardown has started."""
+    created: list[SlowToExit] = []
+
+    @asyncio_loop_local.pooled_acm(idle_timeout=0.02)
+    def worker() -> SlowToExit:
+        created.append(SlowToExit())
+        return created[-1]
+
+    async def main() -> None:
+        await asyncio_loop_local._enter.enter(SlowToExit())  # noqa: SLF001
+        async with worker():
+            pass
+        await asyncio.sleep(0.05)  # the first one is being evicted now
+        async with worker():
+            pass
+
+    loop = asyncio.new_event_loop()
+    loop.run_until_complete(main())
+    loop.close()  # the timer would've fired while the others exit
+    assert [(w.enters, w.exits) for w in created] == [(1, 1), (1, 1)]
+
+
+def test_pooled_acm_idle_timeout_failure() -> None:
+    """Test reporting the idle ones failing to exit at the teardown."""
+    pool = asyncio_loop_local.pooled_acm(FailingToExit, idle_timeout=0.01)
+
+    async def main() -> None:
+        async with pool():
+            pass
+        await asyncio.sleep(0.05)
+        async with pool():
+            pass
+        async with pool():
+            pass
+
+    loop = asyncio.new_event_loop()
+    loop.run_until_complete(main())
+    with pytest.raises(BaseExceptionGroup) as ei:
+        loop.close()
+    assert ei.group_contains(ZeroDivisionError, depth=3)  # evicted early
+    assert ei.group_contains(ZeroDivisionError, depth=1)  # exited at the end
+
+
+@pytest.mark.parametrize('fair', [True, False])
+@pytest.mark.asyncio()
+async def test_pooled_acm_cancellation(*, fair: bool) -> None:
+    """Test cancelling the waiters, before and after they're woken up."""
+    pool = asyncio_loop_local.pooled_acm(NamedACM, maxsize=1, fair=fair)
+    entered = []
+
+    async def use() -> None:
+        async with pool() as w:
+            entered.append(w)
+
+    async with pool():
+        waiter1 = asyncio.ensure_future(use())
+        waiter2 = asyncio.ensure_future(use())
+        await asyncio.sleep(0)
+        waiter1.cancel()
+        await asyncio.sleep(0)
+    waiter2.cancel()  # after it's been handed the item or woken up
+    waiter3 = asyncio.ensure_future(use())
+    for w in (waiter1, waiter2):
+        with pytest.raises(asyncio.CancelledError):
+            await w
+    await waiter3
+    assert len(entered) == 1
+
+
+@pytest.mark.parametrize('fair', [True, False])
+@pytest.mark.asyncio()
+async def test_pooled_acm_cancelled_skipped(*, fair: bool) -> None:
+    """Test a waiter cancelled and skipped before it notices."""
+    pool = asyncio_loop_local.pooled_acm(NamedACM, maxsize=1, fair=fair)
+
+    async def use() -> None:
+        async with pool():
+            pass
+
+    async with pool():
+        waiter = asyncio.ensure_future(use())
+        await asyncio.sleep(0)
+        waiter.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiter
+    await use()
+
+
+@pytest.mark.asyncio()
+async def test_pooled_acm_failing_enter() -> None:
+    """Test that failing to enter frees the slot for a waiter."""
+    attempts: list[None] = []
+
+    @asyncio_loop_local.pooled_acm(maxsize=1)
+    def flaky() -> NamedACM:
+        attempts.append(None)
+        return NamedACM(fail=len(attempts) == 1)
+
+    async def use() -> None:
+        async with flaky():
+            pass
+
+    results = await asyncio.gather(use(), use(), return_exceptions=True)
+    assert isinstance(results[0], ZeroDivisionError)
+    assert results[1] is None
+    assert len(attempts) == len(results)
+
+
+def test_pooled_acm_maxsize() -> None:
+    """Test rejecting meaningless maxsize."""
+    with pytest.raises(ValueError, match='maxsize must be positive'):
+        asyncio_loop_local.pooled_acm(maxsize=0)
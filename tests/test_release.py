@@ -0,0 +1,183 @@
+# SPDX-FileCopyrightText: 2023 Alexander Sosedkin <monk@unboiled.info>
+# SPDX-License-Identifier: GPL-3.0
+
+"""Test asyncio_loop_local.release."""
+
+import asyncio
+import typing
+
+import pytest
+from common import CountingACM
+
+import asyncio_loop_local
+
+
+class ValueACM(CountingACM):
+    """An ACM returning something other than self on entering."""
+
+    async def __aenter__(self: typing.Self) -> list[int]:  # type: ignore[override]
+        """Enter, return a fresh list."""
+        await super().__aenter__()
+        return [self.enters]
+
+
+@pytest.mark.asyncio()
+async def test_release_enter() -> None:
+    """Test releasing an acm entered with enter, by acm and by value."""
+    acm1, acm2 = CountingACM(), ValueACM()
+    await asyncio_loop_local.enter(acm1)
+    v = await asyncio_loop_local.enter(acm2)
+    await asyncio_loop_local.release(acm1)
+    assert (acm1.enters, acm1.exits) == (1, 1)
+    await asyncio_loop_local.release(v)
+    assert (acm2.enters, acm2.exits) == (1, 1)
+    with pytest.raises(LookupError, match='has not been entered'):
+        await asyncio_loop_local.release(acm1)
+    with pytest.raises(LookupError, match='has not been entered'):
+        await asyncio_loop_local.release(None)
+
+
+@pytest.mark.asyncio()
+async def test_release_enter_once() -> None:
+    """Test releasing an acm entered with enter_once."""
+    acm = ValueACM()
+    v1 = await asyncio_loop_local.enter_once(acm)
+    assert await asyncio_loop_local.enter_once(acm) is v1
+    await asyncio_loop_local.release(v1)
+    assert (acm.enters, acm.exits) == (1, 1)
+    v2 = await asyncio_loop_local.enter_once(acm)
+    assert v2 is not v1
+    assert (acm.enters, acm.exits) == (2, 1)
+
+
+@pytest.mark.asyncio()
+async def test_release_sticky_acm() -> None:
+    """Test releasing an acm entered with sticky_acm."""
+    acm = CountingACM()
+    sticky = asyncio_loop_local.sticky_acm(acm)
+    async with sticky:
+        pass
+    asyncio_loop_local.sticky_acm(CountingACM())  # unrelated, never entered
+    await asyncio_loop_local.release(acm)
+    assert (acm.enters, acm.exits) == (1, 1)
+    async with sticky:
+        assert (acm.enters, acm.exits) == (2, 1)
+    async with asyncio_loop_local.sticky_acm(acm):
+        assert (acm.enters, acm.exits) == (2, 1)
+
+
+_CountingACM = asyncio_loop_local.singleton(CountingACM)
+
+
+@asyncio_loop_local.singleton
+async def _async_counting_acm(name: str) -> CountingACM:
+    await asyncio.sleep(0)
+    if not name:
+        raise ValueError
+    return CountingACM()
+
+
+@pytest.mark.asyncio()
+async def test_release_singleton() -> None:
+    """Test that releasing drops the singleton, so a new one gets entered."""
+    acm = await asyncio_loop_local.enter_once(_CountingACM())
+    aacm = await asyncio_loop_local.enter_once(await _async_counting_acm('a'))
+    pending = asyncio.ensure_future(_async_counting_acm('b'))
+    failing = asyncio.ensure_future(_async_counting_acm(''))
+    await asyncio.sleep(0)
+    await asyncio_loop_local.release(acm)
+    assert (acm.enters, acm.exits) == (1, 1)
+    acm2 = await asyncio_loop_local.enter_once(_CountingACM())
+    assert acm2 is not acm
+    await asyncio_loop_local.release(aacm)
+    assert await _async_counting_acm('a') is not aacm
+    await pending
+    with pytest.raises(ValueError):  # noqa: PT011
+        await failing
+
+
+@pytest.mark.asyncio()
+async def test_release_with_dependencies() -> None:
+    """Test releasing something that others depend on and vice versa."""
+    pool, client = CountingACM(), CountingACM()
+    await asyncio_loop_local.enter(pool)
+    await asyncio_loop_local.enter(client, depends_on=[pool])
+    await asyncio_loop_local.release(client)
+    assert (client.enters, client.exits) == (1, 1)
+    assert (pool.enters, pool.exits) == (1, 0)
+
+
+@pytest.mark.asyncio()
+async def test_release_dependents_first() -> None:
+    """Test releasing what depends on the released thing before it."""
+    log: list[str] = []
+
+    class Logging(CountingACM):
+        def __init__(self: typing.Self, name: str) -> None:
+            super().__init__()
+            self.name = name
+
+        async def __aexit__(self: typing.Self, *exc_info: object) -> None:
+            log.append(self.name)
+            await super().__aexit__(None, None, None)
+
+    pool, client, session = Logging('pool'), Logging('client'), Logging('s')
+    await asyncio_loop_local.enter(pool)
+    await asyncio_loop_local.enter(client, depends_on=[pool])
+    await asyncio_loop_local.enter(session, depends_on=[client, pool])
+    await asyncio_loop_local.release(pool)
+    assert log == ['s', 'client', 'pool']
+    assert not asyncio_loop_local._atexit._hooks_of(client)  # noqa: SLF001
+
+
+@pytest.mark.asyncio()
+async def test_release_failing() -> None:
+    """Test exiting all the released ones even if some fail."""
+
+    class Failing(CountingACM):
+        async def __aexit__(self: typing.Self, *exc_info: object) -> None:
+            await super().__aexit__(None, None, None)
+            raise ZeroDivisionError
+
+    pool, client, other = Failing(), Failing(), CountingACM()
+    await asyncio_loop_local.enter(pool)
+    await asyncio_loop_local.enter(client, depends_on=[pool])
+    await asyncio_loop_local.enter(other, depends_on=[pool])
+    with pytest.raises(ExceptionGroup) as ei:
+        await asyncio_loop_local.release(pool)
+    assert [type(e) for e in ei.value.exceptions] == [ZeroDivisionError] * 2
+    assert [a.exits for a in (pool, client, other)] == [1, 1, 1]
+
+
+def test_release_then_loop_close() -> None:
+    """Test that the released resources don't get exited at loop close."""
+    acm1, acm2 = CountingACM(), CountingACM()
+
+    async def main() -> None:
+        await asyncio_loop_local.enter(acm1)
+        await asyncio_loop_local.enter(acm2, depends_on=[acm1])
+        await asyncio_loop_local.release(acm2)
+        await asyncio_loop_local.release(acm1)
+
+    loop = asyncio.new_event_loop()
+    loop.run_until_complete(main())
+    loop.close()
+    assert (acm1.enters, acm1.exits) == (1, 1)
+    assert (acm2.enters, acm2.exits) == (1, 1)
+
+
+@pytest.mark.asyncio()
+async def test_release_on_singleton_eviction() -> None:
+    """Test that evicted singletons that were entered get released."""
+
+    @asyncio_loop_local.singleton(maxsize=1)
+    def tenant(name: str) -> CountingACM:
+        return CountingACM()
+
+    a = await asyncio_loop_local.enter_once(tenant('a'))
+    b = await asyncio_loop_local.enter_once(tenant('b'))  # evicts a
+    for _ in range(5):
+        await asyncio.sleep(0)
+    assert (a.enters, a.exits) == (1, 1)
+    assert (b.enters, b.exits) == (1, 0)
+    assert not asyncio_loop_local._atexit._hooks_of(a)  # noqa: SLF001
@@ -0,0 +1,87 @@
+# SPDX-FileCopyrightText: 2023 Alexander Sosedkin <monk@unboiled.info>
+# SPDX-License-Identifier: GPL-3.0
+
+"""Test asyncio_loop_local.Runner and asyncio_loop_local.run."""
+
+import asyncio
+import typing
+
+import pytest
+from common import CountingACM
+
+import asyncio_loop_local
+
+
+class NeedyACM(CountingACM):
+    """An ACM which needs a background task and an executor to exit."""
+
+    def __init__(self: typing.Self) -> None:
+        """Initialize NeedyACM."""
+        super().__init__()
+        self.flushed = asyncio.Event()
+
+    async def __aenter__(self: typing.Self) -> typing.Self:
+        """Start a background task."""
+        self.flusher = asyncio.create_task(self.flushed.wait())
+        return await super().__aenter__()
+
+    async def __aexit__(self: typing.Self, *a: object) -> None:
+        """Need an executor and a background task to exit."""
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self.flushed.set)
+        await self.flusher
+        await super().__aexit__(None, None, None)
+
+
+def test_run() -> None:
+    """Test asyncio_loop_local.run exiting resources while it still can."""
+
+    async def main() -> NeedyACM:
+        return await asyncio_loop_local.enter_once(NeedyACM())
+
+    acm = asyncio_loop_local.run(main())
+    assert (acm.enters, acm.exits) == (1, 1)
+    assert acm.flushed.is_set()
+
+
+def test_asyncio_run() -> None:
+    """Demonstrate why asyncio.run isn't enough for some resources."""
+
+    async def main() -> NeedyACM:
+        return await asyncio_loop_local.enter_once(NeedyACM())
+
+    with pytest.raises(ExceptionGroup) as ex:
+        asyncio.run(main())
+    assert isinstance(ex.value.exceptions[0], RuntimeError)
+
+
+def test_runner() -> None:
+    """Test asyncio_loop_local.Runner with several runs and failing hooks."""
+
+    class FailingACM(CountingACM):
+        async def __aexit__(self: typing.Self, *a: object) -> None:
+            await super().__aexit__(None, None, None)
+            raise ValueError
+
+    acm, failing = NeedyACM(), FailingACM()
+
+    async def main(x: CountingACM) -> None:
+        await asyncio_loop_local.enter_once(x)
+
+    runner = asyncio_loop_local.Runner()
+    with runner:
+        runner.run(main(acm))
+        runner.run(main(failing))
+        assert (acm.enters, acm.exits) == (1, 0)
+        with pytest.raises(ExceptionGroup) as ex:
+            runner.close()
+    with pytest.raises(RuntimeError, match='Runner is closed'):
+        runner.get_loop()
+    assert isinstance(ex.value.exceptions[0], ValueError)
+    assert (acm.enters, acm.exits) == (1, 1)
+    assert (failing.enters, failing.exits) == (1, 1)
+
+
+def test_runner_unused() -> None:
+    """Test closing asyncio_loop_local.Runner that has never been used."""
+    asyncio_loop_local.Runner().close()
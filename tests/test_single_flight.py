@@ -0,0 +1,110 @@
+# SPDX-FileCopyrightText: 2023 Alexander Sosedkin <monk@unboiled.info>
+# SPDX-License-Identifier: GPL-3.0
+
+"""Test asyncio_loop_local.single_flight."""
+
+import asyncio
+import operator
+
+import pytest
+
+import asyncio_loop_local
+
+
+@pytest.mark.asyncio()
+async def test_single_flight() -> None:
+    """Test coalescing concurrent calls, and only them."""
+    calls = []
+
+    @asyncio_loop_local.single_flight
+    async def fetch(name: str, scope: str = 'all') -> list[str]:
+        calls.append(name)
+        await asyncio.sleep(0.01)
+        return [name, scope]
+
+    r1, r2, r3, r4 = await asyncio.gather(
+        fetch('a'),
+        fetch('a', 'all'),
+        fetch(name='a'),
+        fetch('b'),
+    )
+    assert r1 is r2 is r3
+    assert (r1, r4) == (['a', 'all'], ['b', 'all'])
+    assert calls == ['a', 'b']
+    await asyncio.sleep(0)
+    assert await fetch('a') is not r1  # done, nothing is kept
+    assert calls == ['a', 'b', 'a']
+
+
+@pytest.mark.asyncio()
+async def test_single_flight_decorated_twice() -> None:
+    """Test decorating the same function twice, with different settings."""
+
+    async def fetch(name: str) -> list[str]:
+        await asyncio.sleep(0)
+        return [name]
+
+    kept = asyncio_loop_local.single_flight(fetch, ttl=60)
+    unkept = asyncio_loop_local.single_flight(fetch)
+    r = await kept('a')
+    assert await unkept('a') is not r
+    assert await unkept('a') is not await unkept('a')
+    assert await kept('a') is r
+
+
+@pytest.mark.asyncio()
+async def test_single_flight_ttl() -> None:
+    """Test keeping the result for a while, but not the failures."""
+    calls = []
+
+    @asyncio_loop_local.single_flight(ttl=0.05)
+    async def fetch(name: str) -> list[str]:
+        calls.append(name)
+        await asyncio.sleep(0)
+        if not name:
+            raise ValueError
+        return [name]
+
+    r = await fetch('a')
+    assert await fetch('a') is r
+    for _ in range(2):
+        with pytest.raises(ValueError):  # noqa: PT011
+            await fetch('')
+    await asyncio.sleep(0.1)
+    assert await fetch('a') is not r
+    assert calls == ['a', '', '', 'a']
+
+
+@pytest.mark.asyncio()
+async def test_single_flight_cancellation() -> None:
+    """Test that cancelling one caller doesn't cancel the others."""
+
+    @asyncio_loop_local.single_flight(key=operator.itemgetter('id'))
+    async def fetch(req: dict[str, int]) -> int:
+        await asyncio.sleep(0.01)
+        return req['id']
+
+    impatient = asyncio.ensure_future(fetch({'id': 1, 'retry': 1}))
+    patient = asyncio.ensure_future(fetch({'id': 1, 'retry': 2}))
+    await asyncio.sleep(0)
+    impatient.cancel()
+    assert await patient == 1
+    with pytest.raises(asyncio.CancelledError):
+        await impatient
+
+
+def test_single_flight_loops() -> None:
+    """Test that the flights don't cross loops."""
+
+    @asyncio_loop_local.single_flight(ttl=60)
+    async def fetch() -> object:
+        await asyncio.sleep(0)
+        return object()
+
+    assert asyncio.run(fetch()) is not asyncio.run(fetch())
+
+
+def test_single_flight_sync() -> None:
+    """Test rejecting sync functions."""
+    with pytest.raises(TypeError, match='only works on async functions'):
+        asyncio_loop_local.single_flight(lambda: None)  # type: ignore[arg-type, return-value]
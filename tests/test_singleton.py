@@ -4,10 +4,14 @@
 """Test asyncio_loop_local.singleton."""
 
 import asyncio
+import concurrent.futures
+import operator
+import time
 import types
 import typing
 
 import pytest
+from common import CountingACM
 
 import asyncio_loop_local
 
@@ -151,43 +155,435 @@ async def test_smoke_singleton_function_decorator() -> None:
 
 
 @asyncio_loop_local.singleton()
-async def coro(x: int) -> None:
+async def coro(x: int) -> list[int]:
     """A coroutine to test singleton on."""  # noqa: D401
     asyncio_loop_local.storage()['list'].append(x)
     await asyncio.sleep(0.001)
+    return [x]
 
 
 @pytest.mark.asyncio()
 async def test_smoke_singleton_coroutine_decorator() -> None:
     """Test singleton usage as an async coroutine decorator."""
     asyncio_loop_local.storage()['list'] = []
-    assert coro(0) is coro(0)  # singleton-ing makes ids match
+    r = await coro(0)
+    assert r == [0]
+    assert await coro(0) is r  # results are cached, not coroutines
     coros = []
     for i in range(7):
         coros.extend([coro(i), coro(i)])  # 0, 0, 1, 1, 2, 2, ...
-    await asyncio.gather(*coros[:6])  # run 0, 1, 2; id duplicates don't run
-    assert sorted(asyncio_loop_local.storage()['list']) == [0, 1, 2]
-    await asyncio.gather(*coros[6:])
+    rs = await asyncio.gather(*coros)  # duplicates share one initialization
+    assert sorted(asyncio_loop_local.storage()['list']) == list(range(7))
+    assert rs[0] is rs[1] is r
+    assert rs[4] is rs[5]
 
 
 ###
 
 
 @asyncio_loop_local.singleton
-async def coro2(x: int) -> None:
+async def coro2(x: int) -> list[int]:
     """A coroutine to test singleton on (no brackets)."""  # noqa: D401
     asyncio_loop_local.storage()['list'].append(x)
     await asyncio.sleep(0.001)
+    if x < 0:
+        raise ValueError(x)
+    return [x]
 
 
 @pytest.mark.asyncio()
 async def test_smoke_singleton_coroutine_nb_decorator() -> None:
     """Test singleton usage as an async coroutine decorator (no brackets)."""
     asyncio_loop_local.storage()['list'] = []
-    assert coro2(0) is coro2(0)  # singleton-ing makes ids match
-    coros = []
-    for i in range(7):
-        coros.extend([coro2(i), coro2(i)])  # 0, 0, 1, 1, 2, 2, ...
-    await asyncio.gather(*coros[:6])  # run 0, 1, 2; id duplicates don't run
+    rs = await asyncio.gather(*(coro2(i % 3) for i in range(9)))
     assert sorted(asyncio_loop_local.storage()['list']) == [0, 1, 2]
-    await asyncio.gather(*coros[6:])
+    assert rs[0] is rs[3] is rs[6]
+
+
+@pytest.mark.asyncio()
+async def test_singleton_coroutine_failures_not_cached() -> None:
+    """Test that failed async initializations are retried."""
+    asyncio_loop_local.storage()['list'] = []
+    rs = await asyncio.gather(
+        *(coro2(-1) for _ in range(3)),
+        return_exceptions=True,
+    )
+    assert all(isinstance(r, ValueError) for r in rs)
+    assert asyncio_loop_local.storage()['list'] == [-1]
+    await asyncio.sleep(0)
+    with pytest.raises(ValueError, match='-1'):
+        await coro2(-1)
+    assert asyncio_loop_local.storage()['list'] == [-1, -1]
+
+
+@pytest.mark.asyncio()
+async def test_singleton_coroutine_cancellation() -> None:
+    """Test that a cancelled caller doesn't cancel it for the others."""
+    asyncio_loop_local.storage()['list'] = []
+    t1 = asyncio.create_task(coro2(5))
+    t2 = asyncio.create_task(coro2(5))
+    await asyncio.sleep(0)
+    t1.cancel()
+    assert await t2 == [5]
+    assert t1.cancelled()
+    assert asyncio_loop_local.storage()['list'] == [5]
+
+
+def test_two_loops_singleton_coroutine() -> None:
+    """Test async singleton in separate loops."""
+
+    async def do() -> list[int]:
+        asyncio_loop_local.storage()['list'] = []
+        return await coro(1)
+
+    l1, l2 = asyncio.new_event_loop(), asyncio.new_event_loop()
+    r1, r2 = l1.run_until_complete(do()), l2.run_until_complete(do())
+    assert r1 == r2
+    assert r1 is not r2
+    l1.close()
+    l2.close()
+
+
+###
+
+
+class Closeable:
+    """Something that has an aclose() method and tracks calls to it."""
+
+    closed: int
+
+    def __init__(self: typing.Self, name: str) -> None:  # noqa: D107
+        self.name = name
+        self.closed = 0
+
+    async def aclose(self: typing.Self) -> None:  # noqa: D102
+        await asyncio.sleep(0)
+        self.closed += 1
+
+
+@pytest.mark.asyncio()
+async def test_singleton_maxsize() -> None:
+    """Test LRU eviction and closing of the evicted values."""
+
+    @asyncio_loop_local.singleton(maxsize=2, on_evict=Closeable.aclose)
+    def tenant(name: str) -> Closeable:
+        return Closeable(name)
+
+    a, b = tenant('a'), tenant('b')
+    assert tenant('a') is a  # a is now more recently used than b
+    c = tenant('c')
+    assert tenant.cache_info() == (1, 3, 1, 2, 2)  # type: ignore[attr-defined]
+    await asyncio.sleep(0)
+    await asyncio.sleep(0)
+    assert (a.closed, b.closed, c.closed) == (0, 1, 0)
+    assert tenant('b') is not b  # evicts a
+    assert tenant('c') is c
+    await asyncio.sleep(0)
+    await asyncio.sleep(0)
+    assert (a.closed, b.closed, c.closed) == (1, 1, 0)
+
+
+@pytest.mark.asyncio()
+async def test_singleton_ttl() -> None:
+    """Test time-based eviction, not exiting what hasn't been entered."""
+
+    @asyncio_loop_local.singleton(ttl=0.01)
+    def res() -> CountingACM:
+        return CountingACM()
+
+    r = res()
+    assert res() is r
+    await asyncio.sleep(0.02)
+    assert res() is not r
+    for _ in range(3):
+        await asyncio.sleep(0)
+    assert (r.enters, r.exits) == (0, 0)
+    info = res.cache_info()  # type: ignore[attr-defined]
+    assert (info.hits, info.misses, info.evictions) == (1, 2, 1)
+
+
+@pytest.mark.asyncio()
+async def test_singleton_ttl_never_looked_up_again(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Test evicting the expired values on storing new ones."""
+    clock = [0.0]
+    fake_time = types.SimpleNamespace(monotonic=lambda: clock[0])
+    monkeypatch.setattr(asyncio_loop_local._singleton, 'time', fake_time)  # noqa: SLF001
+    evicted: list[list[int]] = []
+
+    @asyncio_loop_local.singleton(ttl=0.01, on_evict=evicted.append)
+    def tenant(name: int) -> list[int]:
+        return [name]
+
+    for i in range(1000):
+        tenant(i)
+    clock[0] += 0.02
+    for i in range(1000, 1010):
+        tenant(i)
+    tenant(1000)  # a hit doesn't reorder the expiry
+    info = tenant.cache_info()  # type: ignore[attr-defined]
+    assert (info.currsize, info.evictions) == (10, 1000)
+    await asyncio.sleep(0)
+    assert sorted(x for (x,) in evicted) == list(range(1000))
+
+
+@pytest.mark.asyncio()
+async def test_singleton_eviction_not_ours() -> None:
+    """Test not closing what's evicted unless asked to."""
+
+    @asyncio_loop_local.singleton(maxsize=1)
+    def lock_for(key: str) -> asyncio.Lock:  # noqa: ARG001
+        return asyncio.Lock()
+
+    async with lock_for('a'):
+        lock_for('b')  # evicts a, while it's held
+        for _ in range(3):
+            await asyncio.sleep(0)
+
+
+@pytest.mark.asyncio()
+async def test_singleton_plain_hits() -> None:
+    """Test that plain hits are only counted while an observer is set."""
+
+    @asyncio_loop_local.singleton
+    def sync(name: str) -> list[str]:
+        return [name]
+
+    @asyncio_loop_local.singleton
+    async def async_(name: str) -> list[str]:
+        await asyncio.sleep(0)
+        return [name]
+
+    assert sync('a') is sync(name='a')
+    assert await async_('a') is await async_(name='a')
+    asyncio_loop_local.set_observer(asyncio_loop_local.Observer())
+    try:
+        assert sync('a') is sync('a')
+        assert await async_('a') is await async_('a')
+    finally:
+        asyncio_loop_local.set_observer(None)
+    infos = [
+        sync.cache_info(),  # type: ignore[attr-defined]
+        async_.cache_info(),  # type: ignore[attr-defined]
+    ]
+    assert [(i.hits, i.misses) for i in infos] == [(2, 1), (2, 1)]
+
+
+@pytest.mark.asyncio()
+async def test_singleton_async_eviction() -> None:
+    """Test evicting async singletons, including in-flight ones."""
+
+    @asyncio_loop_local.singleton(maxsize=1, on_evict=Closeable.aclose)
+    async def tenant(name: str) -> Closeable:
+        await asyncio.sleep(0)
+        if not name:
+            raise ValueError
+        return Closeable(name)
+
+    a = await tenant('a')
+    pending_fail = asyncio.ensure_future(tenant(''))
+    await asyncio.sleep(0)
+    pending_b = asyncio.ensure_future(tenant('b'))  # evicts the in-flight one
+    with pytest.raises(ValueError):  # noqa: PT011
+        await pending_fail  # nothing to close or forget
+    b = await pending_b
+    await tenant('c')  # evicts b
+    for _ in range(3):
+        await asyncio.sleep(0)
+    assert (a.closed, b.closed) == (1, 1)
+    info = tenant.cache_info()  # type: ignore[attr-defined]
+    assert (info.misses, info.evictions, info.currsize) == (4, 3, 1)
+
+
+@pytest.mark.asyncio()
+async def test_singleton_eviction_not_closeable() -> None:
+    """Test evicting values that can't be closed."""
+
+    @asyncio_loop_local.singleton(maxsize=1)
+    def number(x: int) -> int:
+        return x
+
+    assert [number(1), number(2), number(1)] == [1, 2, 1]
+    info = number.cache_info()  # type: ignore[attr-defined]
+    assert (info.evictions, info.currsize) == (2, 1)
+
+
+@pytest.mark.asyncio()
+async def test_singleton_decorated_twice() -> None:
+    """Test decorating the same function twice, with different settings."""
+
+    def make(x: int) -> Closeable:
+        return Closeable(str(x))
+
+    async def amake(x: int) -> Closeable:
+        await asyncio.sleep(0)
+        return Closeable(str(x))
+
+    unbounded = asyncio_loop_local.singleton(make)
+    bounded = asyncio_loop_local.singleton(make, maxsize=1)
+    a = unbounded(1)
+    assert bounded(1) is not a
+    bounded(2)
+    assert unbounded(1) is a
+    assert unbounded.cache_info().maxsize is None  # type: ignore[attr-defined]
+    assert bounded.cache_info().evictions == 1  # type: ignore[attr-defined]
+    async_unbounded = asyncio_loop_local.singleton(amake)
+    async_bounded = asyncio_loop_local.singleton(amake, maxsize=1)
+    a = await async_unbounded(1)
+    assert await async_bounded(1) is not a
+    await async_bounded(2)
+    assert await async_unbounded(1) is a
+
+
+def test_singleton_invalid_maxsize() -> None:
+    """Test that a non-positive maxsize is rejected."""
+    with pytest.raises(ValueError, match='maxsize must be positive'):
+        asyncio_loop_local.singleton(maxsize=0)
+
+
+###
+
+
+@pytest.mark.asyncio()
+async def test_singleton_keys_normalized() -> None:
+    """Test that equivalent argument spellings share a singleton."""
+
+    @asyncio_loop_local.singleton
+    def f(a: int, b: int = 2, *, c: int = 3) -> list[int]:
+        return [a, b, c]
+
+    r = f(1)
+    assert f(1, 2) is r
+    assert f(1, b=2) is r
+    assert f(b=2, a=1) is r
+    assert f(1, 2, c=3) is r
+    assert f(c=3, a=1) is r
+    assert f(1, c=4) is not r
+    info = f.cache_info()  # type: ignore[attr-defined]
+    assert (info.misses, info.currsize) == (2, 2)
+
+    @asyncio_loop_local.singleton
+    def g(a: int, b: int = 2, *args: int, **kwargs: int) -> list[int]:
+        return [a, b, *args, *kwargs.values()]
+
+    r = g(1, 2)
+    assert g(1) is r
+    assert g(a=1) is r
+    assert g(1, 2, 3) is not r
+    assert g(1, x=3, y=4) is g(1, y=4, x=3)
+    assert g(1, x=3) is not g(1, 2, 3)
+    info = g.cache_info()  # type: ignore[attr-defined]
+    assert (info.misses, info.currsize) == (4, 4)
+
+
+@pytest.mark.asyncio()
+async def test_singleton_keys_bad_arguments() -> None:
+    """Test rejecting the arguments the callable would reject."""
+
+    @asyncio_loop_local.singleton
+    def f(a: int, /, b: int, *, c: int) -> list[int]:
+        return [a, b, c]
+
+    assert f(1, 2, c=3) is f(1, b=2, c=3)
+    for args, kwargs, match in (
+        ((1, 2), {}, "missing a required argument: 'c'"),
+        ((1, 2, 3), {}, 'too many positional arguments'),
+        ((), {'a': 1, 'b': 2, 'c': 3}, 'positional only'),
+        ((1, 2), {'b': 2, 'c': 3}, "multiple values for argument 'b'"),
+        ((1, 2), {'c': 3, 'd': 4}, "unexpected keyword argument 'd'"),
+    ):
+        with pytest.raises(TypeError, match=match):
+            f(*args, **kwargs)
+
+
+@pytest.mark.asyncio()
+async def test_singleton_keys_unhashable_defaults() -> None:
+    """Test that only the arguments passed have to be hashable."""
+
+    @asyncio_loop_local.singleton
+    def f(a: int, opts: dict[str, int] | None = {}) -> list[int]:  # noqa: ARG001, B006
+        return [a]
+
+    assert f(1) is f(a=1)
+    assert f(1, None) is not f(1)
+    with pytest.raises(TypeError, match='unhashable'):
+        f(1, {})
+
+
+@pytest.mark.asyncio()
+async def test_singleton_keys_no_signature() -> None:
+    """Test singleton on builtins that have no inspectable signature."""
+    d = typing.cast(
+        typing.Callable[..., dict[str, int]],
+        asyncio_loop_local.singleton(dict),
+    )
+    assert d(a=1, b=2) is d(b=2, a=1)
+    assert d(a=1) is not d(a=2)
+    assert d() is d()
+
+
+@pytest.mark.asyncio()
+async def test_singleton_custom_key() -> None:
+    """Test singleton with a custom key function for unhashable arguments."""
+
+    @asyncio_loop_local.singleton(key=operator.itemgetter('tenant'))
+    def client(config: dict[str, str]) -> list[str]:
+        return [config['tenant']]
+
+    c = client({'tenant': 'a', 'token': '1'})
+    assert client({'tenant': 'a', 'token': '2'}) is c
+    assert client({'tenant': 'b'}) is not c
+
+    @asyncio_loop_local.singleton(key=operator.itemgetter('tenant'))
+    async def aclient(config: dict[str, str]) -> list[str]:
+        await asyncio.sleep(0)
+        return [config['tenant']]
+
+    c = await aclient({'tenant': 'a', 'token': '1'})
+    assert await aclient({'tenant': 'a', 'token': '2'}) is c
+
+
+def test_singleton_process_scope() -> None:
+    """Test that scope='process' shares values across loops and threads."""
+    calls = []
+
+    @asyncio_loop_local.singleton(scope='process')
+    def table(name: str = 'x') -> list[str]:
+        calls.append(name)
+        time.sleep(0.1)  # let the other threads pile up on the lock
+        return [name]
+
+    async def get(name: str) -> list[str]:
+        return table(name)
+
+    def in_own_loop(name: str) -> list[str]:
+        return asyncio.run(get(name))
+
+    r = table()  # works without a loop, too
+    assert in_own_loop('x') is r
+    threads = 4
+    with concurrent.futures.ThreadPoolExecutor(threads) as pool:
+        rs = list(pool.map(in_own_loop, ['y'] * threads))
+    assert all(r is rs[0] for r in rs)
+    assert calls == ['x', 'y']
+    info = table.cache_info()  # type: ignore[attr-defined]
+    assert info.currsize == len(['x', 'y'])
+
+
+def test_singleton_process_scope_misuse() -> None:
+    """Test that scope='process' rejects what it can't support."""
+    with pytest.raises(ValueError, match='scope must be'):
+        asyncio_loop_local.singleton(scope='thread')  # type: ignore[call-overload]
+    with pytest.raises(ValueError, match='maxsize, ttl and on_evict'):
+        asyncio_loop_local.singleton(scope='process', maxsize=1)
+    with pytest.raises(ValueError, match='maxsize, ttl and on_evict'):
+        asyncio_loop_local.singleton(scope='process', ttl=1)
+    with pytest.raises(ValueError, match='maxsize, ttl and on_evict'):
+        asyncio_loop_local.singleton(scope='process', on_evict=print)
+
+    async def f() -> None:
+        pass
+
+    with pytest.raises(ValueError, match='async functions'):
+        asyncio_loop_local.singleton(f, scope='process')
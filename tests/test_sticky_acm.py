@@ -8,6 +8,7 @@ import asyncio
 import pytest
 from common import CountingACM
 
+import asyncio_loop_local
 from asyncio_loop_local._sticky_acm import sticky_acm
 
 
@@ -89,3 +90,22 @@ async def test_enter_once_parallel() -> None:
 
     await asyncio.gather(*[enter_exit() for _ in range(7)])
     assert (acm.enters, acm.exits) == (1, 0)
+
+
+@pytest.mark.asyncio()
+async def test_sticky_acm_type() -> None:
+    """Test that all the sticky_acm's share a single slotted type."""
+    s1, s2 = sticky_acm(CountingACM()), sticky_acm(CountingACM())
+    assert type(s1) is type(s2) is asyncio_loop_local.StickyACM
+    assert not hasattr(s1, '__dict__')
+
+
+@pytest.mark.asyncio()
+async def test_sticky_acm_exceptions_propagate() -> None:
+    """Test that exiting a sticky_acm doesn't swallow exceptions."""
+    acm = CountingACM()
+    for _ in range(2):  # entering and hitting
+        with pytest.raises(ZeroDivisionError):
+            async with sticky_acm(acm):
+                1 / 0  # noqa: B018
+    assert (acm.enters, acm.exits) == (1, 0)
@@ -55,3 +55,9 @@ def test_two_loops_sticky_singleton_acm() -> None:
     assert (acm2.enters, acm2.exits) == (1, 0)
     l2.close()
     assert (acm2.enters, acm2.exits) == (1, 1)
+
+
+def test_sticky_singleton_acm_wraps() -> None:
+    """Test that sticky_singleton_acm preserves the metadata."""
+    assert _CountingACM.__name__ == 'CountingACM'
+    assert _CountingACM.__wrapped__ is CountingACM  # type: ignore[attr-defined]
@@ -81,3 +81,23 @@ async def test_locking() -> None:
     asyncio_loop_local.storage()['list_lock'] = asyncio.Lock()
     await asyncio.gather(*(ls_grow_list() for _ in range(100)))
     assert asyncio_loop_local.storage()['list'] == [None] * 100
+
+
+def test_loop_without_attributes() -> None:
+    """Test loop-local storage with loops that don't accept attributes."""
+
+    class SlottedLoop(asyncio.SelectorEventLoop):
+        def __setattr__(self: typing.Self, name: str, value: object) -> None:
+            if name == '_asyncio_loop_local_storage':
+                raise AttributeError(name)
+            super().__setattr__(name, value)
+
+    async def ls_test() -> None:
+        asyncio_loop_local.storage()['x'] = 1
+        assert asyncio_loop_local.storage() == {'x': 1}
+
+    loop = SlottedLoop()
+    loop.run_until_complete(ls_test())
+    assert not hasattr(loop, '_asyncio_loop_local_storage')
+    assert _loop_local_storages[loop] == {'x': 1}
+    loop.close()